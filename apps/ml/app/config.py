@@ -9,6 +9,9 @@ class Config:
     
     # Redis
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+    REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+    REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 1.0))
+    REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 1.0))
     
     # AWS
     AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID", "")
@@ -16,17 +19,80 @@ class Config:
     S3_BUCKET = os.getenv("S3_BUCKET", "confirmly-models")
     AWS_REGION = os.getenv("AWS_REGION", "ap-south-1")
     
-    # MLflow
-    MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5000")
+    # Experiment tracking (local | mlflow | none); MLflow is used only when a server is configured
+    MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "")
     MLFLOW_EXPERIMENT_NAME = os.getenv("MLFLOW_EXPERIMENT_NAME", "confirmly-risk-engine")
+    TRACKING_BACKEND = os.getenv("TRACKING_BACKEND", "mlflow" if MLFLOW_TRACKING_URI else "local")
+    TRACKING_DIR = os.getenv("TRACKING_DIR", "./data/tracking")
+    
+    # Training data
+    TRAINING_DATA_DIR = os.getenv("TRAINING_DATA_DIR", "./data/training")
+    TRAINING_BATCH_SIZE = int(os.getenv("TRAINING_BATCH_SIZE", 5000))
+    TRAINING_MAX_SHARDS = int(os.getenv("TRAINING_MAX_SHARDS", 64))
+    TRAINING_SCALE_FEATURES = os.getenv("TRAINING_SCALE_FEATURES", "false").lower() == "true"  # tree models don't need it
+    TRAINING_TEST_SIZE = float(os.getenv("TRAINING_TEST_SIZE", 0.2))  # final score only
+    TRAINING_VALIDATION_SIZE = float(os.getenv("TRAINING_VALIDATION_SIZE", 0.15))  # early stopping, model selection
+    
+    # Optional pruned, uint8-binned model variant, served with MODEL_ENGINE=quantized
+    QUANTIZE_MODEL = os.getenv("QUANTIZE_MODEL", "false").lower() == "true"
+    QUANTIZE_MIN_GAIN_RATIO = float(os.getenv("QUANTIZE_MIN_GAIN_RATIO", 0.01))  # of the mean split gain
+    QUANTIZE_LEAF_DTYPE = os.getenv("QUANTIZE_LEAF_DTYPE", "float16")  # float16 | int8
+    QUANTIZE_MAX_AUC_DROP = float(os.getenv("QUANTIZE_MAX_AUC_DROP", 0.005))
+    
+    # Historical aggregate index
+    AGGREGATE_DIR = os.getenv("AGGREGATE_DIR", "./data/aggregates")
+    AGGREGATE_REFRESH_SECONDS = float(os.getenv("AGGREGATE_REFRESH_SECONDS", 30))
+    AGGREGATE_PRIOR_WEIGHT = float(os.getenv("AGGREGATE_PRIOR_WEIGHT", 5))
+    AGGREGATE_KEEP_VERSIONS = int(os.getenv("AGGREGATE_KEEP_VERSIONS", 2))
     
     # Model
     MODEL_PATH = os.getenv("MODEL_PATH", "./models/risk_model.pkl")
     MODEL_VERSION = os.getenv("MODEL_VERSION", "v1.0.0")
+    MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", 10))  # seconds, 0 disables
+    
+    # Candidate model: shadow-scored on a sample of traffic, optionally serving a canary share
+    CANDIDATE_MODEL_PATH = os.getenv("CANDIDATE_MODEL_PATH", "")
+    CANDIDATE_MODEL_ENGINE = os.getenv("CANDIDATE_MODEL_ENGINE", "")  # defaults to MODEL_ENGINE
+    SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", 0.1))
+    SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", 32))
+    CANARY_PERCENT = float(os.getenv("CANARY_PERCENT", 0))
+    
+    # Offline bulk scoring
+    BULK_SCORE_CHUNK_SIZE = int(os.getenv("BULK_SCORE_CHUNK_SIZE", 5000))
+    BULK_SCORE_CHECKPOINT = os.getenv("BULK_SCORE_CHECKPOINT", "./data/bulk_score_checkpoint.json")
+    
+    # Scoring
+    SCORE_BATCH_MAX_SIZE = int(os.getenv("SCORE_BATCH_MAX_SIZE", 1000))
+    SCORE_MICROBATCH_ENABLED = os.getenv("SCORE_MICROBATCH_ENABLED", "true").lower() == "true"
+    SCORE_MICROBATCH_WINDOW_MS = float(os.getenv("SCORE_MICROBATCH_WINDOW_MS", 2))
+    SCORE_MICROBATCH_MAX_SIZE = int(os.getenv("SCORE_MICROBATCH_MAX_SIZE", 64))
+    
+    # Rule tier: orders matching a rule derived at training time skip the model
+    RULES_ENABLED = os.getenv("RULES_ENABLED", "true").lower() == "true"
+    RULE_TOLERANCE = float(os.getenv("RULE_TOLERANCE", 10))  # risk points a rule may differ from the model
+    RULE_MIN_AGREEMENT = float(os.getenv("RULE_MIN_AGREEMENT", 0.95))
+    RULE_MIN_SUPPORT = int(os.getenv("RULE_MIN_SUPPORT", 200))
+    RULES_AUDIT_RATE = float(os.getenv("RULES_AUDIT_RATE", 0.01))  # share of rule hits also scored by the model
+    
+    # Prediction cache
+    SCORE_CACHE_TTL = int(os.getenv("SCORE_CACHE_TTL", 3600))
+    CACHE_LOCAL_MAX_SIZE = int(os.getenv("CACHE_LOCAL_MAX_SIZE", 10000))
+    CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", 60))
+    
+    # Inference executor
+    INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")  # thread | process
+    INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2))
+    INFERENCE_QUEUE_LIMIT = int(os.getenv("INFERENCE_QUEUE_LIMIT", 64))
+    
+    # Observability
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 0))  # profile requests slower than this, 0 disables
+    PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", 5))
+    PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 20))
     
     # API
     ML_API_KEY = os.getenv("ML_API_KEY", "")
     PORT = int(os.getenv("PORT", 5000))
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))  # >1 pre-forks workers sharing the model
     
     # App
     NODE_ENV = os.getenv("NODE_ENV", "development")
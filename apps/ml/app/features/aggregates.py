@@ -0,0 +1,179 @@
+"""
+Historical outcome aggregates served from a memory-mapped lookup index
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from app.config import config
+
+# Order keys that historical outcomes are aggregated by
+AGGREGATE_KINDS = ('phone', 'email', 'pincode')
+
+CURRENT_FILE = 'CURRENT'
+
+_NON_DIGITS = re.compile(r'\D')
+
+def normalize_key(kind: str, value: str) -> str:
+    """
+    Canonical form of a phone, email or pincode, '' if it can't be keyed
+    """
+    value = (value or '').strip()
+    if kind == 'phone':
+        # Compare the subscriber number, ignoring country code and punctuation
+        return _NON_DIGITS.sub('', value)[-10:]
+    if kind == 'email':
+        return value.lower()
+    if kind == 'pincode':
+        return value.replace(' ', '')
+    raise ValueError(f"Unknown aggregate kind: {kind}")
+
+def hash_key(kind: str, value: str) -> int:
+    """
+    64-bit hash of a normalized key; 0 means there is nothing to look up
+    
+    Raw phones and emails never reach the index, only their hashes.
+    """
+    value = normalize_key(kind, value)
+    if not value:
+        return 0
+    digest = hashlib.blake2b(value.encode(), digest_size=8, person=kind.encode())
+    return int.from_bytes(digest.digest(), 'little') or 1
+
+def hash_keys(kind: str, values: Iterable[str], count: int) -> np.ndarray:
+    """
+    hash_key over a sequence of values, as a uint64 array
+    """
+    return np.fromiter((hash_key(kind, value) for value in values), dtype=np.uint64, count=count)
+
+class AggregateIndex:
+    """
+    Read side of the aggregate index built by app.training.aggregates
+    
+    Each index version is a directory holding, per kind, a sorted uint64 key
+    array and an (n, 2) float32 array of [order_count, confirm_rate]. Both
+    are memory-mapped, so every worker shares one copy through the page
+    cache, at 16 bytes per key. The CURRENT file names the live version and
+    is replaced atomically by the builder; readers notice within
+    refresh_seconds and swap to the new version in one assignment.
+    """
+    
+    def __init__(self, directory: str, refresh_seconds: float = 30.0):
+        self.directory = directory
+        self.refresh_seconds = refresh_seconds
+        # (version, prior, {kind: (keys, stats)}), replaced as a whole on refresh
+        self._snapshot: Tuple[Optional[str], float, Dict[str, Tuple[np.ndarray, np.ndarray]]] = (None, 0.5, {})
+        self._checked_at = float('-inf')
+        # Per thread and kind: (snapshot, raw value, stats) of the last lookup_value
+        self._last_lookup = threading.local()
+    
+    @property
+    def version(self) -> Optional[str]:
+        return self._snapshot[0]
+    
+    @property
+    def prior(self) -> Optional[float]:
+        """
+        Confirm rate unknown keys get, or None before an index is loaded
+        """
+        version, prior, _ = self._current()
+        return prior if version is not None else None
+    
+    def _current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.directory, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def refresh(self):
+        """
+        Switch to the version named by CURRENT if it changed
+        """
+        self._checked_at = time.monotonic()
+        version = self._current_version()
+        if version is None or version == self.version:
+            return
+        
+        path = os.path.join(self.directory, version)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        tables = {}
+        for kind in meta['kinds']:
+            keys = np.load(os.path.join(path, f'{kind}_keys.npy'), mmap_mode='r')
+            stats = np.load(os.path.join(path, f'{kind}_stats.npy'), mmap_mode='r')
+            tables[kind] = (keys, stats)
+        
+        self._snapshot = (version, float(meta['prior']), tables)
+        print(f"Aggregate index {version} loaded from {path}")
+    
+    def _current(self):
+        if time.monotonic() - self._checked_at >= self.refresh_seconds:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing aggregate index: {e}")
+        return self._snapshot
+    
+    def lookup(self, kind: str, key_hashes: np.ndarray) -> np.ndarray:
+        """
+        [order_count, confirm_rate] per key hash as an (n, 2) float32 array
+        Unknown keys get a count of 0 and the global confirm rate
+        """
+        _, prior, tables = self._current()
+        result = np.empty((len(key_hashes), 2), dtype=np.float32)
+        result[:, 0] = 0.0
+        result[:, 1] = prior
+        
+        table = tables.get(kind)
+        if table is None or len(table[0]) == 0 or len(key_hashes) == 0:
+            return result
+        
+        keys, stats = table
+        positions = np.searchsorted(keys, key_hashes)
+        np.minimum(positions, len(keys) - 1, out=positions)
+        found = (keys[positions] == key_hashes) & (key_hashes != 0)
+        result[found] = stats[positions[found]]
+        return result
+    
+    def lookup_one(self, kind: str, key_hash: int) -> Tuple[float, float]:
+        """
+        (order_count, confirm_rate) for a single key hash
+        """
+        return self._lookup_one(self._current(), kind, key_hash)
+    
+    def lookup_value(self, kind: str, value: str) -> Tuple[float, float]:
+        """
+        (order_count, confirm_rate) for a raw phone, email or pincode
+        
+        The last result per kind is remembered per thread, so an order's count
+        and rate features hash and search its key once, like the columnar
+        path does through OrderColumns.
+        """
+        snapshot = self._current()
+        last = getattr(self._last_lookup, kind, None)
+        if last is not None and last[0] is snapshot and last[1] == value:
+            return last[2]
+        stats = self._lookup_one(snapshot, kind, hash_key(kind, value))
+        setattr(self._last_lookup, kind, (snapshot, value, stats))
+        return stats
+    
+    @staticmethod
+    def _lookup_one(snapshot, kind: str, key_hash: int) -> Tuple[float, float]:
+        _, prior, tables = snapshot
+        table = tables.get(kind)
+        if table is None or key_hash == 0:
+            return 0.0, prior
+        
+        keys, stats = table
+        key_hash = np.uint64(key_hash)
+        position = int(np.searchsorted(keys, key_hash))
+        if position < len(keys) and keys[position] == key_hash:
+            return float(stats[position, 0]), float(stats[position, 1])
+        return 0.0, prior
+
+aggregate_index = AggregateIndex(config.AGGREGATE_DIR, refresh_seconds=config.AGGREGATE_REFRESH_SECONDS)
@@ -2,36 +2,88 @@
 Customer-level feature extraction
 """
 from typing import Dict, Any
+import numpy as np
+from app.features.registry import registry, order_field, customer_field
+from app.features.aggregates import aggregate_index
+
+GROUP = 'customer'
+
+def email_domain_count(email: str) -> int:
+    """
+    Number of '@'-separated parts in an email, 0 if there is no '@'
+    """
+    return len(email.split('@')) if '@' in email else 0
+
+# Email features
+registry.register(
+    GROUP, 'email_length',
+    row=lambda order: len(order_field(order, 'email')),
+    column=lambda cols: cols.email_length,
+)
+registry.register(
+    GROUP, 'has_email',
+    row=lambda order: bool(order_field(order, 'email')),
+    column=lambda cols: cols.email_length > 0,
+)
+registry.register(
+    GROUP, 'email_domain_count',
+    row=lambda order: email_domain_count(order_field(order, 'email')),
+    column=lambda cols: np.fromiter((email_domain_count(email) for email in cols.email), dtype=np.float64, count=cols.n),
+)
+
+# Phone features
+registry.register(
+    GROUP, 'phone_length',
+    row=lambda order: len(order_field(order, 'phone')),
+    column=lambda cols: cols.phone_length,
+)
+registry.register(
+    GROUP, 'has_phone',
+    row=lambda order: bool(order_field(order, 'phone')),
+    column=lambda cols: cols.phone_length > 0,
+)
+registry.register(
+    GROUP, 'phone_is_numeric',
+    row=lambda order: order_field(order, 'phone').isdigit(),
+    column=lambda cols: np.fromiter((phone.isdigit() for phone in cols.phone), dtype=np.bool_, count=cols.n),
+)
+
+# Name features
+registry.register(
+    GROUP, 'name_length',
+    row=lambda order: len(customer_field(order, 'name')),
+    column=lambda cols: cols.name_length,
+)
+registry.register(
+    GROUP, 'has_name',
+    row=lambda order: bool(customer_field(order, 'name')),
+    column=lambda cols: cols.name_length > 0,
+)
+
+# Order history features, from the precomputed aggregate index
+registry.register(
+    GROUP, 'phone_order_count',
+    row=lambda order: aggregate_index.lookup_value('phone', order_field(order, 'phone'))[0],
+    column=lambda cols: aggregate_index.lookup('phone', cols.phone_key)[:, 0],
+)
+registry.register(
+    GROUP, 'phone_confirm_rate',
+    row=lambda order: aggregate_index.lookup_value('phone', order_field(order, 'phone'))[1],
+    column=lambda cols: aggregate_index.lookup('phone', cols.phone_key)[:, 1],
+)
+registry.register(
+    GROUP, 'email_order_count',
+    row=lambda order: aggregate_index.lookup_value('email', order_field(order, 'email'))[0],
+    column=lambda cols: aggregate_index.lookup('email', cols.email_key)[:, 0],
+)
+registry.register(
+    GROUP, 'email_confirm_rate',
+    row=lambda order: aggregate_index.lookup_value('email', order_field(order, 'email'))[1],
+    column=lambda cols: aggregate_index.lookup('email', cols.email_key)[:, 1],
+)
 
 def extract_customer_features(order: Dict[str, Any]) -> Dict[str, float]:
     """
     Extract customer-level features
     """
-    customer = order.get('customer', {})
-    email = order.get('email', '')
-    phone = order.get('phone', '')
-    
-    features = {}
-    
-    # Email features
-    features['email_length'] = float(len(email))
-    features['has_email'] = 1.0 if email else 0.0
-    features['email_domain_count'] = float(len(email.split('@')) if '@' in email else 0)
-    
-    # Phone features
-    features['phone_length'] = float(len(phone))
-    features['has_phone'] = 1.0 if phone else 0.0
-    features['phone_is_numeric'] = 1.0 if phone.isdigit() else 0.0
-    
-    # Address features
-    features['has_address'] = 1.0 if customer.get('address') else 0.0
-    features['has_pincode'] = 1.0 if customer.get('pincode') else 0.0
-    features['pincode_length'] = float(len(customer.get('pincode', '')))
-    
-    # Name features
-    name = customer.get('name', '')
-    features['name_length'] = float(len(name))
-    features['has_name'] = 1.0 if name else 0.0
-    
-    return features
-
+    return registry.extract_group(GROUP, order)
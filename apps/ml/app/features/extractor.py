@@ -1,51 +1,73 @@
 """
 Feature extraction for risk scoring
 """
-from typing import Dict, Any
-import pandas as pd
+from typing import Dict, Any, List, Optional
+import numpy as np
+from app.features.registry import registry
+from app.features.schema import FeatureSchema
+# Importing the group modules registers their features
+from app.features import order_features, customer_features, geo_features, platform_features  # noqa: F401
+
+FEATURE_SCHEMA_VERSION = "3"
+
+# Every registered feature, in group registration order
+FEATURE_SCHEMA = registry.schema(FEATURE_SCHEMA_VERSION)
+FEATURE_NAMES = FEATURE_SCHEMA.names
+
+# Feature layout used before the registry; assumed for models saved without a schema file
+LEGACY_FEATURE_SCHEMA = registry.schema("1", [
+    'amount',
+    'is_cod',
+    'is_prepaid',
+    'has_address',
+    'has_pincode',
+    'has_email',
+    'email_length',
+    'has_phone',
+    'phone_length',
+    'country_code',
+])
 
 class FeatureExtractor:
     """
     Extract features from order data for risk scoring
+    
+    Runs the registry's extraction plan for a feature schema, so training and
+    serving share one implementation of every feature.
     """
     
+    def __init__(self, schema: FeatureSchema = FEATURE_SCHEMA):
+        self.schema = schema
+        self.plan = registry.plan(schema)
+    
     def extract(self, order: Dict[str, Any]) -> Dict[str, float]:
         """
         Extract features from order data
         Returns a dictionary of feature names and values
         """
-        features = {}
-        
-        # Order-level features
-        features['amount'] = float(order.get('amount', 0))
-        features['is_cod'] = 1.0 if order.get('paymentMode') == 'cod' else 0.0
-        features['is_prepaid'] = 1.0 if order.get('paymentMode') == 'prepaid' else 0.0
-        
-        # Customer features
-        customer = order.get('customer', {})
-        features['has_address'] = 1.0 if customer.get('address') else 0.0
-        features['has_pincode'] = 1.0 if customer.get('pincode') else 0.0
-        
-        # Email features
-        email = order.get('email', '')
-        features['has_email'] = 1.0 if email else 0.0
-        features['email_length'] = float(len(email))
-        
-        # Phone features
-        phone = order.get('phone', '')
-        features['has_phone'] = 1.0 if phone else 0.0
-        features['phone_length'] = float(len(phone))
-        
-        # Geo features (placeholder - would need actual geo data)
-        features['country_code'] = 1.0 if customer.get('country') == 'IN' else 0.0
-        
-        return features
+        row = self.extract_into(order, self.schema.new_row())
+        return {name: float(value) for name, value in zip(self.schema.names, row)}
+    
+    def extract_into(self, order: Dict[str, Any], out: np.ndarray) -> np.ndarray:
+        """
+        Extract features from order data straight into a preallocated
+        float32 row laid out by the feature schema
+        """
+        return self.plan.extract_into(order, out)
     
-    def extract_batch(self, orders: list) -> pd.DataFrame:
+    def extract_batch(self, orders: list) -> 'pd.DataFrame':
         """
         Extract features from a batch of orders
         Returns a pandas DataFrame
         """
-        features_list = [self.extract(order) for order in orders]
-        return pd.DataFrame(features_list)
-
+        # pandas is only needed here, so the serving path never imports it
+        import pandas as pd
+        return pd.DataFrame(self.extract_columns(orders), columns=self.schema.names)
+    
+    def extract_columns(self, orders: List[Dict[str, Any]], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Extract features from a batch of orders column by column
+        Writes into out (or a new float32 matrix) of shape
+        (len(orders), n_features) laid out by the feature schema
+        """
+        return self.plan.extract_columns(orders, out)
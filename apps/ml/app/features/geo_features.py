@@ -2,28 +2,59 @@
 Geographic feature extraction
 """
 from typing import Dict, Any
+from app.features.registry import registry, customer_field
+from app.features.aggregates import aggregate_index
+
+GROUP = 'geo'
+
+# Country features
+registry.register(
+    GROUP, 'country_code',
+    row=lambda order: customer_field(order, 'country') == 'IN',
+    column=lambda cols: cols.country == 'IN',
+)
+registry.register(
+    GROUP, 'country_unknown',
+    row=lambda order: not customer_field(order, 'country'),
+    column=lambda cols: cols.country == '',
+)
+
+# Pincode features
+registry.register(
+    GROUP, 'has_pincode',
+    row=lambda order: bool(customer_field(order, 'pincode')),
+    column=lambda cols: cols.pincode_length > 0,
+)
+registry.register(
+    GROUP, 'pincode_length',
+    row=lambda order: len(customer_field(order, 'pincode')),
+    column=lambda cols: cols.pincode_length,
+)
+registry.register(
+    GROUP, 'pincode_order_count',
+    row=lambda order: aggregate_index.lookup_value('pincode', customer_field(order, 'pincode'))[0],
+    column=lambda cols: aggregate_index.lookup('pincode', cols.pincode_key)[:, 0],
+)
+registry.register(
+    GROUP, 'pincode_confirm_rate',
+    row=lambda order: aggregate_index.lookup_value('pincode', customer_field(order, 'pincode'))[1],
+    column=lambda cols: aggregate_index.lookup('pincode', cols.pincode_key)[:, 1],
+)
+
+# Address features
+registry.register(
+    GROUP, 'address_length',
+    row=lambda order: len(customer_field(order, 'address')),
+    column=lambda cols: cols.address_length,
+)
+registry.register(
+    GROUP, 'has_address',
+    row=lambda order: bool(customer_field(order, 'address')),
+    column=lambda cols: cols.address_length > 0,
+)
 
 def extract_geo_features(order: Dict[str, Any]) -> Dict[str, float]:
     """
     Extract geographic features
     """
-    customer = order.get('customer', {})
-    features = {}
-    
-    # Country features
-    country = customer.get('country', '')
-    features['country_in'] = 1.0 if country == 'IN' else 0.0
-    features['country_unknown'] = 1.0 if not country else 0.0
-    
-    # Pincode features (placeholder - would need actual pincode data)
-    pincode = customer.get('pincode', '')
-    features['has_pincode'] = 1.0 if pincode else 0.0
-    features['pincode_length'] = float(len(pincode))
-    
-    # Address features
-    address = customer.get('address', '')
-    features['address_length'] = float(len(address))
-    features['has_address'] = 1.0 if address else 0.0
-    
-    return features
-
+    return registry.extract_group(GROUP, order)
@@ -1,33 +1,51 @@
 """
 Order-level feature extraction
 """
+import math
 from typing import Dict, Any
+import numpy as np
+from app.features.registry import registry, order_field
+
+GROUP = 'order'
+
+# Amount features
+registry.register(
+    GROUP, 'amount',
+    row=lambda order: float(order.get('amount', 0)),
+    column=lambda cols: cols.amount,
+)
+registry.register(
+    GROUP, 'amount_log',
+    row=lambda order: math.log(max(float(order.get('amount', 0)), 0.0) + 1),
+    column=lambda cols: np.log1p(np.maximum(cols.amount, 0.0)),
+)
+registry.register(
+    GROUP, 'amount_sqrt',
+    row=lambda order: math.sqrt(max(float(order.get('amount', 0)), 0.0)),
+    column=lambda cols: np.sqrt(np.maximum(cols.amount, 0.0)),
+)
+
+# Payment mode features
+registry.register(
+    GROUP, 'is_cod',
+    row=lambda order: order_field(order, 'paymentMode') == 'cod',
+    column=lambda cols: cols.payment_mode == 'cod',
+)
+registry.register(
+    GROUP, 'is_prepaid',
+    row=lambda order: order_field(order, 'paymentMode') == 'prepaid',
+    column=lambda cols: cols.payment_mode == 'prepaid',
+)
+
+# Currency features
+registry.register(
+    GROUP, 'currency_inr',
+    row=lambda order: order_field(order, 'currency', 'INR') == 'INR',
+    column=lambda cols: cols.currency == 'INR',
+)
 
 def extract_order_features(order: Dict[str, Any]) -> Dict[str, float]:
     """
     Extract order-level features
     """
-    features = {}
-    
-    # Amount features
-    amount = float(order.get('amount', 0))
-    features['amount'] = amount
-    features['amount_log'] = float(__import__('math').log(amount + 1))
-    features['amount_sqrt'] = float(__import__('math').sqrt(amount))
-    
-    # Payment mode features
-    payment_mode = order.get('paymentMode', '')
-    features['is_cod'] = 1.0 if payment_mode == 'cod' else 0.0
-    features['is_prepaid'] = 1.0 if payment_mode == 'prepaid' else 0.0
-    
-    # Currency features
-    currency = order.get('currency', 'INR')
-    features['currency_inr'] = 1.0 if currency == 'INR' else 0.0
-    
-    # Platform features
-    platform = order.get('platform', '')
-    features['platform_shopify'] = 1.0 if platform == 'shopify' else 0.0
-    features['platform_woocommerce'] = 1.0 if platform == 'woocommerce' else 0.0
-    
-    return features
-
+    return registry.extract_group(GROUP, order)
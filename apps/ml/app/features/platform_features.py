@@ -2,18 +2,29 @@
 Platform-level feature extraction
 """
 from typing import Dict, Any
+from app.features.registry import registry, order_field
+
+GROUP = 'platform'
+
+# Platform type
+registry.register(
+    GROUP, 'platform_shopify',
+    row=lambda order: order_field(order, 'platform') == 'shopify',
+    column=lambda cols: cols.platform == 'shopify',
+)
+registry.register(
+    GROUP, 'platform_woocommerce',
+    row=lambda order: order_field(order, 'platform') == 'woocommerce',
+    column=lambda cols: cols.platform == 'woocommerce',
+)
+registry.register(
+    GROUP, 'platform_api',
+    row=lambda order: order_field(order, 'platform') == 'api',
+    column=lambda cols: cols.platform == 'api',
+)
 
 def extract_platform_features(order: Dict[str, Any]) -> Dict[str, float]:
     """
     Extract platform-level features
     """
-    features = {}
-    
-    # Platform type
-    platform = order.get('platform', '')
-    features['platform_shopify'] = 1.0 if platform == 'shopify' else 0.0
-    features['platform_woocommerce'] = 1.0 if platform == 'woocommerce' else 0.0
-    features['platform_api'] = 1.0 if platform == 'api' else 0.0
-    
-    return features
-
+    return registry.extract_group(GROUP, order)
@@ -0,0 +1,221 @@
+"""
+Feature registry shared by training and serving
+"""
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from app.features.schema import FeatureSchema, SchemaMismatchError
+from app.features.aggregates import hash_keys
+
+def order_field(order: Dict[str, Any], key: str, default: str = '') -> str:
+    """
+    String field of an order, treating missing and null values as the default
+    """
+    return order.get(key) or default
+
+def customer_field(order: Dict[str, Any], key: str) -> str:
+    """
+    String field of an order's customer, treating missing and null values as ''
+    """
+    return (order.get('customer') or {}).get(key) or ''
+
+class OrderColumns:
+    """
+    Raw order fields for a batch of orders as NumPy arrays
+    
+    Each field is parsed once per batch on first use and shared by every
+    feature that needs it.
+    """
+    
+    def __init__(self, orders: List[Dict[str, Any]]):
+        self.orders = orders
+        self.n = len(orders)
+    
+    def _lengths(self, values: List[str]) -> np.ndarray:
+        return np.fromiter((len(value) for value in values), dtype=np.float64, count=self.n)
+    
+    def _objects(self, values) -> np.ndarray:
+        array = np.empty(self.n, dtype=object)
+        array[:] = list(values)
+        return array
+    
+    @cached_property
+    def amount(self) -> np.ndarray:
+        return np.fromiter((float(order.get('amount', 0)) for order in self.orders), dtype=np.float64, count=self.n)
+    
+    @cached_property
+    def payment_mode(self) -> np.ndarray:
+        return self._objects(order_field(order, 'paymentMode') for order in self.orders)
+    
+    @cached_property
+    def currency(self) -> np.ndarray:
+        return self._objects(order_field(order, 'currency', 'INR') for order in self.orders)
+    
+    @cached_property
+    def platform(self) -> np.ndarray:
+        return self._objects(order_field(order, 'platform') for order in self.orders)
+    
+    @cached_property
+    def email(self) -> List[str]:
+        return [order_field(order, 'email') for order in self.orders]
+    
+    @cached_property
+    def email_length(self) -> np.ndarray:
+        return self._lengths(self.email)
+    
+    @cached_property
+    def phone(self) -> List[str]:
+        return [order_field(order, 'phone') for order in self.orders]
+    
+    @cached_property
+    def phone_length(self) -> np.ndarray:
+        return self._lengths(self.phone)
+    
+    @cached_property
+    def name_length(self) -> np.ndarray:
+        return self._lengths(customer_field(order, 'name') for order in self.orders)
+    
+    @cached_property
+    def address_length(self) -> np.ndarray:
+        return self._lengths(customer_field(order, 'address') for order in self.orders)
+    
+    @cached_property
+    def pincode(self) -> List[str]:
+        return [customer_field(order, 'pincode') for order in self.orders]
+    
+    @cached_property
+    def pincode_length(self) -> np.ndarray:
+        return self._lengths(self.pincode)
+    
+    @cached_property
+    def phone_key(self) -> np.ndarray:
+        return hash_keys('phone', self.phone, self.n)
+    
+    @cached_property
+    def email_key(self) -> np.ndarray:
+        return hash_keys('email', self.email, self.n)
+    
+    @cached_property
+    def pincode_key(self) -> np.ndarray:
+        return hash_keys('pincode', self.pincode, self.n)
+    
+    @cached_property
+    def country(self) -> np.ndarray:
+        return self._objects(customer_field(order, 'country') for order in self.orders)
+
+class Feature:
+    """
+    A single named feature with per-row and columnar implementations
+    
+    row(order) returns the feature value for one order dict;
+    column(cols) returns a length-n array for an OrderColumns batch.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        group: str,
+        row: Callable[[Dict[str, Any]], float],
+        column: Callable[[OrderColumns], np.ndarray],
+        default: float = 0.0
+    ):
+        self.name = name
+        self.group = group
+        self.row = row
+        self.column = column
+        self.default = default
+
+class FeaturePlan:
+    """
+    Ordered, deduplicated list of features laid out by a FeatureSchema
+    
+    Runs either per row (extract_into) or per batch (extract_columns); both
+    write float32 values straight into preallocated arrays by column index.
+    """
+    
+    def __init__(self, schema: FeatureSchema, features: List[Feature]):
+        self.schema = schema
+        self.features = features
+        self._row_fns = [(i, feature.row) for i, feature in enumerate(features)]
+    
+    def extract_into(self, order: Dict[str, Any], out: np.ndarray) -> np.ndarray:
+        for i, row_fn in self._row_fns:
+            out[i] = row_fn(order)
+        return out
+    
+    def extract_columns(self, orders: List[Dict[str, Any]], out: Optional[np.ndarray] = None) -> np.ndarray:
+        n = len(orders)
+        matrix = out if out is not None else np.empty((n, self.schema.n_features), dtype=np.float32)
+        if n == 0:
+            return matrix
+        
+        cols = OrderColumns(orders)
+        for i, feature in enumerate(self.features):
+            matrix[:, i] = feature.column(cols)
+        return matrix
+
+class FeatureRegistry:
+    """
+    Registry of all features, keyed by name
+    
+    Each feature is declared exactly once by its group module; registering a
+    name twice is an error, so groups can't silently recompute each other's
+    features.
+    """
+    
+    def __init__(self):
+        self.features: Dict[str, Feature] = {}
+        self.groups: Dict[str, List[str]] = {}
+    
+    def register(
+        self,
+        group: str,
+        name: str,
+        row: Callable[[Dict[str, Any]], float],
+        column: Callable[[OrderColumns], np.ndarray],
+        default: float = 0.0
+    ) -> Feature:
+        """
+        Declare a feature under a group
+        """
+        if name in self.features:
+            raise ValueError(f"Feature '{name}' is already registered by group '{self.features[name].group}'")
+        feature = Feature(name, group, row, column, default)
+        self.features[name] = feature
+        self.groups.setdefault(group, []).append(name)
+        return feature
+    
+    def names(self, groups: Optional[List[str]] = None) -> List[str]:
+        """
+        Feature names in registration order, optionally limited to some groups
+        """
+        selected = groups if groups is not None else list(self.groups)
+        return [name for group in selected for name in self.groups.get(group, [])]
+    
+    def schema(self, version: str, names: Optional[List[str]] = None) -> FeatureSchema:
+        """
+        Build a schema for the given (or all) registered features
+        """
+        names = names if names is not None else self.names()
+        return FeatureSchema(version, names, defaults=[self.features[name].default for name in names])
+    
+    def plan(self, schema: FeatureSchema) -> FeaturePlan:
+        """
+        Build an extraction plan for a schema
+        Raises SchemaMismatchError if the schema uses features this service doesn't define
+        """
+        unknown = [name for name in schema.names if name not in self.features]
+        if unknown:
+            raise SchemaMismatchError(f"Feature schema v{schema.version} uses unknown features: {unknown}")
+        unsupported = sorted(set(schema.dtypes) - {'float32'})
+        if unsupported:
+            raise SchemaMismatchError(f"Feature schema v{schema.version} uses unsupported dtypes: {unsupported}")
+        return FeaturePlan(schema, [self.features[name] for name in schema.names])
+    
+    def extract_group(self, group: str, order: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Extract one group's features from an order as a dict
+        """
+        return {name: float(self.features[name].row(order)) for name in self.groups.get(group, [])}
+
+registry = FeatureRegistry()
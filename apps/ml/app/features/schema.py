@@ -0,0 +1,113 @@
+"""
+Versioned feature schema shared by training and serving
+"""
+import hashlib
+import json
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+class SchemaMismatchError(Exception):
+    """
+    Raised when a model was trained on a different feature schema than the one being served
+    """
+    pass
+
+class FeatureSchema:
+    """
+    Ordered feature names with their dtypes and default values
+    
+    The schema fixes the column order of every feature row/matrix, so models
+    never depend on dict ordering. It is saved next to the model at training
+    time and checked when the model is loaded.
+    """
+    
+    def __init__(
+        self,
+        version: str,
+        names: List[str],
+        dtypes: Optional[List[str]] = None,
+        defaults: Optional[List[float]] = None
+    ):
+        self.version = version
+        self.names = list(names)
+        self.dtypes = list(dtypes) if dtypes is not None else ['float32'] * len(self.names)
+        self.defaults = list(defaults) if defaults is not None else [0.0] * len(self.names)
+        if not (len(self.names) == len(self.dtypes) == len(self.defaults)):
+            raise ValueError("Feature schema names, dtypes and defaults must have the same length")
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Feature schema names must be unique")
+        
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.default_row = np.asarray(self.defaults, dtype=np.float32)
+    
+    @property
+    def n_features(self) -> int:
+        return len(self.names)
+    
+    @property
+    def fingerprint(self) -> str:
+        """
+        Short digest of version, names and dtypes
+        """
+        payload = json.dumps([self.version, self.names, self.dtypes]).encode()
+        return hashlib.blake2b(payload, digest_size=8).hexdigest()
+    
+    def new_row(self) -> np.ndarray:
+        """
+        Allocate a float32 feature row filled with defaults
+        """
+        return self.default_row.copy()
+    
+    def new_matrix(self, n_rows: int) -> np.ndarray:
+        """
+        Allocate a float32 feature matrix filled with defaults
+        """
+        return np.tile(self.default_row, (n_rows, 1))
+    
+    def vector_from_dict(self, features: Dict[str, float]) -> np.ndarray:
+        """
+        Build a feature row from a name -> value dict in schema order
+        """
+        row = self.new_row()
+        for name, value in features.items():
+            if name in self.index:
+                row[self.index[name]] = value
+        return row
+    
+    def check_compatible(self, other: 'FeatureSchema'):
+        """
+        Raise SchemaMismatchError unless other describes the same feature layout
+        """
+        if self.version != other.version or self.names != other.names or self.dtypes != other.dtypes:
+            raise SchemaMismatchError(
+                f"Feature schema mismatch: v{other.version} {other.names} "
+                f"does not match v{self.version} {self.names}"
+            )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'names': self.names,
+            'dtypes': self.dtypes,
+            'defaults': self.defaults,
+            'fingerprint': self.fingerprint,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'FeatureSchema':
+        return cls(data['version'], data['names'], data.get('dtypes'), data.get('defaults'))
+    
+    def save(self, path: str):
+        """
+        Write the schema as JSON
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+    
+    @classmethod
+    def load(cls, path: str) -> 'FeatureSchema':
+        """
+        Read a schema written by save()
+        """
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -1,52 +1,77 @@
 """
 Feature store for caching and managing features
 """
-from typing import Dict, Any, List
-import redis
-import json
-import os
-
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+from typing import Dict, List, Optional
+import numpy as np
+from app.features.extractor import FEATURE_SCHEMA
+from app.features.schema import FeatureSchema
+from app.utils.redis_pool import redis_pool
 
 class FeatureStore:
     """
     Store and retrieve features from Redis cache
+    
+    Vectors are stored as packed float32 in schema order rather than JSON,
+    under keys namespaced by the schema fingerprint so a schema change never
+    reads back vectors laid out for a different feature set.
     """
     
-    def __init__(self):
-        self.redis_client = redis.from_url(REDIS_URL) if REDIS_URL else None
+    def __init__(self, schema: FeatureSchema = FEATURE_SCHEMA, redis_client=None):
+        self.schema = schema
+        self.redis_client = redis_client if redis_client is not None else redis_pool.sync_client()
+    
+    def _key(self, order_id: str) -> str:
+        return f"features:{self.schema.fingerprint}:{order_id}"
+    
+    def pack(self, features: Dict[str, float]) -> bytes:
+        return self.schema.vector_from_dict(features).astype('<f4', copy=False).tobytes()
     
-    def get_features(self, order_id: str) -> Dict[str, float] | None:
+    def unpack(self, data: bytes) -> Dict[str, float]:
+        vector = np.frombuffer(data, dtype='<f4')
+        if len(vector) != self.schema.n_features:
+            raise ValueError(f"Stored vector has {len(vector)} features, schema expects {self.schema.n_features}")
+        return dict(zip(self.schema.names, vector.tolist()))
+    
+    def get_features(self, order_id: str) -> Optional[Dict[str, float]]:
         """
         Get cached features for an order
         """
-        if not self.redis_client:
-            return None
+        return self.get_many_features([order_id])[0]
+    
+    def set_features(self, order_id: str, features: Dict[str, float], ttl: int = 3600):
+        """
+        Cache features for an order
+        """
+        self.set_many_features({order_id: features}, ttl=ttl)
+    
+    def get_many_features(self, order_ids: List[str]) -> List[Optional[Dict[str, float]]]:
+        """
+        Get cached features for several orders with a single MGET
+        """
+        if not self.redis_client or not order_ids:
+            return [None] * len(order_ids)
         
         try:
-            cached = self.redis_client.get(f"features:{order_id}")
-            if cached:
-                return json.loads(cached)
+            cached = self.redis_client.mget([self._key(order_id) for order_id in order_ids])
+            return [self.unpack(data) if data else None for data in cached]
         except Exception as e:
             print(f"Error getting features from cache: {e}")
         
-        return None
+        return [None] * len(order_ids)
     
-    def set_features(self, order_id: str, features: Dict[str, float], ttl: int = 3600):
+    def set_many_features(self, features_by_order: Dict[str, Dict[str, float]], ttl: int = 3600):
         """
-        Cache features for an order
+        Cache features for several orders with pipelined SETEX
         """
-        if not self.redis_client:
+        if not self.redis_client or not features_by_order:
             return
         
         try:
-            self.redis_client.setex(
-                f"features:{order_id}",
-                ttl,
-                json.dumps(features)
-            )
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                for order_id, features in features_by_order.items():
+                    pipe.setex(self._key(order_id), ttl, self.pack(features))
+                pipe.execute()
         except Exception as e:
             print(f"Error setting features in cache: {e}")
 
 feature_store = FeatureStore()
-
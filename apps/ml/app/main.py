@@ -1,8 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import os
+import numpy as np
 from dotenv import load_dotenv
 from app.routes.score import router as score_router
+from app.routes.admin import router as admin_router
+from app.routes.metrics import router as metrics_router
+from app.middleware.metrics import MetricsMiddleware
+from app.config import config
+from app.utils.model_loader import model_loader, candidate_loader, score_batch, WARM_UP_ORDERS
+from app.utils.shadow import shadow_scorer
+from app.utils.redis_pool import redis_pool
+from app.utils.executor import inference_executor
+from app.utils.profiler import slow_request_profiler
 
 load_dotenv()
 
@@ -21,6 +32,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency by route; outermost so it covers the whole request
+app.add_middleware(MetricsMiddleware)
+
 # Health check
 @app.get("/health")
 async def health():
@@ -28,9 +42,112 @@ async def health():
 
 # Register routes
 app.include_router(score_router)
+app.include_router(admin_router)
+app.include_router(metrics_router)
 
-if __name__ == "__main__":
+@app.on_event("startup")
+async def startup():
+    # Process pool workers hold their own copy of the model; replace them on reload
+    model_loader.on_swap(lambda bundle: inference_executor.recycle())
+    
+    # Load and warm up the model before taking traffic instead of on the first request
+    try:
+        bundle = await asyncio.to_thread(model_loader.reload_model)
+        # Start the inference pool (and warm process workers) with one prediction
+        row = bundle.extractor.extract_into(WARM_UP_ORDERS[0], bundle.schema.new_row())
+        await inference_executor.run(score_batch, row[np.newaxis, :], bundle.version)
+    except Exception as e:
+        print(f"Warning: No model loaded at startup: {e}")
+    
+    model_loader.start_watching(config.MODEL_WATCH_INTERVAL)
+    slow_request_profiler.start()
+    
+    # Load the candidate in the background; canary traffic starts once it is warm
+    if candidate_loader is not None:
+        candidate_loader.reload_in_background()
+        candidate_loader.start_watching(config.MODEL_WATCH_INTERVAL)
+
+@app.on_event("shutdown")
+async def shutdown():
+    model_loader.stop_watching()
+    if candidate_loader is not None:
+        candidate_loader.stop_watching()
+    slow_request_profiler.stop()
+    shadow_scorer.shutdown()
+    inference_executor.shutdown()
+    await redis_pool.close()
+
+def serve_prefork(workers: int, host: str, port: int):
+    """
+    Pre-fork server: load the model once, then fork workers that share it
+    
+    The compiled model and aggregate index are memory-mapped and the rest of
+    the loaded state is frozen out of the garbage collector before forking,
+    so workers keep sharing the parent's pages instead of each holding a
+    copy. Workers that exit unexpectedly are replaced.
+    """
+    import gc
+    import signal
+    import socket
     import uvicorn
-    port = int(os.getenv("PORT", 5000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    from app.features.aggregates import aggregate_index
+    
+    try:
+        model_loader.current().warm_up()
+        aggregate_index.refresh()
+    except Exception as e:
+        print(f"Warning: No model loaded before forking: {e}")
+    # Keep the collector from touching (and so copying) inherited objects
+    gc.freeze()
+    
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    
+    children = set()
+    stopping = False
+    
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            server = uvicorn.Server(uvicorn.Config(app, host=host, port=port))
+            server.run(sockets=[sock])
+            os._exit(0)
+        children.add(pid)
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    for _ in range(workers):
+        spawn()
+    print(f"Serving on {host}:{port} with {workers} pre-forked workers")
+    
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}, restarting")
+            spawn()
+
+if __name__ == "__main__":
+    if config.WEB_CONCURRENCY > 1:
+        serve_prefork(config.WEB_CONCURRENCY, "0.0.0.0", config.PORT)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=config.PORT)
 
@@ -0,0 +1,51 @@
+"""
+Per-request latency metrics and slow-request profiling
+"""
+import time
+from app.utils.metrics import REQUEST_SECONDS
+from app.utils.profiler import slow_request_profiler
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency by route template and status
+    
+    Routes are labelled by their path template (e.g. /score/batch) rather
+    than the raw URL, so label cardinality stays bounded. Kept as raw ASGI
+    rather than BaseHTTPMiddleware to avoid its per-request task overhead.
+    """
+    
+    def __init__(self, app, profiler=slow_request_profiler):
+        self.app = app
+        self.profiler = profiler
+        self._children = {}
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status = 500
+        profiling = self.profiler.enabled
+        if profiling:
+            self.profiler.enter()
+        started = time.monotonic()
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            ended = time.monotonic()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            key = (scope["method"], path, status)
+            child = self._children.get(key)
+            if child is None:
+                child = self._children.setdefault(key, REQUEST_SECONDS.labels(*key))
+            child.observe(ended - started)
+            if profiling:
+                self.profiler.exit(f"{scope['method']} {scope['path']}", started, ended)
@@ -0,0 +1,41 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends
+from app.utils.model_loader import model_loader
+from app.utils.shadow import shadow_scorer
+from app.middleware.auth import verify_api_key
+
+router = APIRouter()
+
+@router.get("/admin/model", dependencies=[Depends(verify_api_key)])
+async def model_status():
+    """
+    Report the live model version, versions still serving in-flight
+    requests and reload history
+    """
+    return model_loader.stats()
+
+@router.post("/admin/model/reload", dependencies=[Depends(verify_api_key)])
+async def reload_model():
+    """
+    Load the model from disk, warm it up and swap it in
+    Requests keep being served by the current model while this runs
+    """
+    previous = model_loader.bundle.version if model_loader.bundle is not None else None
+    try:
+        bundle = await asyncio.to_thread(model_loader.reload_model)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reloading model: {str(e)}")
+    
+    return {
+        "previousVersion": previous,
+        "version": bundle.version,
+        "reloaded": bundle.version != previous,
+    }
+
+@router.get("/admin/shadow", dependencies=[Depends(verify_api_key)])
+async def shadow_stats():
+    """
+    Report how the candidate model's scores and latency compare with the
+    primary's on shadowed traffic, and the canary share
+    """
+    return shadow_scorer.stats()
@@ -0,0 +1,125 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from app.utils.metrics import metrics
+from app.utils.model_loader import model_loader, candidate_loader
+from app.utils.cache import cache
+from app.utils.batcher import micro_batcher
+from app.utils.executor import inference_executor
+from app.utils.shadow import shadow_scorer
+from app.utils.profiler import slow_request_profiler
+from app.middleware.auth import verify_api_key
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+def _loaders():
+    loaders = [("primary", model_loader)]
+    if candidate_loader is not None:
+        loaders.append(("candidate", candidate_loader))
+    return loaders
+
+def _rule_counts(counts: str):
+    bundle = model_loader.bundle
+    if bundle is None or bundle.rules is None:
+        return []
+    return [((name,), count) for name, count in getattr(bundle.rules, counts).items()]
+
+def _model_info():
+    info = []
+    for role, loader in _loaders():
+        bundle = loader.bundle
+        if bundle is not None:
+            described = bundle.describe()
+            info.append(((role, described["version"], described["engine"], described["featureSchema"]), 1))
+    return info
+
+# State the service already tracks is read at scrape time instead of
+# being counted twice on the request path
+metrics.callback(
+    "ml_cache_hits_total", "Prediction cache hits by tier",
+    lambda: [(("local",), cache.local.hits), (("redis",), cache.redis_hits)],
+    kind="counter", label_names=("tier",),
+)
+metrics.callback(
+    "ml_cache_misses_total", "Prediction cache misses by tier",
+    lambda: [(("local",), cache.local.misses), (("redis",), cache.redis_misses)],
+    kind="counter", label_names=("tier",),
+)
+metrics.callback(
+    "ml_cache_coalesced_total", "Cache misses that waited on an identical in-flight prediction",
+    lambda: cache.coalesced, kind="counter",
+)
+metrics.callback(
+    "ml_cache_local_entries", "Entries in the in-process prediction cache",
+    lambda: cache.local.stats()["size"],
+)
+metrics.callback(
+    "ml_model_info", "Loaded model version, engine and feature schema",
+    _model_info, label_names=("role", "version", "engine", "schema"),
+)
+metrics.callback(
+    "ml_model_reloads_total", "Model reloads by outcome",
+    lambda: [
+        ((role, outcome), count)
+        for role, loader in _loaders()
+        for outcome, count in (("success", loader.reloads), ("failure", loader.failed_reloads))
+    ],
+    kind="counter", label_names=("role", "outcome"),
+)
+metrics.callback(
+    "ml_rule_checks_total", "Orders checked against the rule tier of the primary model",
+    lambda: model_loader.bundle.rules.checked if model_loader.bundle is not None and model_loader.bundle.rules is not None else None,
+    kind="counter",
+)
+metrics.callback(
+    "ml_rule_hits_total", "Orders answered by each rule instead of the model",
+    lambda: _rule_counts("hits"), kind="counter", label_names=("rule",),
+)
+metrics.callback(
+    "ml_rule_audits_total", "Rule hits also scored by the model",
+    lambda: _rule_counts("audited"), kind="counter", label_names=("rule",),
+)
+metrics.callback(
+    "ml_rule_audit_agreements_total", "Audited rule hits the model scored within the rule tolerance",
+    lambda: _rule_counts("agreed"), kind="counter", label_names=("rule",),
+)
+metrics.callback(
+    "ml_inference_in_flight", "Inference jobs queued or running on the executor",
+    lambda: inference_executor.in_flight,
+)
+metrics.callback(
+    "ml_inference_rejected_total", "Inference jobs rejected because the queue was full",
+    lambda: inference_executor.rejected, kind="counter",
+)
+metrics.callback(
+    "ml_microbatch_pending", "Rows waiting for the next micro-batch",
+    lambda: micro_batcher.stats()["pending"],
+)
+metrics.callback(
+    "ml_shadow_pending", "Shadow scoring jobs queued for the candidate model",
+    lambda: shadow_scorer.pending,
+)
+metrics.callback(
+    "ml_shadow_dropped_total", "Shadow samples dropped because the queue was full",
+    lambda: shadow_scorer.dropped, kind="counter",
+)
+metrics.callback(
+    "ml_slow_requests_total", "Requests slower than the profiling threshold",
+    lambda: slow_request_profiler.slow_requests if slow_request_profiler.enabled else None,
+    kind="counter",
+)
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    """
+    Metrics for this worker process in the Prometheus text format
+    """
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@router.get("/admin/profiles", dependencies=[Depends(verify_api_key)])
+async def slow_request_profiles():
+    """
+    Folded stack samples of the most recent slow requests
+    """
+    return slow_request_profiler.stats()
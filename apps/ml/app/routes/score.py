@@ -1,13 +1,25 @@
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Dict, Any
-from app.features.extractor import FeatureExtractor
-from app.utils.model_loader import model_loader
-from app.utils.cache import cache
+from pydantic import BaseModel, ValidationError
+from typing import Dict, Any, List, Optional
+import asyncio
+import random
+import numpy as np
+from app.config import config
+from app.utils.model_loader import model_loader, score_batch
+from app.utils.cache import cache, feature_cache_key
+from app.utils.batcher import micro_batcher
+from app.utils.executor import inference_executor, InferenceOverloadedError
+from app.utils.shadow import shadow_scorer
+from app.utils.metrics import RULES_STAGE, EXTRACT_STAGE, INFERENCE_STAGE, BATCH_ROWS
 from app.middleware.auth import verify_api_key
 
 router = APIRouter()
 
+BATCH_ROWS_REQUEST = BATCH_ROWS.labels('batch_request')
+
+# Background audits of rule hits, referenced until they finish
+_audit_tasks = set()
+
 class OrderFeatures(BaseModel):
     amount: float
     currency: str
@@ -15,40 +27,232 @@ class OrderFeatures(BaseModel):
     customer: Dict[str, Any]
     email: str
     phone: str
+    platform: Optional[str] = None
 
 class ScoreResponse(BaseModel):
     riskScore: float
     confidence: float
 
-@router.post("/score", response_model=ScoreResponse, dependencies=[Depends(verify_api_key)])
-async def score_order(order: OrderFeatures):
+class BatchScoreRequest(BaseModel):
+    orders: List[Dict[str, Any]]
+
+class BatchScoreResult(BaseModel):
+    index: int
+    riskScore: Optional[float] = None
+    confidence: Optional[float] = None
+    error: Optional[str] = None
+
+class BatchScoreResponse(BaseModel):
+    results: List[BatchScoreResult]
+
+def _audit_rule_hits(bundle, orders: List[Dict[str, Any]], rules: list):
     """
-    Score an order for RTO risk
+    Also score a sample of rule hits with the model, off the response path,
+    to track how often the rule and the model still agree
+    Audits are skipped rather than queued while the executor is busy, so
+    they never take inference capacity from live requests
     """
+    if len(_audit_tasks) >= inference_executor.max_workers or inference_executor.in_flight * 2 >= inference_executor.queue_limit:
+        return
+    sampled = [(order, rule) for order, rule in zip(orders, rules) if random.random() < config.RULES_AUDIT_RATE]
+    if not sampled:
+        return
+    task = asyncio.create_task(_audit(bundle, sampled))
+    _audit_tasks.add(task)
+    task.add_done_callback(_audit_tasks.discard)
+
+async def _audit(bundle, sampled: list):
     try:
-        # Check cache first
-        order_id = f"{order.email}_{order.phone}_{order.amount}"
-        cached = cache.get(f"score:{order_id}")
-        if cached:
-            return ScoreResponse(**cached)
-        
-        # Extract features
-        extractor = FeatureExtractor()
-        features = extractor.extract(order.dict())
+        feature_matrix = bundle.extractor.extract_columns([order for order, _ in sampled])
+        scores = await inference_executor.run(score_batch, feature_matrix, bundle.version)
+        for (_, rule), (risk_score, _) in zip(sampled, scores.tolist()):
+            bundle.rules.record_audit(rule, risk_score)
+    except Exception as e:
+        print(f"Error auditing rule hits: {e}")
+
+async def _score_with_model(bundle, order_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Score one order with the model, through the prediction cache
+    """
+    # Extract features
+    with EXTRACT_STAGE.time():
+        feature_row = bundle.extractor.extract_into(order_data, bundle.schema.new_row())
         
-        # Predict risk score
-        risk_score = model_loader.predict(features)
-        confidence = 0.8  # Placeholder confidence
+        # Key on the feature vector itself, namespaced by model and schema version
+        cache_key = feature_cache_key("score", feature_row, bundle.schema, bundle.version)
+    
+    async def compute() -> Dict[str, Any]:
+        # Predict risk score, coalescing with concurrent requests when enabled
+        with INFERENCE_STAGE.time():
+            if config.SCORE_MICROBATCH_ENABLED:
+                risk_score, confidence = await micro_batcher.predict(feature_row, bundle.version)
+            else:
+                scores = await inference_executor.run(score_batch, feature_row[np.newaxis, :], bundle.version)
+                risk_score, confidence = scores[0].tolist()
         
-        result = {
+        return {
             "riskScore": risk_score,
             "confidence": confidence
         }
+    
+    # Concurrent misses for the same feature vector share one prediction
+    return await cache.get_or_compute(cache_key, compute, ttl=config.SCORE_CACHE_TTL)
+
+@router.post("/score", response_model=ScoreResponse, dependencies=[Depends(verify_api_key)])
+async def score_order(order: OrderFeatures):
+    """
+    Score an order for RTO risk
+    """
+    try:
+        # Pin one model version for the whole request, even across a reload
+        canary = shadow_scorer.route_canary()
+        bundle = canary or model_loader.current()
+        order_data = order.dict()
+        
+        # Trivially classified orders skip extraction, the cache and the model
+        rule = None
+        if bundle.rules is not None:
+            with RULES_STAGE.time():
+                rule = bundle.rules.match(order_data)
         
-        # Cache result
-        cache.set(f"score:{order_id}", result, ttl=3600)
+        if rule is not None:
+            result = {
+                "riskScore": rule.risk_score,
+                "confidence": rule.confidence
+            }
+            _audit_rule_hits(bundle, [order_data], [rule])
+        else:
+            result = await _score_with_model(bundle, order_data)
+        
+        # Compare a sample against the candidate model in the background
+        if canary is None:
+            shadow_scorer.submit([order_data], [result["riskScore"]])
         
         return ScoreResponse(**result)
+    except InferenceOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error scoring order: {str(e)}")
 
+@router.post("/score/batch", response_model=BatchScoreResponse, dependencies=[Depends(verify_api_key)])
+async def score_orders(request: BatchScoreRequest):
+    """
+    Score a batch of orders for RTO risk
+    Results are returned in input order; invalid orders get a per-item error
+    instead of failing the whole batch
+    """
+    if len(request.orders) > config.SCORE_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.orders)} orders (max {config.SCORE_BATCH_MAX_SIZE})"
+        )
+    
+    results = [BatchScoreResult(index=index) for index in range(len(request.orders))]
+    
+    # Validate each order on its own so one bad order doesn't reject the batch
+    valid_indices = []
+    valid_orders = []
+    for index, raw_order in enumerate(request.orders):
+        try:
+            valid_orders.append(OrderFeatures(**raw_order).dict())
+            valid_indices.append(index)
+        except ValidationError as e:
+            details = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            )
+            results[index].error = f"Invalid order: {details}"
+    
+    if not valid_orders:
+        return BatchScoreResponse(results=results)
+    
+    try:
+        # Pin one model version for the whole batch, even across a reload
+        canary = shadow_scorer.route_canary()
+        bundle = canary or model_loader.current()
+        
+        # Answer trivially classified orders from the rule tier
+        scored = [None] * len(valid_orders)
+        if bundle.rules is not None:
+            with RULES_STAGE.time():
+                rules = bundle.rules.match_many(valid_orders)
+            hits = [position for position, rule in enumerate(rules) if rule is not None]
+            for position in hits:
+                scored[position] = {
+                    "riskScore": rules[position].risk_score,
+                    "confidence": rules[position].confidence
+                }
+            _audit_rule_hits(bundle, [valid_orders[position] for position in hits], [rules[position] for position in hits])
+        remaining = [position for position, result in enumerate(scored) if result is None]
+        
+        if remaining:
+            # Extract features for the remaining orders as one matrix
+            with EXTRACT_STAGE.time():
+                feature_matrix = bundle.extractor.extract_columns([valid_orders[position] for position in remaining])
+                cache_keys = [
+                    feature_cache_key("score", feature_row, bundle.schema, bundle.version)
+                    for feature_row in feature_matrix
+                ]
+            
+            # Look up every order's cached score in one round-trip
+            cached = await cache.get_many(cache_keys)
+            
+            # Predict the misses in a single vectorized call
+            missing = [row for row, result in enumerate(cached) if result is None]
+            if missing:
+                BATCH_ROWS_REQUEST.observe(len(missing))
+                with INFERENCE_STAGE.time():
+                    scores = await inference_executor.run(score_batch, feature_matrix[missing], bundle.version)
+                computed = {}
+                for row, (risk_score, confidence) in zip(missing, scores.tolist()):
+                    cached[row] = {
+                        "riskScore": risk_score,
+                        "confidence": confidence
+                    }
+                    computed[cache_keys[row]] = cached[row]
+                await cache.set_many(computed, ttl=config.SCORE_CACHE_TTL)
+            
+            for position, result in zip(remaining, cached):
+                scored[position] = result
+    except InferenceOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error scoring orders: {str(e)}")
+    
+    for index, result in zip(valid_indices, scored):
+        results[index].riskScore = result["riskScore"]
+        results[index].confidence = result["confidence"]
+    
+    # Compare a sample against the candidate model in the background
+    if canary is None:
+        shadow_scorer.submit(valid_orders, [result["riskScore"] for result in scored])
+    
+    return BatchScoreResponse(results=results)
+
+@router.get("/score/microbatch/stats", dependencies=[Depends(verify_api_key)])
+async def microbatch_stats():
+    """
+    Report micro-batching configuration, achieved batch-size histogram
+    and inference queue depth
+    """
+    return {**micro_batcher.stats(), "executor": inference_executor.stats()}
+
+@router.get("/score/cache/stats", dependencies=[Depends(verify_api_key)])
+async def cache_stats():
+    """
+    Report prediction cache hit rates per tier, evictions and coalesced misses
+    """
+    return {**cache.stats(), "modelVersion": model_loader.load_version()}
+
+@router.get("/score/rules/stats", dependencies=[Depends(verify_api_key)])
+async def rule_stats():
+    """
+    Report the loaded rule tier, its hit rate and how often audited hits
+    agreed with the model
+    """
+    bundle = model_loader.current()
+    return {
+        "enabled": config.RULES_ENABLED,
+        "auditRate": config.RULES_AUDIT_RATE,
+        "modelVersion": bundle.version,
+        **(bundle.rules.stats() if bundle.rules is not None else {"rules": []}),
+    }
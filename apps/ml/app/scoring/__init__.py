@@ -0,0 +1,3 @@
+from .bulk import BulkScorer
+
+__all__ = ['BulkScorer']
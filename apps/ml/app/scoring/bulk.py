@@ -0,0 +1,272 @@
+"""
+Offline bulk scoring of stored orders
+"""
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import numpy as np
+from bson import json_util
+from pymongo import UpdateOne
+from app.utils.model_loader import ModelBundle, MODEL_ENGINE
+
+# Order fields read by the feature extractors
+SCORE_PROJECTION = {
+    'amount': 1,
+    'currency': 1,
+    'paymentMode': 1,
+    'platform': 1,
+    'email': 1,
+    'phone': 1,
+    'customer': 1,
+}
+
+# Model used by this process's scoring jobs; inherited by forked pool workers
+_bundle: Optional[ModelBundle] = None
+
+def _init_worker(model_path: str, engine: str):
+    """
+    Process pool initializer: load the model unless it was inherited on fork
+    """
+    global _bundle
+    if _bundle is None or _bundle.model_path != model_path:
+        _bundle = ModelBundle.load(model_path, engine)
+
+def _score_chunk(orders: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Risk scores for a chunk of orders, as /score/batch returns them
+    
+    Orders matching the rule tier get the rule's score; the rest are
+    featurized and scored in one vectorized call through score_batch.
+    """
+    scores = np.empty(len(orders), dtype=np.float64)
+    remaining = list(range(len(orders)))
+    if _bundle.rules is not None:
+        rules = _bundle.rules.match_many(orders)
+        remaining = []
+        for position, rule in enumerate(rules):
+            if rule is None:
+                remaining.append(position)
+            else:
+                scores[position] = rule.risk_score
+    if remaining:
+        feature_matrix = _bundle.extractor.extract_columns([orders[position] for position in remaining])
+        scores[remaining] = _bundle.score_batch(feature_matrix)[:, 0]
+    return scores
+
+class Checkpoint:
+    """
+    Progress of a bulk scoring run, saved after every chunk written
+    
+    Orders are streamed in _id order, so the last written _id is enough to
+    resume: everything at or below it has been scored. The file is replaced
+    atomically, so a crash leaves either the old or the new checkpoint.
+    """
+    
+    def __init__(self, path: Optional[str]):
+        self.path = path
+    
+    def load(self) -> Optional[Dict[str, Any]]:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json_util.loads(f.read())
+    
+    def save(self, state: Dict[str, Any]):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(json_util.dumps(state))
+        os.replace(tmp_path, self.path)
+    
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+class BulkScorer:
+    """
+    Stream orders from MongoDB through the model and write back riskScore
+    
+    Orders are read with a projection in _id order from one cursor and cut
+    into chunks of chunk_size. Chunks are featurized and scored column-wise
+    on a process pool (or in-process with workers=0) while the next chunks
+    are being read, and each chunk's scores are written back with one
+    unordered bulk_write of riskScore, riskModelVersion and riskScoredAt.
+    Orders matching the model's rule tier get the rule's score, so stored
+    scores are the ones /score would return.
+    
+    Results are written in stream order, so the checkpoint always names the
+    last _id below which every order has been scored. With rescore_all
+    unset, orders already scored by this model version are skipped, so an
+    interrupted run can also simply be started again.
+    """
+    
+    def __init__(
+        self,
+        collection,
+        model_path: str,
+        engine: str = MODEL_ENGINE,
+        workers: int = 0,
+        chunk_size: int = 5000,
+        max_rate: float = 0.0,
+        checkpoint_path: Optional[str] = None,
+        rescore_all: bool = False,
+        query: Optional[Dict[str, Any]] = None
+    ):
+        self.collection = collection
+        self.model_path = model_path
+        self.engine = engine
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_rate = max_rate
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.rescore_all = rescore_all
+        self.query = dict(query or {})
+        self.bundle: Optional[ModelBundle] = None
+        self.scored = 0
+        self.updated = 0
+    
+    def _query(self, version: str, after_id: Any) -> Dict[str, Any]:
+        query = dict(self.query)
+        if not self.rescore_all:
+            query['riskModelVersion'] = {'$ne': version}
+        if after_id is not None:
+            query['_id'] = {'$gt': after_id}
+        return query
+    
+    def _chunks(self, cursor):
+        chunk = []
+        for order in cursor:
+            chunk.append(order)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    def _throttle(self, started: float, submitted: int):
+        """
+        Sleep until submitted orders fit under max_rate orders/sec
+        """
+        if self.max_rate <= 0:
+            return
+        delay = started + submitted / self.max_rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    
+    def _write(self, ids: List[Any], scores: np.ndarray, version: str):
+        scored_at = datetime.now(timezone.utc)
+        # Bump updatedAt too: incremental training only fetches orders updated
+        # since its last run, and a newly scored order may now be labeled
+        requests = [
+            UpdateOne(
+                {'_id': order_id},
+                {'$set': {
+                    'riskScore': float(score),
+                    'riskModelVersion': version,
+                    'riskScoredAt': scored_at,
+                    'updatedAt': scored_at,
+                }}
+            )
+            for order_id, score in zip(ids, scores)
+        ]
+        result = self.collection.bulk_write(requests, ordered=False)
+        self.scored += len(ids)
+        self.updated += result.modified_count
+    
+    def run(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Score every matching order, resuming from the checkpoint if there is one
+        Returns run statistics
+        """
+        global _bundle
+        self.bundle = ModelBundle.load(self.model_path, self.engine)
+        _bundle = self.bundle
+        version = self.bundle.version
+        
+        after_id = None
+        state = self.checkpoint.load()
+        if state is not None and state.get('modelVersion') == version and state.get('query') == self.query:
+            after_id = state['lastId']
+            self.scored = state.get('scored', 0)
+            print(f"Resuming after _id {after_id} ({self.scored} orders already scored)")
+        elif state is not None:
+            print("Ignoring checkpoint from a different model version or query, starting over")
+        resumed_from = self.scored
+        
+        cursor = self.collection.find(
+            self._query(version, after_id),
+            projection=SCORE_PROJECTION,
+            sort=[('_id', 1)],
+            batch_size=self.chunk_size
+        )
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        
+        pool = None
+        if self.workers > 0:
+            pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.model_path, self.engine)
+            )
+        
+        # Chunks being scored, oldest first; bounded so reading can't outrun scoring
+        pending: Deque[Tuple[List[Any], Future]] = deque()
+        max_pending = max(self.workers * 2, 1)
+        started = time.monotonic()
+        submitted = 0
+        last_report = started
+        
+        def drain(count: int):
+            nonlocal last_report
+            while len(pending) > count:
+                ids, future = pending.popleft()
+                self._write(ids, future.result(), version)
+                self.checkpoint.save({
+                    'modelVersion': version,
+                    'query': self.query,
+                    'lastId': ids[-1],
+                    'scored': self.scored,
+                    'updatedAt': datetime.now(timezone.utc).isoformat(),
+                })
+                now = time.monotonic()
+                if now - last_report >= 10:
+                    rate = (self.scored - resumed_from) / max(now - started, 1e-9)
+                    print(f"Scored {self.scored} orders ({rate:.0f}/s)")
+                    last_report = now
+        
+        try:
+            for chunk in self._chunks(cursor):
+                ids = [order.pop('_id') for order in chunk]
+                if pool is not None:
+                    future = pool.submit(_score_chunk, chunk)
+                else:
+                    future = Future()
+                    future.set_result(_score_chunk(chunk))
+                pending.append((ids, future))
+                submitted += len(chunk)
+                drain(max_pending - 1)
+                self._throttle(started, submitted)
+            drain(0)
+        finally:
+            for _, future in pending:
+                future.cancel()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            cursor.close()
+        
+        elapsed = time.monotonic() - started
+        self.checkpoint.clear()
+        return {
+            "modelVersion": version,
+            "scored": self.scored,
+            "updated": self.updated,
+            "seconds": elapsed,
+            "ordersPerSecond": (self.scored - resumed_from) / elapsed if elapsed > 0 else None,
+        }
@@ -0,0 +1,219 @@
+"""
+Offline job building the historical aggregate index served by app.features.aggregates
+"""
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from app.features.aggregates import AGGREGATE_KINDS, CURRENT_FILE, hash_keys
+from app.features.registry import order_field, customer_field
+from app.features.schema import FeatureSchema
+
+# Order fields the aggregates are keyed and labeled by
+AGGREGATE_PROJECTION = {
+    'phone': 1,
+    'email': 1,
+    'customer.pincode': 1,
+    'status': 1,
+}
+
+# Feature columns holding each kind's [order_count, confirm_rate]
+AGGREGATE_FEATURES = {kind: (f'{kind}_order_count', f'{kind}_confirm_rate') for kind in AGGREGATE_KINDS}
+
+def _key_values(kind: str, orders: List[dict]):
+    if kind == 'pincode':
+        return (customer_field(order, 'pincode') for order in orders)
+    return (order_field(order, kind) for order in orders)
+
+def order_key_hashes(orders: List[dict]) -> np.ndarray:
+    """
+    Aggregate key hash per order and kind, as an (n, len(AGGREGATE_KINDS)) uint64 array
+    """
+    keys = np.empty((len(orders), len(AGGREGATE_KINDS)), dtype=np.uint64)
+    for column, kind in enumerate(AGGREGATE_KINDS):
+        keys[:, column] = hash_keys(kind, _key_values(kind, orders), len(orders))
+    return keys
+
+def order_timestamps(orders: List[dict]) -> np.ndarray:
+    """
+    Order creation time in epoch seconds, falling back to updatedAt, then 0
+    """
+    def timestamp(order: dict) -> float:
+        moment = order.get('createdAt') or order.get('updatedAt')
+        if moment is None:
+            return 0.0
+        if moment.tzinfo is None:
+            # MongoDB returns naive UTC datetimes
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+    return np.fromiter((timestamp(order) for order in orders), dtype=np.float64, count=len(orders))
+
+def point_in_time_aggregates(
+    keys: np.ndarray,
+    created: np.ndarray,
+    labels: np.ndarray,
+    prior_weight: float,
+    prior: Optional[float] = None
+) -> Dict[str, np.ndarray]:
+    """
+    [order_count, confirm_rate] per row and kind, counting only the
+    outcomes of orders with the same key created strictly before the row
+    
+    This is what the live index would have returned when each order was
+    placed, so a row's own outcome, and those of later orders, never leak
+    into its features. Rates are smoothed like AggregateBuilder's, and rows
+    without history get a count of 0 and the prior, as unknown keys do at
+    serving time.
+    """
+    labels = np.asarray(labels, dtype=np.float64)
+    if prior is None:
+        prior = float(labels.mean()) if len(labels) else 0.5
+    result = {}
+    for column, kind in enumerate(AGGREGATE_KINDS):
+        kind_keys = keys[:, column]
+        order = np.lexsort((created, kind_keys))
+        sorted_keys = kind_keys[order]
+        sorted_created = created[order]
+        n = len(order)
+        
+        # Start of each row's key group, and of its run of equal timestamps within it
+        positions = np.arange(n)
+        new_key = np.ones(n, dtype=bool)
+        new_key[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        new_time = new_key.copy()
+        new_time[1:] |= sorted_created[1:] != sorted_created[:-1]
+        key_start = np.maximum.accumulate(np.where(new_key, positions, 0))
+        time_start = np.maximum.accumulate(np.where(new_time, positions, 0))
+        
+        confirmed_before = np.zeros(n + 1)
+        np.cumsum(labels[order], out=confirmed_before[1:])
+        counts = (time_start - key_start).astype(np.float64)
+        confirmed = confirmed_before[time_start] - confirmed_before[key_start]
+        # Key hash 0 means the order has nothing to look up
+        unkeyed = sorted_keys == 0
+        counts[unkeyed] = 0.0
+        confirmed[unkeyed] = 0.0
+        
+        stats = np.empty((n, 2), dtype=np.float32)
+        stats[order, 0] = counts
+        stats[order, 1] = (confirmed + prior * prior_weight) / (counts + prior_weight)
+        result[kind] = stats
+    return result
+
+def apply_point_in_time(
+    X: np.ndarray,
+    schema: FeatureSchema,
+    keys: np.ndarray,
+    created: np.ndarray,
+    labels: np.ndarray,
+    prior_weight: float,
+    prior: Optional[float] = None
+):
+    """
+    Overwrite the aggregate feature columns of training rows X in place
+    with point-in-time values (see point_in_time_aggregates)
+    """
+    aggregates = point_in_time_aggregates(keys, created, labels, prior_weight, prior)
+    for kind, names in AGGREGATE_FEATURES.items():
+        for stat, name in enumerate(names):
+            if name in schema.index:
+                X[:, schema.index[name]] = aggregates[kind][:, stat]
+
+class AggregateBuilder:
+    """
+    Aggregate order outcomes per phone, email and pincode hash
+    
+    Each build writes a new version directory next to the live one, then
+    points CURRENT at it with an atomic rename, so serving workers never see
+    a half-written index. Confirm rates are smoothed towards the global
+    rate with prior_weight pseudo-orders, so a single order doesn't yield a
+    rate of exactly 0 or 1.
+    
+    The index counts every known outcome, which is right for scoring new
+    orders but would leak labels into training rows; training uses
+    point_in_time_aggregates instead.
+    """
+    
+    def __init__(self, directory: str, prior_weight: float = 5.0, keep_versions: int = 2):
+        self.directory = directory
+        self.prior_weight = prior_weight
+        self.keep_versions = keep_versions
+    
+    def build(self, orders: Iterable[dict], batch_size: int = 5000) -> str:
+        """
+        Aggregate an iterable of orders and publish the result
+        Returns the new index version
+        """
+        # Per order: one key hash per kind and the label, kept as compact arrays
+        key_parts: Dict[str, List[np.ndarray]] = {kind: [] for kind in AGGREGATE_KINDS}
+        label_parts: List[np.ndarray] = []
+        orders = iter(orders)
+        while True:
+            chunk = list(islice(orders, batch_size))
+            if not chunk:
+                break
+            label_parts.append(np.fromiter(
+                (order.get('status') == 'confirmed' for order in chunk), dtype=np.float64, count=len(chunk)
+            ))
+            for kind in AGGREGATE_KINDS:
+                key_parts[kind].append(hash_keys(kind, _key_values(kind, chunk), len(chunk)))
+        
+        labels = np.concatenate(label_parts) if label_parts else np.empty(0)
+        prior = float(labels.mean()) if len(labels) else 0.5
+        
+        version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+        os.makedirs(self.directory, exist_ok=True)
+        work_dir = os.path.join(self.directory, f".{version}.tmp")
+        os.makedirs(work_dir)
+        
+        sizes = {}
+        for kind in AGGREGATE_KINDS:
+            keys = np.concatenate(key_parts[kind]) if key_parts[kind] else np.empty(0, dtype=np.uint64)
+            keyed = keys != 0
+            unique_keys, inverse = np.unique(keys[keyed], return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(unique_keys))
+            confirmed = np.bincount(inverse, weights=labels[keyed], minlength=len(unique_keys))
+            rates = (confirmed + prior * self.prior_weight) / (counts + self.prior_weight)
+            
+            np.save(os.path.join(work_dir, f'{kind}_keys.npy'), unique_keys.astype(np.uint64))
+            np.save(os.path.join(work_dir, f'{kind}_stats.npy'), np.column_stack([counts, rates]).astype(np.float32))
+            sizes[kind] = len(unique_keys)
+        
+        with open(os.path.join(work_dir, 'meta.json'), 'w') as f:
+            json.dump({
+                'version': version,
+                'orders': len(labels),
+                'prior': prior,
+                'prior_weight': self.prior_weight,
+                'kinds': sizes,
+            }, f, indent=2)
+        os.rename(work_dir, os.path.join(self.directory, version))
+        
+        # Publish: readers either see the old CURRENT or the new one
+        current_tmp = os.path.join(self.directory, f"{CURRENT_FILE}.tmp")
+        with open(current_tmp, 'w') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(current_tmp, os.path.join(self.directory, CURRENT_FILE))
+        print(f"Aggregate index {version} built from {len(labels)} orders: {sizes}")
+        
+        self._prune(version)
+        return version
+    
+    def _prune(self, current: str):
+        """
+        Delete all but the newest keep_versions versions
+        Workers still mapping a deleted version keep reading it until they refresh
+        """
+        versions = sorted(
+            name for name in os.listdir(self.directory)
+            if not name.startswith('.') and name != CURRENT_FILE
+            and os.path.isdir(os.path.join(self.directory, name))
+        )
+        for name in versions[:-self.keep_versions]:
+            if name != current:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
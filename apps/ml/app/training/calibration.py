@@ -0,0 +1,57 @@
+"""
+Fit probability calibrators for trained models
+"""
+from typing import Dict
+import numpy as np
+from app.utils.calibration import ProbabilityCalibrator
+
+# Cap on stored breakpoints; isotonic fits on large sets can keep thousands
+MAX_BREAKPOINTS = 256
+
+# Sparse extremes fit to exactly 0 or 1; never claim certainty from them
+PROBABILITY_BOUNDS = (0.001, 0.999)
+
+def _brier(probabilities: np.ndarray, labels: np.ndarray) -> float:
+    return float(np.mean((probabilities - labels) ** 2))
+
+def fit_calibrator(probabilities: np.ndarray, labels: np.ndarray, max_breakpoints: int = MAX_BREAKPOINTS) -> ProbabilityCalibrator:
+    """
+    Fit an isotonic calibrator mapping raw P(confirmed) to the observed
+    confirmation rate, on held-out rows the model wasn't fitted to
+    
+    The isotonic step function is kept as its breakpoints only; if there
+    are more than max_breakpoints, it is resampled at that many quantiles
+    of the raw probabilities, so the table stays small and lookups stay fast.
+    """
+    from sklearn.isotonic import IsotonicRegression
+    
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.float64)
+    isotonic = IsotonicRegression(y_min=PROBABILITY_BOUNDS[0], y_max=PROBABILITY_BOUNDS[1], out_of_bounds='clip')
+    isotonic.fit(probabilities, labels)
+    
+    raw = np.asarray(isotonic.X_thresholds_, dtype=np.float64)
+    calibrated = np.asarray(isotonic.y_thresholds_, dtype=np.float64)
+    if len(raw) > max_breakpoints:
+        raw = np.unique(np.quantile(probabilities, np.linspace(0.0, 1.0, max_breakpoints)))
+        calibrated = isotonic.predict(raw)
+    if len(raw) < 2:
+        # Degenerate fit (e.g. a constant model): pin the observed rate across the range
+        raw = np.array([0.0, 1.0])
+        calibrated = np.full(2, labels.mean() if len(labels) else 0.5)
+    
+    calibrator = ProbabilityCalibrator(raw, calibrated, {
+        'method': 'isotonic',
+        'rows': int(len(labels)),
+    })
+    calibrator.meta.update(calibration_report(calibrator, probabilities, labels))
+    return calibrator
+
+def calibration_report(calibrator: ProbabilityCalibrator, probabilities: np.ndarray, labels: np.ndarray) -> Dict[str, float]:
+    """
+    Brier score before and after calibration on the given rows
+    """
+    return {
+        'brier_raw': _brier(probabilities, labels),
+        'brier_calibrated': _brier(calibrator.apply(probabilities), labels),
+    }
@@ -0,0 +1,248 @@
+"""
+Export trained tree ensembles to flat NumPy arrays for dependency-light serving
+"""
+import json
+import math
+from typing import Any, Dict, List
+import numpy as np
+from app.features.schema import FeatureSchema
+from app.utils.model_loader import CompiledTreeEnsemble
+
+PARITY_TOLERANCE = 1e-5
+
+class _TreeArrays:
+    """
+    Accumulates nodes of all trees into flat per-node lists
+    """
+    
+    def __init__(self):
+        self.feature: List[int] = []
+        self.threshold: List[float] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.default_left: List[bool] = []
+        self.value: List[float] = []
+        self.gain: List[float] = []
+        self.cover: List[float] = []
+        self.roots: List[int] = []
+    
+    def add_node(self) -> int:
+        """
+        Append a blank node and return its global index
+        """
+        self.feature.append(-1)
+        self.threshold.append(0.0)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.default_left.append(True)
+        self.value.append(0.0)
+        self.gain.append(0.0)
+        self.cover.append(0.0)
+        return len(self.feature) - 1
+    
+    def max_depth(self) -> int:
+        """
+        Depth of the deepest tree (number of splits on the longest path)
+        """
+        left = self.left
+        right = self.right
+        deepest = 0
+        for root in self.roots:
+            stack = [(root, 0)]
+            while stack:
+                node, depth = stack.pop()
+                if left[node] < 0:
+                    deepest = max(deepest, depth)
+                else:
+                    stack.append((left[node], depth + 1))
+                    stack.append((right[node], depth + 1))
+        return deepest
+    
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'feature': np.asarray(self.feature, dtype=np.int32),
+            'threshold': np.asarray(self.threshold, dtype=np.float64),
+            'left': np.asarray(self.left, dtype=np.int32),
+            'right': np.asarray(self.right, dtype=np.int32),
+            'default_left': np.asarray(self.default_left, dtype=np.bool_),
+            'value': np.asarray(self.value, dtype=np.float64),
+            'gain': np.asarray(self.gain, dtype=np.float32),
+            'cover': np.asarray(self.cover, dtype=np.float32),
+            'roots': np.asarray(self.roots, dtype=np.int32),
+        }
+
+def _flatten_xgboost(model) -> tuple:
+    """
+    Flatten an XGBClassifier (binary:logistic, gbtree) into tree arrays
+    """
+    booster = model.get_booster()
+    best_iteration = getattr(model, 'best_iteration', None)
+    if best_iteration is not None:
+        # predict_proba only uses trees up to the best iteration
+        booster = booster[: best_iteration + 1]
+    
+    learner = json.loads(booster.save_raw('json'))['learner']
+    objective = learner['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"Unsupported XGBoost objective for export: {objective}")
+    booster_name = learner['gradient_booster']['name']
+    if booster_name != 'gbtree':
+        raise ValueError(f"Unsupported XGBoost booster for export: {booster_name}")
+    
+    base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+    base_margin = math.log(base_score / (1.0 - base_score))
+    
+    arrays = _TreeArrays()
+    for tree in learner['gradient_booster']['model']['trees']:
+        if any(tree.get('split_type', [])):
+            raise ValueError("Categorical splits are not supported for export")
+        
+        offset = len(arrays.feature)
+        num_nodes = int(tree['tree_param']['num_nodes'])
+        arrays.roots.append(offset)
+        for node in range(num_nodes):
+            index = arrays.add_node()
+            left = tree['left_children'][node]
+            arrays.cover[index] = tree['sum_hessian'][node]
+            if left == -1:
+                # Leaf values live in split_conditions for leaf nodes
+                arrays.value[index] = tree['split_conditions'][node]
+                continue
+            arrays.feature[index] = tree['split_indices'][node]
+            # JSON holds the shortest repr of the float32 threshold; round-trip it exactly
+            arrays.threshold[index] = float(np.float32(tree['split_conditions'][node]))
+            arrays.left[index] = offset + left
+            arrays.right[index] = offset + tree['right_children'][node]
+            arrays.default_left[index] = bool(tree['default_left'][node])
+            arrays.gain[index] = tree['loss_changes'][node]
+    
+    meta = {
+        'kind': 'xgboost',
+        'base_margin': base_margin,
+        'sigmoid_scale': 1.0,
+        # XGBoost compares float32 feature values against float32 thresholds
+        'input_dtype': 'float32',
+        'n_features': int(learner['learner_model_param']['num_feature']),
+    }
+    return arrays, meta
+
+def _flatten_lightgbm(model) -> tuple:
+    """
+    Flatten an LGBMClassifier (binary objective) into tree arrays
+    """
+    best_iteration = getattr(model, 'best_iteration_', None) or None
+    dump = model.booster_.dump_model(num_iteration=best_iteration)
+    objective = dump['objective'].split()
+    if objective[0] != 'binary' or dump['num_tree_per_iteration'] != 1:
+        raise ValueError(f"Unsupported LightGBM objective for export: {dump['objective']}")
+    sigmoid_scale = 1.0
+    for part in objective[1:]:
+        if part.startswith('sigmoid:'):
+            sigmoid_scale = float(part.split(':', 1)[1])
+    
+    arrays = _TreeArrays()
+    
+    def visit(node: Dict[str, Any]) -> int:
+        index = arrays.add_node()
+        if 'leaf_value' in node:
+            arrays.value[index] = node['leaf_value']
+            arrays.cover[index] = node.get('leaf_weight', 0.0)
+            return index
+        
+        if node['decision_type'] != '<=':
+            raise ValueError(f"Unsupported LightGBM split type for export: {node['decision_type']}")
+        threshold = float(node['threshold'])
+        missing_type = node['missing_type']
+        if missing_type == 'Zero':
+            raise ValueError("LightGBM zero_as_missing splits are not supported for export")
+        
+        arrays.feature[index] = node['split_feature']
+        # LightGBM goes left on x <= t; the evaluator goes left on x < t'
+        arrays.threshold[index] = np.nextafter(threshold, np.inf)
+        # With missing_type None, LightGBM treats NaN as 0.0
+        arrays.default_left[index] = node['default_left'] if missing_type == 'NaN' else 0.0 <= threshold
+        arrays.gain[index] = node.get('split_gain', 0.0)
+        arrays.cover[index] = node.get('internal_weight', 0.0)
+        arrays.left[index] = visit(node['left_child'])
+        arrays.right[index] = visit(node['right_child'])
+        return index
+    
+    for tree in dump['tree_info']:
+        arrays.roots.append(visit(tree['tree_structure']))
+    
+    meta = {
+        'kind': 'lightgbm',
+        'base_margin': 0.0,
+        'sigmoid_scale': sigmoid_scale,
+        'input_dtype': 'float64',
+        'n_features': dump['max_feature_idx'] + 1,
+    }
+    return arrays, meta
+
+def _scaler_params_dtype(scaler, scale_dtype: str, sample: np.ndarray = None) -> str:
+    """
+    Work out whether StandardScaler.transform casts mean_/scale_ to the input
+    dtype before scaling (newer scikit-learn) or scales with float64 params
+    """
+    if sample is None or not len(sample):
+        return scale_dtype
+    sample = np.asarray(sample, dtype=scale_dtype)
+    expected = scaler.transform(sample)
+    for params_dtype in (scale_dtype, 'float64'):
+        scaled = (sample - scaler.mean_.astype(params_dtype)).astype(scale_dtype)
+        scaled = (scaled / scaler.scale_.astype(params_dtype)).astype(scale_dtype)
+        if np.array_equal(scaled, expected):
+            return params_dtype
+    raise ValueError("Could not reproduce StandardScaler.transform exactly for export")
+
+def compile_model(model, scaler, schema: FeatureSchema, sample: np.ndarray = None) -> CompiledTreeEnsemble:
+    """
+    Flatten a trained XGBoost/LightGBM classifier plus its StandardScaler
+    into a CompiledTreeEnsemble tagged with the feature schema it was trained on
+    
+    sample (unscaled training rows) is used to pin down the scaler's exact
+    floating-point behaviour, so split comparisons match bit for bit.
+    """
+    model_kind = type(model).__name__
+    if model_kind == 'XGBClassifier':
+        arrays, meta = _flatten_xgboost(model)
+    elif model_kind == 'LGBMClassifier':
+        arrays, meta = _flatten_lightgbm(model)
+    else:
+        raise ValueError(f"Unsupported model type for export: {model_kind}")
+    
+    n_features = meta['n_features']
+    if n_features != schema.n_features:
+        raise ValueError(f"Model has {n_features} features but schema defines {schema.n_features}")
+    # Training matrices are built in the schema dtype, so the scaler ran in it too
+    scale_dtype = 'float32' if set(schema.dtypes) == {'float32'} else 'float64'
+    if scaler is not None and hasattr(scaler, 'mean_'):
+        mean = np.asarray(scaler.mean_, dtype=np.float64)
+        scale = np.asarray(scaler.scale_, dtype=np.float64)
+        params_dtype = _scaler_params_dtype(scaler, scale_dtype, sample)
+    else:
+        mean = np.zeros(n_features, dtype=np.float64)
+        scale = np.ones(n_features, dtype=np.float64)
+        params_dtype = scale_dtype
+    
+    meta['scaled'] = scaler is not None and hasattr(scaler, 'mean_')
+    meta['max_depth'] = arrays.max_depth()
+    meta['feature_schema'] = schema.to_dict()
+    meta['scale_dtype'] = scale_dtype
+    meta['scale_params_dtype'] = params_dtype
+    return CompiledTreeEnsemble({**arrays.to_arrays(), 'mean': mean, 'scale': scale}, meta)
+
+def check_parity(compiled: CompiledTreeEnsemble, model, scaler, X: np.ndarray, tolerance: float = PARITY_TOLERANCE) -> float:
+    """
+    Compare compiled probabilities against the original model on unscaled rows X
+    Returns the max absolute difference; raises ValueError above tolerance
+    """
+    X_scaled = scaler.transform(X) if scaler is not None and hasattr(scaler, 'mean_') else X
+    expected = model.predict_proba(X_scaled)[:, 1]
+    actual = compiled.predict_proba(X)[:, 1]
+    max_diff = float(np.max(np.abs(expected - actual))) if len(X) else 0.0
+    if max_diff > tolerance:
+        raise ValueError(
+            f"Compiled model parity check failed: max probability difference {max_diff:.3g} > {tolerance:.3g}"
+        )
+    return max_diff
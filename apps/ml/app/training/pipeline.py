@@ -1,20 +1,53 @@
 """
 Model training pipeline for RTO risk scoring
 """
-import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-import xgboost as xgb
-import lightgbm as lgb
-import joblib
 import os
+import shutil
 from datetime import datetime
-import mlflow
-import mlflow.sklearn
 from pymongo import MongoClient
 from app.config import Config
 from app.features.extractor import FeatureExtractor
+from app.features.aggregates import aggregate_index
+from app.training.aggregates import (
+    AggregateBuilder,
+    AGGREGATE_PROJECTION,
+    apply_point_in_time,
+    order_key_hashes,
+    order_timestamps,
+)
+from app.training.export import compile_model, check_parity
+from app.training.calibration import fit_calibrator
+from app.training.rules import derive_rules, unscaled_column
+from app.training.quantize import quantize_model, quantization_report
+from app.training.shards import ShardWriter, ShardSet
+from app.training.search import HyperparameterSearch
+from app.training.tracking import create_tracker
+from app.utils.rules import RULE_CANDIDATES
+
+# Order statuses with a known outcome
+OUTCOME_STATUSES = ['confirmed', 'unconfirmed', 'canceled']
+
+# Orders that are labeled for training; the aggregate index counts the same ones
+LABELED_QUERY = {
+    'status': { '$in': OUTCOME_STATUSES },
+    'riskScore': { '$exists': True }
+}
+
+# Order fields read by the feature extractors, the target and incremental sync
+ORDER_PROJECTION = {
+    'amount': 1,
+    'currency': 1,
+    'paymentMode': 1,
+    'platform': 1,
+    'email': 1,
+    'phone': 1,
+    'customer': 1,
+    'status': 1,
+    'riskScore': 1,
+    'createdAt': 1,
+    'updatedAt': 1,
+}
 
 class TrainingPipeline:
     """
@@ -24,185 +57,597 @@ class TrainingPipeline:
     def __init__(self):
         self.config = Config()
         self.extractor = FeatureExtractor()
-        self.scaler = StandardScaler()
+        self.scaler = None
+        self.calibrator = None
+        self.rules = None
+        self.quantized = None
+        self.quantized_calibrator = None
         self.model = None
+        self.parity_sample = None
+        self.search_trials = []
+        self.tracker = create_tracker(self.config)
+    
+    def extract_data(self, batch_size: int = None, full_rebuild: bool = False) -> ShardSet:
+        """
+        Stream training data from MongoDB into the local feature shards
+        
+        Orders are pulled with a projection in batches of batch_size,
+        featurized column-wise per chunk and appended as a shard, so memory
+        use is bounded by the chunk size rather than the order history.
+        
+        Unless full_rebuild is set (or the stored shards were built with a
+        different feature schema), only orders whose updatedAt is at or after
+        the stored high-water mark are fetched. They are upserted by order id
+        on top of the existing shards, and orders that left the outcome set
+        are deleted.
+        
+        History features don't depend on the aggregate index the shards were
+        written with: each shard keeps its rows' aggregate keys and creation
+        times, and point_in_time_features() recomputes those columns on load.
+        """
+        if batch_size is None:
+            batch_size = self.config.TRAINING_BATCH_SIZE
+        
+        existing = None if full_rebuild else ShardSet.open(self.config.TRAINING_DATA_DIR)
+        if existing is not None and (
+            existing.high_water_mark is None
+            or existing.schema.to_dict() != self.extractor.schema.to_dict()
+            or not existing.has_history
+        ):
+            print("Stored training shards are incompatible, rebuilding from scratch")
+            existing = None
+        
+        if existing is None:
+            # Query orders with known outcomes (confirmed/unconfirmed)
+            query = LABELED_QUERY
+            writer = ShardWriter(self.config.TRAINING_DATA_DIR, self.extractor.schema)
+            high_water_mark = None
+        else:
+            # Everything touched since the last run, whatever its status now
+            high_water_mark = datetime.fromisoformat(existing.high_water_mark)
+            query = {'updatedAt': { '$gte': high_water_mark }}
+            writer = ShardWriter(self.config.TRAINING_DATA_DIR, self.extractor.schema, append=True)
+            print(f"Fetching orders updated since {existing.high_water_mark}")
+        
+        client = MongoClient(self.config.MONGO_URI)
+        db = client.get_database()
+        orders = db.orders.find(query, projection=ORDER_PROJECTION, batch_size=batch_size)
+        
+        try:
+            chunk = []
+            for order in orders:
+                updated_at = order.get('updatedAt')
+                if updated_at is not None and (high_water_mark is None or updated_at > high_water_mark):
+                    high_water_mark = updated_at
+                chunk.append(order)
+                if len(chunk) >= batch_size:
+                    self._write_chunk(writer, chunk)
+                    chunk = []
+            self._write_chunk(writer, chunk)
+        finally:
+            client.close()
         
-    def extract_data(self) -> pd.DataFrame:
+        shards = writer.close(high_water_mark.isoformat() if high_water_mark is not None else None)
+        if len(shards.shards) > self.config.TRAINING_MAX_SHARDS:
+            print(f"Compacting {len(shards.shards)} training shards")
+            shards = shards.compact(rows_per_shard=batch_size * 16)
+        return shards
+    
+    def build_aggregates(self, batch_size: int = None) -> str:
         """
-        Extract training data from MongoDB
+        Rebuild the historical aggregate index from every labeled order (the
+        training set's filter) and make it the live version
         """
+        if batch_size is None:
+            batch_size = self.config.TRAINING_BATCH_SIZE
+        
+        builder = AggregateBuilder(
+            self.config.AGGREGATE_DIR,
+            prior_weight=self.config.AGGREGATE_PRIOR_WEIGHT,
+            keep_versions=self.config.AGGREGATE_KEEP_VERSIONS
+        )
+        
         client = MongoClient(self.config.MONGO_URI)
         db = client.get_database()
+        orders = db.orders.find(
+            LABELED_QUERY,
+            projection=AGGREGATE_PROJECTION,
+            batch_size=batch_size
+        )
+        try:
+            version = builder.build(orders, batch_size=batch_size)
+        finally:
+            client.close()
+        
+        aggregate_index.refresh()
+        return version
+    
+    @staticmethod
+    def _is_labeled(order: dict) -> bool:
+        """
+        Whether an order belongs in the training set (same filter as LABELED_QUERY)
+        """
+        return order.get('status') in OUTCOME_STATUSES and 'riskScore' in order
+    
+    def _write_chunk(self, writer: ShardWriter, chunk: list):
+        """
+        Featurize a chunk of orders and append it as a shard
+        Orders without a usable outcome are recorded as deletions
+        """
+        if not chunk:
+            return
+        labeled = [order for order in chunk if self._is_labeled(order)]
+        deleted_ids = [str(order['_id']) for order in chunk if not self._is_labeled(order)]
         
-        # Query orders with known outcomes (confirmed/unconfirmed)
-        orders = db.orders.find({
-            'status': { '$in': ['confirmed', 'unconfirmed', 'canceled'] },
-            'riskScore': { '$exists': True }
-        })
+        X = self.extractor.extract_columns(labeled)
         
-        data = []
-        for order in orders:
-            # Extract features
-            features = self.extractor.extract(order)
-            
-            # Add target (1 if confirmed, 0 if unconfirmed/canceled)
-            features['target'] = 1 if order['status'] == 'confirmed' else 0
-            
-            data.append(features)
+        # Target: 1 if confirmed, 0 if unconfirmed/canceled
+        y = np.fromiter((order['status'] == 'confirmed' for order in labeled), dtype=np.int8, count=len(labeled))
+        ids = [str(order['_id']) for order in labeled]
+        
+        writer.append(X, y, ids, deleted_ids, order_key_hashes(labeled), order_timestamps(labeled))
+    
+    def point_in_time_features(self, shards: ShardSet, X: np.ndarray, y: np.ndarray):
+        """
+        Overwrite the aggregate features of the loaded training rows with
+        point-in-time values
         
-        client.close()
+        Extraction looks orders up in the live aggregate index, which already
+        counts each order's own outcome, so those values would leak the label.
+        Recomputed from the keys and creation times stored with the shards,
+        each row only counts outcomes of orders created before it. Rates are
+        smoothed towards the live index's prior, the one unknown keys get at
+        serving time.
+        """
+        keys, created = shards.load_history()
+        apply_point_in_time(
+            X, self.extractor.schema, keys, created, y, self.config.AGGREGATE_PRIOR_WEIGHT, aggregate_index.prior
+        )
+        X.flush()
+    
+    @staticmethod
+    def stratified_order(y: np.ndarray, test_size: float = 0.2, validation_size: float = 0.0, seed: int = 42) -> tuple:
+        """
+        Row order putting a stratified random training set first, then the
+        validation set, then the test set; returns (order, n_train, n_validation)
         
-        return pd.DataFrame(data)
+        Each class is split in proportion, like train_test_split(stratify=y),
+        but only index arrays are built, so the caller can lay the matrix out
+        in this order in a single copy. Both sizes are fractions of all rows.
+        """
+        rng = np.random.default_rng(seed)
+        train_parts = []
+        validation_parts = []
+        test_parts = []
+        for label in np.unique(y):
+            indices = rng.permutation(np.flatnonzero(y == label))
+            n_test = int(round(len(indices) * test_size))
+            n_validation = int(round(len(indices) * validation_size))
+            test_parts.append(indices[:n_test])
+            validation_parts.append(indices[n_test:n_test + n_validation])
+            train_parts.append(indices[n_test + n_validation:])
+        train = rng.permutation(np.concatenate(train_parts))
+        validation = rng.permutation(np.concatenate(validation_parts))
+        test = rng.permutation(np.concatenate(test_parts))
+        return np.concatenate([train, validation, test]), len(train), len(validation)
     
-    def preprocess(self, df: pd.DataFrame) -> tuple:
+    def preprocess(self, X: np.ndarray, y: np.ndarray, scale: bool = None) -> tuple:
         """
         Preprocess data for training
-        """
-        # Separate features and target
-        X = df.drop('target', axis=1)
-        y = df['target']
         
-        # Handle missing values
-        X = X.fillna(0)
+        X may be the memory-mapped training matrix. It is copied exactly once,
+        into a contiguous float32 array already in split order, so the train,
+        validation and test sets returned are views of that one copy. Missing
+        values are filled and (optionally) scaling is applied in place on it.
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
+        The validation set (TRAINING_VALIDATION_SIZE) is for early stopping,
+        model selection and anything else fitted to held-out predictions; the
+        test set (TRAINING_TEST_SIZE) is only used to report final scores.
+        Returns (X_train, X_val, X_test, y_train, y_val, y_test).
+        
+        Tree models don't need scaled features, so scaling is off unless
+        scale (default: TRAINING_SCALE_FEATURES) is set; without it no scaler
+        is saved and serving scores raw features.
+        """
+        if scale is None:
+            scale = self.config.TRAINING_SCALE_FEATURES
+        
+        # Split data, gathering rows into split order chunk by chunk and
+        # handling missing values while each chunk is still in cache
+        order, n_train, n_val = self.stratified_order(
+            np.asarray(y), self.config.TRAINING_TEST_SIZE, self.config.TRAINING_VALIDATION_SIZE
         )
+        data = np.empty((len(order), X.shape[1]), dtype=np.float32)
+        chunk = max(self.config.TRAINING_BATCH_SIZE, 1)
+        for start in range(0, len(order), chunk):
+            rows = data[start:start + chunk]
+            np.take(X, order[start:start + chunk], axis=0, out=rows, mode='clip')
+            np.nan_to_num(rows, copy=False, nan=0.0)
+        labels = np.asarray(y)[order]
         
-        # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
+        X_train, X_val, X_test = data[:n_train], data[n_train:n_train + n_val], data[n_train + n_val:]
+        y_train, y_val, y_test = labels[:n_train], labels[n_train:n_train + n_val], labels[n_train + n_val:]
         
-        return X_train_scaled, X_test_scaled, y_train, y_test
+        # Keep unscaled held-out rows for checking the compiled model export
+        self.parity_sample = X_test[:1000].copy()
+        
+        # Scale features in place, a chunk at a time, with a scaler fitted on the training rows
+        if scale:
+            from sklearn.preprocessing import StandardScaler
+            self.scaler = StandardScaler()
+            for start in range(0, n_train, chunk):
+                self.scaler.partial_fit(X_train[start:start + chunk])
+            for start in range(0, len(data), chunk):
+                self.scaler.transform(data[start:start + chunk], copy=False)
+        else:
+            self.scaler = None
+        
+        return X_train, X_val, X_test, y_train, y_val, y_test
     
-    def train_xgboost(self, X_train, y_train, X_test, y_test):
+    def train_xgboost(self, X_train, y_train, X_val, y_val, X_test, y_test):
         """
-        Train XGBoost model
+        Train XGBoost model, early-stopping on the validation set
         """
-        mlflow.set_tracking_uri(self.config.MLFLOW_TRACKING_URI)
-        mlflow.set_experiment(self.config.MLFLOW_EXPERIMENT_NAME)
+        import xgboost as xgb
+        
+        params = {'n_estimators': 100, 'max_depth': 6, 'learning_rate': 0.1}
         
-        with mlflow.start_run():
+        with self.tracker.start_run(run_name='xgboost', params=params):
             # Train model
             model = xgb.XGBClassifier(
-                n_estimators=100,
-                max_depth=6,
-                learning_rate=0.1,
+                **params,
                 random_state=42,
                 eval_metric='logloss'
             )
             
             model.fit(
                 X_train, y_train,
-                eval_set=[(X_test, y_test)],
+                eval_set=[(X_val, y_val)],
                 early_stopping_rounds=10,
                 verbose=False
             )
             
             # Evaluate
             train_score = model.score(X_train, y_train)
+            val_score = model.score(X_val, y_val)
             test_score = model.score(X_test, y_test)
             
             # Log metrics
-            mlflow.log_metric("train_accuracy", train_score)
-            mlflow.log_metric("test_accuracy", test_score)
+            self.tracker.log_metric("train_accuracy", train_score)
+            self.tracker.log_metric("val_accuracy", val_score)
+            self.tracker.log_metric("test_accuracy", test_score)
             
             # Log model
-            mlflow.sklearn.log_model(model, "model")
+            self.tracker.log_model(model, "model")
             
             self.model = model
             
             return model, test_score
     
-    def train_lightgbm(self, X_train, y_train, X_test, y_test):
+    def train_lightgbm(self, X_train, y_train, X_val, y_val, X_test, y_test):
         """
-        Train LightGBM model
+        Train LightGBM model, early-stopping on the validation set
         """
-        mlflow.set_tracking_uri(self.config.MLFLOW_TRACKING_URI)
-        mlflow.set_experiment(self.config.MLFLOW_EXPERIMENT_NAME)
+        import lightgbm as lgb
+        
+        params = {'n_estimators': 100, 'max_depth': 6, 'learning_rate': 0.1}
         
-        with mlflow.start_run():
+        with self.tracker.start_run(run_name='lightgbm', params=params):
             # Train model
             model = lgb.LGBMClassifier(
-                n_estimators=100,
-                max_depth=6,
-                learning_rate=0.1,
+                **params,
                 random_state=42,
                 verbose=-1
             )
             
             model.fit(
                 X_train, y_train,
-                eval_set=[(X_test, y_test)],
+                eval_set=[(X_val, y_val)],
                 callbacks=[lgb.early_stopping(10), lgb.log_evaluation(0)]
             )
             
             # Evaluate
             train_score = model.score(X_train, y_train)
+            val_score = model.score(X_val, y_val)
             test_score = model.score(X_test, y_test)
             
             # Log metrics
-            mlflow.log_metric("train_accuracy", train_score)
-            mlflow.log_metric("test_accuracy", test_score)
+            self.tracker.log_metric("train_accuracy", train_score)
+            self.tracker.log_metric("val_accuracy", val_score)
+            self.tracker.log_metric("test_accuracy", test_score)
             
             # Log model
-            mlflow.sklearn.log_model(model, "model")
+            self.tracker.log_model(model, "model")
             
             self.model = model
             
             return model, test_score
     
+    def search_models(self, X_train, y_train, X_val, y_val, model_types: list = None, **search_options):
+        """
+        Run a parallel hyperparameter search and keep the best model
+        Trials early-stop and are ranked on the validation set, never the test set
+        """
+        search = HyperparameterSearch(model_types=model_types, tracker=self.tracker, **search_options)
+        best = search.run(X_train, y_train, X_val, y_val)
+        
+        self.model = best['model']
+        self.search_trials = search.trials
+        
+        return self.model, best
+    
+    def calibrate(self, model, X_val, y_val):
+        """
+        Fit the probability calibrator used for serving confidences on the
+        validation set
+        """
+        with self.tracker.start_run(run_name='calibration', params={'method': 'isotonic'}):
+            probabilities = model.predict_proba(X_val)[:, 1]
+            self.calibrator = fit_calibrator(probabilities, y_val)
+            
+            meta = self.calibrator.meta
+            self.tracker.log_metric("brier_raw", meta['brier_raw'])
+            self.tracker.log_metric("brier_calibrated", meta['brier_calibrated'])
+        print(
+            f"Calibrator fitted with {len(self.calibrator)} breakpoints "
+            f"(Brier {meta['brier_raw']:.4f} -> {meta['brier_calibrated']:.4f})"
+        )
+        return self.calibrator
+    
+    def derive_rules(self, model, X_val, y_val):
+        """
+        Pick the rule-tier cohorts the model scores consistently on the
+        validation set, with their scores and confidences
+        Call after calibrate() so rule confidences are calibrated too
+        """
+        schema = self.extractor.schema
+        candidates = [
+            (name, conditions) for name, conditions in RULE_CANDIDATES
+            if all(feature in schema.index for feature in conditions)
+        ]
+        with self.tracker.start_run(run_name='rules', params={
+            'tolerance': self.config.RULE_TOLERANCE,
+            'min_agreement': self.config.RULE_MIN_AGREEMENT,
+            'min_support': self.config.RULE_MIN_SUPPORT,
+        }):
+            risk_scores = (1 - model.predict_proba(X_val)[:, 1]) * 100
+            self.rules = derive_rules(
+                risk_scores,
+                unscaled_column(X_val, schema, self.scaler),
+                np.asarray(y_val),
+                tolerance=self.config.RULE_TOLERANCE,
+                min_agreement=self.config.RULE_MIN_AGREEMENT,
+                min_support=self.config.RULE_MIN_SUPPORT,
+                calibrator=self.calibrator,
+                candidates=candidates,
+            )
+            self.tracker.log_metric("rules_accepted", len(self.rules))
+            self.tracker.log_metric("rules_held_out_hit_rate", self.rules.meta['heldOutHitRate'])
+        
+        for name, entry in self.rules.meta['candidates'].items():
+            if entry['accepted']:
+                print(
+                    f"Rule '{name}' accepted: risk {entry['riskScore']:.1f}, "
+                    f"{entry['agreement']:.1%} agreement over {entry['support']} validation orders"
+                )
+            else:
+                print(f"Rule '{name}' rejected: {entry['reason']}")
+        print(f"Rules cover {self.rules.meta['heldOutHitRate']:.1%} of validation orders")
+        return self.rules
+    
+    def quantize(self, model, X_val, y_val, X_test, y_test):
+        """
+        Build the pruned, quantized variant of the model and compare it with
+        the full model
+        The variant is dropped if it loses more than QUANTIZE_MAX_AUC_DROP AUC
+        on the validation set; otherwise it gets its own calibrator, fitted on
+        the validation set too. Only test-set numbers are reported.
+        """
+        self.quantized = None
+        self.quantized_calibrator = None
+        try:
+            full = compile_model(model, self.scaler, self.extractor.schema, self.parity_sample)
+        except ValueError as e:
+            print(f"Warning: Skipping quantized model: {e}")
+            return None
+        
+        params = {
+            'min_gain_ratio': self.config.QUANTIZE_MIN_GAIN_RATIO,
+            'leaf_dtype': self.config.QUANTIZE_LEAF_DTYPE,
+        }
+        # Both ensembles apply the scaler themselves, so compare on unscaled rows
+        X_val_raw = self.scaler.inverse_transform(X_val) if self.scaler is not None else X_val
+        X_test_raw = self.scaler.inverse_transform(X_test) if self.scaler is not None else X_test
+        with self.tracker.start_run(run_name='quantization', params=params):
+            quantized = quantize_model(full, **params)
+            gate = quantization_report(full, quantized, X_val_raw, y_val)
+            report = quantization_report(full, quantized, X_test_raw, y_test)
+            quantized.meta['report'] = report
+            for name, value in report.items():
+                if value is not None:
+                    self.tracker.log_metric(name, value)
+        
+        pruning = quantized.meta['quantization']
+        print(
+            f"Quantized model: {pruning['trees_after']}/{pruning['trees_before']} trees, "
+            f"{pruning['nodes_after']}/{pruning['nodes_before']} nodes, "
+            f"{report['bytes_quantized']} bytes (full model {report['bytes_full']})"
+        )
+        print(
+            f"Quantized vs full on the test set: accuracy {report['accuracy_quantized']:.4f} vs {report['accuracy_full']:.4f}, "
+            + (f"AUC {report['auc_quantized']:.4f} vs {report['auc_full']:.4f}" if report['auc_full'] is not None else "AUC n/a")
+        )
+        if gate['auc_delta'] is not None and -gate['auc_delta'] > self.config.QUANTIZE_MAX_AUC_DROP:
+            print(
+                f"Warning: Not saving quantized model: validation AUC drop {-gate['auc_delta']:.4f} "
+                f"exceeds {self.config.QUANTIZE_MAX_AUC_DROP}"
+            )
+            return None
+        
+        # The variant's probabilities differ slightly, so it can't reuse the full model's table
+        self.quantized_calibrator = fit_calibrator(quantized.predict_proba(X_val_raw)[:, 1], y_val)
+        meta = self.quantized_calibrator.meta
+        print(
+            f"Quantized model calibrator fitted with {len(self.quantized_calibrator)} breakpoints "
+            f"(Brier {meta['brier_raw']:.4f} -> {meta['brier_calibrated']:.4f})"
+        )
+        
+        self.quantized = quantized
+        return quantized
+    
     def save_model(self, model, model_path: str = None):
         """
         Save trained model
         """
+        import joblib
+        
         if model_path is None:
             model_path = self.config.MODEL_PATH
         
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(model_path), exist_ok=True)
         
+        # Flatten trees + scaler for the serving engine and verify it matches the model
+        compiled_path = model_path.replace('.pkl', '_compiled')
+        legacy_compiled_path = model_path.replace('.pkl', '_compiled.npz')
+        try:
+            compiled = compile_model(model, self.scaler, self.extractor.schema, self.parity_sample)
+        except ValueError as e:
+            print(f"Warning: Skipping compiled model export: {e}")
+            compiled = None
+        if compiled is not None and self.parity_sample is not None:
+            max_diff = check_parity(compiled, model, self.scaler, self.parity_sample)
+            print(f"Compiled model parity check passed (max probability diff {max_diff:.2e})")
+        
         # Save model
         joblib.dump(model, model_path)
         
-        # Save scaler
+        # Save scaler, removing a stale one so serving doesn't scale raw-feature models
         scaler_path = model_path.replace('.pkl', '_scaler.pkl')
-        joblib.dump(self.scaler, scaler_path)
+        if self.scaler is not None:
+            joblib.dump(self.scaler, scaler_path)
+        elif os.path.exists(scaler_path):
+            os.remove(scaler_path)
+        
+        # Save the feature schema the model was trained on
+        schema_path = model_path.replace('.pkl', '_schema.json')
+        self.extractor.schema.save(schema_path)
+        
+        # Save the calibration table, removing a stale one fitted to another model
+        calibration_path = model_path.replace('.pkl', '_calibration.json')
+        if self.calibrator is not None:
+            self.calibrator.save(calibration_path)
+        elif os.path.exists(calibration_path):
+            os.remove(calibration_path)
+        
+        # Save the rule tier, which is only valid for the model it was derived from
+        rules_path = model_path.replace('.pkl', '_rules.json')
+        if self.rules is not None:
+            self.rules.save(rules_path)
+        elif os.path.exists(rules_path):
+            os.remove(rules_path)
+        
+        # Save compiled model, removing a stale export that no longer matches
+        if compiled is not None:
+            compiled.save(compiled_path)
+        elif os.path.exists(compiled_path):
+            shutil.rmtree(compiled_path)
+        if os.path.exists(legacy_compiled_path):
+            os.remove(legacy_compiled_path)
+        
+        # Save the quantized variant and its calibrator, removing stale ones built from another model
+        quantized_path = model_path.replace('.pkl', '_quantized')
+        quantized_calibration_path = model_path.replace('.pkl', '_quantized_calibration.json')
+        if self.quantized is not None:
+            self.quantized.save(quantized_path)
+        elif os.path.exists(quantized_path):
+            shutil.rmtree(quantized_path)
+        if self.quantized is not None and self.quantized_calibrator is not None:
+            self.quantized_calibrator.save(quantized_calibration_path)
+        elif os.path.exists(quantized_calibration_path):
+            os.remove(quantized_calibration_path)
         
         print(f"Model saved to {model_path}")
-        print(f"Scaler saved to {scaler_path}")
+        if self.scaler is not None:
+            print(f"Scaler saved to {scaler_path}")
+        print(f"Feature schema v{self.extractor.schema.version} saved to {schema_path}")
+        if self.calibrator is not None:
+            print(f"Calibration table saved to {calibration_path}")
+        if self.rules is not None:
+            print(f"{len(self.rules)} scoring rules saved to {rules_path}")
+        if compiled is not None:
+            print(f"Compiled model saved to {compiled_path}")
+        if self.quantized is not None:
+            print(f"Quantized model saved to {quantized_path}")
+            if self.quantized_calibrator is not None:
+                print(f"Quantized model calibration table saved to {quantized_calibration_path}")
     
-    def run(self, model_type: str = 'xgboost'):
+    def run(
+        self,
+        model_type: str = 'xgboost',
+        full_rebuild: bool = False,
+        search: bool = False,
+        search_options: dict = None,
+        quantize: bool = None
+    ):
         """
         Run complete training pipeline
+        
+        With search=True, model_type may be 'all' to search both model families.
+        quantize (default: QUANTIZE_MODEL) also saves a pruned, quantized variant.
         """
+        if quantize is None:
+            quantize = self.config.QUANTIZE_MODEL
+        try:
+            return self._run(model_type, full_rebuild, search, search_options, quantize)
+        finally:
+            # Flush experiment tracking before returning
+            self.tracker.close()
+    
+    def _run(self, model_type: str, full_rebuild: bool, search: bool, search_options: dict, quantize: bool):
         print("Starting training pipeline...")
         
         # Extract data
         print("Extracting data from MongoDB...")
-        df = self.extract_data()
-        print(f"Extracted {len(df)} samples")
+        shards = self.extract_data(full_rebuild=full_rebuild)
+        print(f"Training set has {shards.rows} samples in {len(shards.shards)} shards")
         
-        if len(df) < 100:
+        if shards.rows < 100:
             print("Warning: Insufficient data for training. Need at least 100 samples.")
             return None
         
         # Preprocess
         print("Preprocessing data...")
-        X_train, X_test, y_train, y_test = self.preprocess(df)
+        X, y = shards.load(writable=True)
+        self.point_in_time_features(shards, X, y)
+        X_train, X_val, X_test, y_train, y_val, y_test = self.preprocess(X, y)
         
         # Train model
-        print(f"Training {model_type} model...")
-        if model_type == 'xgboost':
-            model, score = self.train_xgboost(X_train, y_train, X_test, y_test)
+        if search:
+            model_types = None if model_type == 'all' else [model_type]
+            model, best = self.search_models(X_train, y_train, X_val, y_val, model_types, **(search_options or {}))
+            score = model.score(X_test, y_test)
+        elif model_type == 'xgboost':
+            print(f"Training {model_type} model...")
+            model, score = self.train_xgboost(X_train, y_train, X_val, y_val, X_test, y_test)
         elif model_type == 'lightgbm':
-            model, score = self.train_lightgbm(X_train, y_train, X_test, y_test)
+            print(f"Training {model_type} model...")
+            model, score = self.train_lightgbm(X_train, y_train, X_val, y_val, X_test, y_test)
         else:
             raise ValueError(f"Unknown model type: {model_type}")
         
         print(f"Model trained with test accuracy: {score:.4f}")
         
+        # Calibrate confidences on the validation set
+        self.calibrate(model, X_val, y_val)
+        
+        # Derive the rule tier from the model's validation scores
+        self.derive_rules(model, X_val, y_val)
+        
+        # Optional pruned, quantized variant with a smaller footprint (slower than native on large batches)
+        if quantize:
+            self.quantize(model, X_val, y_val, X_test, y_test)
+        
         # Save model
         self.save_model(model)
         
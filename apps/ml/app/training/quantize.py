@@ -0,0 +1,245 @@
+"""
+Prune and quantize compiled tree ensembles into a smaller serving artifact
+
+The quantized ensemble is a fraction of the full one's size and faster than
+the full compiled ensemble on large batches, but still slower than the
+native booster there (about 2x at 1024 rows on one core).
+"""
+from collections import deque
+from typing import Any, Dict, List, Optional
+import numpy as np
+from app.utils.model_loader import CompiledTreeEnsemble, QuantizedTreeEnsemble
+
+LEAF_DTYPES = ('float16', 'int8')
+
+def _prune(compiled: CompiledTreeEnsemble, min_gain: float) -> tuple:
+    """
+    Collapse splits below min_gain whose children are both leaves, bottom up
+    
+    A collapsed split becomes a leaf holding the cover-weighted mean of its
+    two leaves. Trees reduced to a single leaf add a constant to every
+    margin, so they are folded into the base margin instead of being kept.
+    Returns (kept nodes per tree as old indices in breadth-first order, so
+    each split's children end up adjacent, leaf flags, leaf values and
+    cover by old index, margin folded from dropped trees).
+    """
+    left = np.asarray(compiled.left)
+    right = np.asarray(compiled.right)
+    gain = np.asarray(compiled.arrays['gain'], dtype=np.float64)
+    cover = np.asarray(compiled.arrays['cover'], dtype=np.float64).copy()
+    value = np.asarray(compiled.value, dtype=np.float64).copy()
+    is_leaf = left < 0
+    
+    folded = 0.0
+    trees: List[List[int]] = []
+    for root in np.asarray(compiled.roots).tolist():
+        # Pre-order walk; reversed it visits children before parents
+        order = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            if not is_leaf[node]:
+                stack.append(right[node])
+                stack.append(left[node])
+        for node in reversed(order):
+            if is_leaf[node] or gain[node] >= min_gain:
+                continue
+            l, r = left[node], right[node]
+            if not (is_leaf[l] and is_leaf[r]):
+                continue
+            total = cover[l] + cover[r]
+            weights = (cover[l] / total, cover[r] / total) if total > 0 else (0.5, 0.5)
+            value[node] = weights[0] * value[l] + weights[1] * value[r]
+            cover[node] = total
+            is_leaf[node] = True
+        
+        if is_leaf[root]:
+            folded += value[root]
+            continue
+        kept = [root]
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            if not is_leaf[node]:
+                kept.extend((left[node], right[node]))
+                queue.extend((left[node], right[node]))
+        trees.append(kept)
+    return trees, is_leaf, value, cover, folded
+
+def _bin_edges(thresholds: np.ndarray, max_edges: int) -> np.ndarray:
+    """
+    Sorted bin edges for one feature's split thresholds
+    Every distinct threshold is an edge unless there are more than
+    max_edges, in which case edges are taken at quantiles of the thresholds
+    """
+    edges = np.unique(thresholds)
+    if len(edges) > max_edges:
+        edges = np.unique(np.quantile(thresholds, np.linspace(0.0, 1.0, max_edges), method='nearest'))
+    return edges
+
+def quantize_model(
+    compiled: CompiledTreeEnsemble,
+    min_gain_ratio: float = 0.01,
+    leaf_dtype: str = 'float16'
+) -> QuantizedTreeEnsemble:
+    """
+    Build a pruned, uint8-binned copy of a compiled ensemble
+    
+    Splits gaining less than min_gain_ratio times the ensemble's mean split
+    gain are pruned (see _prune). Each feature's remaining split thresholds
+    become its bin edges, so splits are exact unless a feature has more
+    than QuantizedTreeEnsemble.MAX_EDGES distinct thresholds, in which case
+    thresholds snap to the nearest edge. Leaves are stored as float16, or
+    int8 with one scale for the whole ensemble.
+    """
+    if leaf_dtype not in LEAF_DTYPES:
+        raise ValueError(f"Unsupported leaf dtype: {leaf_dtype} (expected one of {LEAF_DTYPES})")
+    
+    feature = np.asarray(compiled.feature)
+    threshold = np.asarray(compiled.threshold, dtype=np.float64)
+    internal = feature >= 0
+    gains = np.asarray(compiled.arrays['gain'], dtype=np.float64)[internal]
+    min_gain = min_gain_ratio * float(gains.mean()) if len(gains) else 0.0
+    trees, is_leaf, value, cover, folded = _prune(compiled, min_gain)
+    
+    # Renumber the kept nodes tree by tree
+    old_nodes = np.fromiter((node for kept in trees for node in kept), dtype=np.int64)
+    new_index = np.full(len(feature), -1, dtype=np.int64)
+    new_index[old_nodes] = np.arange(len(old_nodes))
+    kept_leaf = is_leaf[old_nodes]
+    n_nodes = len(old_nodes)
+    
+    new_feature = np.where(kept_leaf, -1, feature[old_nodes])
+    new_left = np.where(kept_leaf, -1, new_index[np.asarray(compiled.left)[old_nodes]]).astype(np.int32)
+    new_right = np.where(kept_leaf, -1, new_index[np.asarray(compiled.right)[old_nodes]]).astype(np.int32)
+    roots = np.asarray([new_index[kept[0]] for kept in trees], dtype=np.int32)
+    
+    # Bin edges per feature from the thresholds of the splits that remain
+    n_features = compiled.n_features
+    split_nodes = np.flatnonzero(~kept_leaf)
+    split_features = new_feature[split_nodes]
+    split_thresholds = threshold[old_nodes[split_nodes]]
+    edges_by_feature = []
+    threshold_bin = np.zeros(n_nodes, dtype=np.uint8)
+    lossless = True
+    for f in range(n_features):
+        mask = split_features == f
+        thresholds = split_thresholds[mask]
+        edges = _bin_edges(thresholds, QuantizedTreeEnsemble.MAX_EDGES)
+        lossless &= len(edges) == len(np.unique(thresholds))
+        if len(edges):
+            # Snap each threshold to its nearest edge; a no-op when every threshold is an edge
+            position = np.searchsorted(edges, thresholds)
+            if len(edges) > 1:
+                position = np.clip(position, 1, len(edges) - 1)
+                nearer_left = np.abs(thresholds - edges[position - 1]) <= np.abs(edges[position] - thresholds)
+                position = np.where(nearer_left, position - 1, position)
+            else:
+                position = np.zeros_like(position)
+            # x < edges[k] exactly when x's bin (edges at or below x) is below k + 1
+            threshold_bin[split_nodes[mask]] = position + 1
+        edges_by_feature.append(edges)
+    bin_offsets = np.zeros(n_features + 1, dtype=np.int32)
+    bin_offsets[1:] = np.cumsum([len(edges) for edges in edges_by_feature])
+    bin_edges = np.concatenate(edges_by_feature) if n_features else np.empty(0)
+    
+    # Leaf values in reduced precision
+    leaves = np.where(kept_leaf, value[old_nodes], 0.0)
+    if leaf_dtype == 'int8':
+        leaf_scale = float(np.abs(leaves).max()) / 127.0 if len(leaves) else 1.0
+        leaf_scale = leaf_scale or 1.0
+        stored_values = np.round(leaves / leaf_scale).astype(np.int8)
+    else:
+        leaf_scale = 1.0
+        stored_values = leaves.astype(np.float16)
+    
+    arrays = {
+        'feature': new_feature.astype(np.int16 if n_features < np.iinfo(np.int16).max else np.int32),
+        'threshold': threshold_bin,
+        'left': new_left,
+        'right': new_right,
+        'default_left': np.asarray(compiled.default_left)[old_nodes].astype(np.bool_),
+        'value': stored_values,
+        'gain': np.where(kept_leaf, 0.0, np.asarray(compiled.arrays['gain'])[old_nodes]).astype(np.float32),
+        'cover': cover[old_nodes].astype(np.float32),
+        'roots': roots,
+        'mean': np.asarray(compiled.mean, dtype=np.float64),
+        'scale': np.asarray(compiled.scale, dtype=np.float64),
+        'bin_edges': bin_edges.astype(np.float64),
+        'bin_offsets': bin_offsets,
+    }
+    
+    meta = dict(compiled.meta)
+    meta.update({
+        'base_margin': compiled.base_margin + folded,
+        'max_depth': _max_depth(arrays['left'], arrays['right'], roots),
+        'leaf_dtype': leaf_dtype,
+        'leaf_scale': leaf_scale,
+        'quantization': {
+            'min_gain_ratio': min_gain_ratio,
+            'min_gain': min_gain,
+            'trees_before': int(len(compiled.roots)),
+            'trees_after': int(len(roots)),
+            'nodes_before': int(len(feature)),
+            'nodes_after': int(n_nodes),
+            'lossless_thresholds': bool(lossless),
+            'max_edges_per_feature': int(max((len(edges) for edges in edges_by_feature), default=0)),
+        },
+    })
+    return QuantizedTreeEnsemble(arrays, meta)
+
+def _max_depth(left: np.ndarray, right: np.ndarray, roots: np.ndarray) -> int:
+    deepest = 0
+    for root in roots.tolist():
+        stack = [(root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if left[node] < 0:
+                deepest = max(deepest, depth)
+            else:
+                stack.append((left[node], depth + 1))
+                stack.append((right[node], depth + 1))
+    return deepest
+
+def _nbytes(ensemble: CompiledTreeEnsemble) -> int:
+    return int(sum(np.asarray(ensemble.arrays[name]).nbytes for name in ensemble.ARRAY_NAMES))
+
+def _auc(labels: np.ndarray, probabilities: np.ndarray) -> Optional[float]:
+    from sklearn.metrics import roc_auc_score
+    
+    if len(np.unique(labels)) < 2:
+        return None
+    return float(roc_auc_score(labels, probabilities))
+
+def quantization_report(
+    full: CompiledTreeEnsemble,
+    quantized: QuantizedTreeEnsemble,
+    X: np.ndarray,
+    y: np.ndarray
+) -> Dict[str, Any]:
+    """
+    AUC and accuracy of both ensembles on unscaled held-out rows X, with
+    their differences, probability drift and array sizes
+    """
+    y = np.asarray(y)
+    full_proba = full.predict_proba(X)[:, 1]
+    quantized_proba = quantized.predict_proba(X)[:, 1]
+    auc_full = _auc(y, full_proba)
+    auc_quantized = _auc(y, quantized_proba)
+    accuracy_full = float(np.mean((full_proba >= 0.5) == y)) if len(y) else 0.0
+    accuracy_quantized = float(np.mean((quantized_proba >= 0.5) == y)) if len(y) else 0.0
+    drift = np.abs(quantized_proba - full_proba)
+    return {
+        'rows': int(len(y)),
+        'auc_full': auc_full,
+        'auc_quantized': auc_quantized,
+        'auc_delta': auc_quantized - auc_full if auc_full is not None else None,
+        'accuracy_full': accuracy_full,
+        'accuracy_quantized': accuracy_quantized,
+        'accuracy_delta': accuracy_quantized - accuracy_full,
+        'max_probability_diff': float(drift.max()) if len(drift) else 0.0,
+        'mean_probability_diff': float(drift.mean()) if len(drift) else 0.0,
+        'bytes_full': _nbytes(full),
+        'bytes_quantized': _nbytes(quantized),
+    }
@@ -0,0 +1,92 @@
+"""
+Derive rule-tier thresholds from a trained model's own predictions
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.features.schema import FeatureSchema
+from app.utils.calibration import ProbabilityCalibrator
+from app.utils.rules import RULE_CANDIDATES, Rule, RuleSet
+
+def derive_rules(
+    risk_scores: np.ndarray,
+    feature_column: Callable[[str], np.ndarray],
+    labels: np.ndarray,
+    tolerance: float,
+    min_agreement: float,
+    min_support: int,
+    calibrator: Optional[ProbabilityCalibrator] = None,
+    candidates: List[Tuple[str, Dict[str, float]]] = RULE_CANDIDATES
+) -> RuleSet:
+    """
+    Keep the candidate cohorts the model already scores consistently
+    
+    For each candidate, the rule's score is the median model risk score over
+    the held-out orders in its cohort. The rule is kept only if the cohort
+    has at least min_support orders and at least min_agreement of them score
+    within tolerance risk points of that median, so serving the rule instead
+    of the model changes almost no decision. feature_column(name) returns a
+    held-out feature column in raw (unscaled) units.
+    """
+    rules = []
+    report = {}
+    remaining = np.ones(len(risk_scores), dtype=bool)
+    for name, conditions in candidates:
+        cohort = remaining.copy()
+        for feature, value in conditions.items():
+            cohort &= np.isclose(feature_column(feature), value, atol=1e-3)
+        support = int(cohort.sum())
+        entry = {'support': support}
+        report[name] = entry
+        if support < min_support:
+            entry['accepted'] = False
+            entry['reason'] = f"support {support} < {min_support}"
+            continue
+        
+        scores = risk_scores[cohort]
+        risk_score = float(np.median(scores))
+        agreement = float(np.mean(np.abs(scores - risk_score) <= tolerance))
+        entry.update({
+            'riskScore': risk_score,
+            'agreement': agreement,
+            'p05': float(np.percentile(scores, 5)),
+            'p95': float(np.percentile(scores, 95)),
+            'observedConfirmRate': float(np.mean(labels[cohort])),
+        })
+        if agreement < min_agreement:
+            entry['accepted'] = False
+            entry['reason'] = f"agreement {agreement:.3f} < {min_agreement}"
+            continue
+        
+        # Confidence as the model path would report it for the rule's score
+        confirmed = 1.0 - risk_score / 100.0
+        if calibrator is not None:
+            confirmed = float(calibrator.apply(confirmed))
+        entry['accepted'] = True
+        rules.append(Rule(name, conditions, risk_score, max(confirmed, 1.0 - confirmed), {
+            'support': support,
+            'agreement': agreement,
+        }))
+        # Later rules only see orders earlier rules didn't take, as in serving
+        remaining &= ~cohort
+    
+    total = len(risk_scores)
+    covered = total - int(remaining.sum())
+    return RuleSet(rules, tolerance, {
+        'candidates': report,
+        'heldOutRows': total,
+        'heldOutHitRate': covered / total if total else 0.0,
+        'minAgreement': min_agreement,
+        'minSupport': min_support,
+    })
+
+def unscaled_column(X: np.ndarray, schema: FeatureSchema, scaler=None) -> Callable[[str], np.ndarray]:
+    """
+    feature_column for derive_rules over a (possibly scaled in place) matrix
+    """
+    def column(name: str) -> np.ndarray:
+        index = schema.index[name]
+        values = np.asarray(X[:, index], dtype=np.float64)
+        if scaler is not None:
+            values = values * scaler.scale_[index] + scaler.mean_[index]
+        return values
+    return column
@@ -0,0 +1,226 @@
+"""
+Parallel hyperparameter search over the XGBoost and LightGBM model families
+"""
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+MODEL_FAMILIES = ['xgboost', 'lightgbm']
+
+def _sample_params(model_type: str, rng: np.random.Generator) -> Dict[str, Any]:
+    """
+    Draw one hyperparameter configuration for a model family
+    """
+    if model_type == 'xgboost':
+        return {
+            'max_depth': int(rng.integers(3, 10)),
+            'learning_rate': float(10 ** rng.uniform(-2, -0.5)),
+            'subsample': float(rng.uniform(0.6, 1.0)),
+            'colsample_bytree': float(rng.uniform(0.6, 1.0)),
+            'min_child_weight': float(10 ** rng.uniform(-1, 1)),
+            'reg_lambda': float(10 ** rng.uniform(-2, 1)),
+        }
+    if model_type == 'lightgbm':
+        return {
+            'num_leaves': int(rng.integers(15, 128)),
+            'max_depth': int(rng.choice([-1, 4, 6, 8, 10])),
+            'learning_rate': float(10 ** rng.uniform(-2, -0.5)),
+            'subsample': float(rng.uniform(0.6, 1.0)),
+            'subsample_freq': 1,
+            'colsample_bytree': float(rng.uniform(0.6, 1.0)),
+            'min_child_samples': int(rng.integers(5, 100)),
+            'reg_lambda': float(10 ** rng.uniform(-2, 1)),
+        }
+    raise ValueError(f"Unknown model type: {model_type}")
+
+def _init_worker(threads: int):
+    """
+    Cap native thread pools in each worker process to avoid oversubscription
+    """
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[var] = str(threads)
+
+def _run_trial(trial: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fit one configuration and score it on the validation set
+    Runs in a worker process; training data is memory-mapped from data_dir
+    """
+    from sklearn.metrics import log_loss, roc_auc_score
+    
+    data_dir = trial['data_dir']
+    X_train = np.load(os.path.join(data_dir, 'X_train.npy'), mmap_mode='r')
+    y_train = np.load(os.path.join(data_dir, 'y_train.npy'), mmap_mode='r')
+    X_val = np.load(os.path.join(data_dir, 'X_val.npy'), mmap_mode='r')
+    y_val = np.load(os.path.join(data_dir, 'y_val.npy'), mmap_mode='r')
+    
+    started = time.perf_counter()
+    if trial['model_type'] == 'xgboost':
+        import xgboost as xgb
+        model = xgb.XGBClassifier(
+            n_estimators=trial['n_estimators'],
+            random_state=42,
+            eval_metric='logloss',
+            early_stopping_rounds=10,
+            n_jobs=trial['threads'],
+            **trial['params']
+        )
+        model.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+    else:
+        import lightgbm as lgb
+        model = lgb.LGBMClassifier(
+            n_estimators=trial['n_estimators'],
+            random_state=42,
+            verbose=-1,
+            n_jobs=trial['threads'],
+            **trial['params']
+        )
+        model.fit(
+            X_train, y_train,
+            eval_set=[(X_val, y_val)],
+            callbacks=[lgb.early_stopping(10, verbose=False), lgb.log_evaluation(0)]
+        )
+    
+    probabilities = model.predict_proba(X_val)[:, 1]
+    return {
+        'trial_id': trial['trial_id'],
+        'model_type': trial['model_type'],
+        'params': trial['params'],
+        'n_estimators': trial['n_estimators'],
+        'val_logloss': float(log_loss(y_val, probabilities, labels=[0, 1])),
+        'val_auc': float(roc_auc_score(y_val, probabilities)) if len(np.unique(y_val)) > 1 else float('nan'),
+        'fit_seconds': time.perf_counter() - started,
+        'model': model,
+    }
+
+class HyperparameterSearch:
+    """
+    Budgeted random or successive-halving search across a process pool
+    
+    Each trial trains with threads_per_trial native threads, and the pool
+    runs cpu_count // threads_per_trial trials at once. Candidates are
+    ranked by validation log-loss, with AUC as tie-breaker.
+    
+    Successive halving starts every candidate at min_estimators boosting
+    rounds and keeps the best 1/eta of them at each rung, multiplying the
+    budget by eta until max_estimators.
+    """
+    
+    def __init__(
+        self,
+        model_types: Optional[List[str]] = None,
+        n_trials: int = 20,
+        strategy: str = 'halving',
+        workers: Optional[int] = None,
+        threads_per_trial: int = 1,
+        min_estimators: int = 50,
+        max_estimators: int = 400,
+        eta: int = 3,
+        seed: int = 42,
+        tracker=None
+    ):
+        if strategy not in ('random', 'halving'):
+            raise ValueError(f"Unknown search strategy: {strategy}")
+        self.model_types = model_types or MODEL_FAMILIES
+        self.n_trials = n_trials
+        self.strategy = strategy
+        self.threads_per_trial = max(1, threads_per_trial)
+        self.workers = workers or max(1, (os.cpu_count() or 1) // self.threads_per_trial)
+        self.min_estimators = min_estimators
+        self.max_estimators = max_estimators
+        self.eta = eta
+        self.rng = np.random.default_rng(seed)
+        self.trials: List[Dict[str, Any]] = []
+        self.tracker = tracker
+    
+    def _candidates(self) -> List[Dict[str, Any]]:
+        """
+        Sample n_trials configurations, alternating between model families
+        """
+        return [
+            {
+                'trial_id': i,
+                'model_type': self.model_types[i % len(self.model_types)],
+                'params': _sample_params(self.model_types[i % len(self.model_types)], self.rng),
+            }
+            for i in range(self.n_trials)
+        ]
+    
+    def _evaluate(self, pool: ProcessPoolExecutor, candidates: List[Dict[str, Any]], n_estimators: int, data_dir: str) -> List[Dict[str, Any]]:
+        """
+        Run one rung of trials in parallel and log each result
+        """
+        jobs = [
+            {**candidate, 'n_estimators': n_estimators, 'threads': self.threads_per_trial, 'data_dir': data_dir}
+            for candidate in candidates
+        ]
+        results = []
+        for result in pool.map(_run_trial, jobs):
+            print(
+                f"Trial {result['trial_id']:3d} {result['model_type']:8s} "
+                f"n_estimators={result['n_estimators']:4d} "
+                f"val_logloss={result['val_logloss']:.5f} val_auc={result['val_auc']:.4f} "
+                f"({result['fit_seconds']:.1f}s) {result['params']}"
+            )
+            self.trials.append({key: value for key, value in result.items() if key != 'model'})
+            if self.tracker is not None:
+                run_name = f"search-trial-{result['trial_id']}-{result['n_estimators']}"
+                params = {'model_type': result['model_type'], 'n_estimators': result['n_estimators'], **result['params']}
+                with self.tracker.start_run(run_name=run_name, params=params):
+                    self.tracker.log_metrics({
+                        'val_logloss': result['val_logloss'],
+                        'val_auc': result['val_auc'],
+                        'fit_seconds': result['fit_seconds'],
+                    })
+            results.append(result)
+        return sorted(results, key=lambda r: (r['val_logloss'], -np.nan_to_num(r['val_auc'])))
+    
+    def run(self, X_train: np.ndarray, y_train: np.ndarray, X_val: np.ndarray, y_val: np.ndarray) -> Dict[str, Any]:
+        """
+        Search and return the best trial (including its fitted 'model')
+        """
+        data_dir = tempfile.mkdtemp(prefix='confirmly-search-')
+        try:
+            # Workers memory-map the data instead of receiving pickled copies
+            np.save(os.path.join(data_dir, 'X_train.npy'), X_train)
+            np.save(os.path.join(data_dir, 'y_train.npy'), y_train)
+            np.save(os.path.join(data_dir, 'X_val.npy'), X_val)
+            np.save(os.path.join(data_dir, 'y_val.npy'), y_val)
+            
+            print(
+                f"Searching {self.n_trials} configurations of {self.model_types} ({self.strategy}) "
+                f"on {self.workers} workers x {self.threads_per_trial} threads"
+            )
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.threads_per_trial,)
+            ) as pool:
+                candidates = self._candidates()
+                if self.strategy == 'random':
+                    ranked = self._evaluate(pool, candidates, self.max_estimators, data_dir)
+                else:
+                    n_estimators = self.min_estimators
+                    while True:
+                        ranked = self._evaluate(pool, candidates, n_estimators, data_dir)
+                        if n_estimators >= self.max_estimators or len(ranked) == 1:
+                            break
+                        keep = max(1, math.ceil(len(ranked) / self.eta))
+                        candidates = [
+                            {key: result[key] for key in ('trial_id', 'model_type', 'params')}
+                            for result in ranked[:keep]
+                        ]
+                        n_estimators = min(n_estimators * self.eta, self.max_estimators)
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+        
+        best = ranked[0]
+        print(
+            f"Best trial {best['trial_id']} ({best['model_type']}): "
+            f"val_logloss={best['val_logloss']:.5f} val_auc={best['val_auc']:.4f}"
+        )
+        return best
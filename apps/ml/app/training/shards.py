@@ -0,0 +1,274 @@
+"""
+On-disk columnar shards of featurized training data
+"""
+import json
+import os
+import shutil
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from app.features.schema import FeatureSchema
+
+MANIFEST_NAME = 'manifest.json'
+
+def _read_manifest(directory: str) -> Optional[dict]:
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+class ShardWriter:
+    """
+    Append featurized chunks to a directory of .npy shards
+    
+    Each chunk becomes part-NNNNN.X.npy (float32 features), part-NNNNN.y.npy
+    (int8 targets) and part-NNNNN.ids.npy (order ids), plus
+    part-NNNNN.deleted.npy for orders that no longer belong in the training
+    set. Chunks written with their orders' aggregate key hashes and creation
+    times also get part-NNNNN.keys.npy and part-NNNNN.created.npy, which
+    the point-in-time aggregate features are recomputed from on load. The
+    manifest is written by close(), so shards written by an unfinished run
+    are never read.
+    
+    With append=True new shards are added after the existing ones and
+    upsert them by order id; otherwise the set is rebuilt from scratch in a
+    scratch directory that replaces the old one on close().
+    """
+    
+    def __init__(self, directory: str, schema: FeatureSchema, append: bool = False):
+        self.directory = directory
+        self.schema = schema
+        self.append_mode = append
+        
+        manifest = _read_manifest(directory) if append else None
+        if append and manifest is None:
+            raise FileNotFoundError(f"No shard manifest found at {directory} to append to")
+        self.shards: List[dict] = list(manifest['shards']) if manifest else []
+        self.base_rows = manifest['rows'] if manifest else 0
+        self.next_index = manifest.get('next_index', len(self.shards)) if manifest else 0
+        
+        if append:
+            self.work_dir = directory
+        else:
+            self.work_dir = f"{directory}.tmp"
+            if os.path.exists(self.work_dir):
+                shutil.rmtree(self.work_dir)
+            os.makedirs(self.work_dir)
+    
+    def append(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        ids: np.ndarray,
+        deleted_ids: Optional[np.ndarray] = None,
+        keys: Optional[np.ndarray] = None,
+        created: Optional[np.ndarray] = None
+    ):
+        """
+        Write one chunk as a new shard
+        ids holds one order id per row; deleted_ids lists orders to drop;
+        keys and created hold each row's aggregate key hashes and creation time
+        """
+        if not (len(X) == len(y) == len(ids)):
+            raise ValueError(f"Shard features, targets and ids differ in length: {len(X)}, {len(y)}, {len(ids)}")
+        has_history = keys is not None and created is not None
+        if has_history and not (len(keys) == len(created) == len(X)):
+            raise ValueError(f"Shard history differs in length from its rows: {len(keys)}, {len(created)}, {len(X)}")
+        has_deleted = deleted_ids is not None and len(deleted_ids) > 0
+        if len(X) == 0 and not has_deleted:
+            return
+        
+        name = f"part-{self.next_index:05d}"
+        self.next_index += 1
+        np.save(self._path(name, 'X'), np.ascontiguousarray(X, dtype=np.float32))
+        np.save(self._path(name, 'y'), np.ascontiguousarray(y, dtype=np.int8))
+        np.save(self._path(name, 'ids'), np.asarray(ids, dtype=np.bytes_))
+        if has_deleted:
+            np.save(self._path(name, 'deleted'), np.asarray(deleted_ids, dtype=np.bytes_))
+        if has_history:
+            np.save(self._path(name, 'keys'), np.ascontiguousarray(keys, dtype=np.uint64))
+            np.save(self._path(name, 'created'), np.ascontiguousarray(created, dtype=np.float64))
+        self.shards.append({'name': name, 'rows': int(len(X)), 'deleted': has_deleted, 'history': has_history})
+    
+    def _path(self, name: str, part: str) -> str:
+        return os.path.join(self.work_dir, f"{name}.{part}.npy")
+    
+    def close(self, high_water_mark: Optional[str] = None) -> 'ShardSet':
+        """
+        Write the manifest (and swap in a rebuilt directory) and return the shard set
+        """
+        manifest = {
+            'schema': self.schema.to_dict(),
+            'shards': self.shards,
+            'next_index': self.next_index,
+            # Upper bound on rows; duplicates across shards are resolved on load
+            'rows': sum(shard['rows'] for shard in self.shards),
+            'high_water_mark': high_water_mark,
+        }
+        manifest_tmp = os.path.join(self.work_dir, f"{MANIFEST_NAME}.tmp")
+        with open(manifest_tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_tmp, os.path.join(self.work_dir, MANIFEST_NAME))
+        
+        if not self.append_mode:
+            if os.path.exists(self.directory):
+                shutil.rmtree(self.directory)
+            os.rename(self.work_dir, self.directory)
+        return ShardSet(self.directory)
+
+class ShardSet:
+    """
+    Read access to a directory written by ShardWriter
+    """
+    
+    def __init__(self, directory: str):
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            raise FileNotFoundError(f"No shard manifest found at {directory}")
+        self.directory = directory
+        self.schema = FeatureSchema.from_dict(manifest['schema'])
+        self.shards = manifest['shards']
+        self.high_water_mark = manifest.get('high_water_mark')
+        self._live_masks = None
+    
+    @classmethod
+    def open(cls, directory: str) -> Optional['ShardSet']:
+        """
+        Open an existing shard set, or return None if there is none
+        """
+        if _read_manifest(directory) is None:
+            return None
+        return cls(directory)
+    
+    def _path(self, name: str, part: str) -> str:
+        return os.path.join(self.directory, f"{name}.{part}.npy")
+    
+    def iter_shards(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yield (X, y) per shard as read-only memory maps, including superseded rows
+        """
+        for shard in self.shards:
+            yield (
+                np.load(self._path(shard['name'], 'X'), mmap_mode='r'),
+                np.load(self._path(shard['name'], 'y'), mmap_mode='r'),
+            )
+    
+    def live_masks(self) -> List[np.ndarray]:
+        """
+        Per-shard boolean masks of rows that are the latest version of their order
+        
+        A row is live unless a later shard holds the same order id again, or
+        lists it as deleted.
+        """
+        if self._live_masks is None:
+            # Stack ids newest shard first; np.unique keeps the first (newest) occurrence
+            entries = []
+            for position, shard in reversed(list(enumerate(self.shards))):
+                if shard.get('deleted'):
+                    deleted = np.load(self._path(shard['name'], 'deleted'))
+                    entries.append((deleted, np.full(len(deleted), -1), np.zeros(len(deleted), dtype=np.int64)))
+                ids = np.load(self._path(shard['name'], 'ids'))
+                entries.append((ids, np.full(len(ids), position), np.arange(len(ids))))
+            
+            masks = [np.zeros(shard['rows'], dtype=np.bool_) for shard in self.shards]
+            if entries:
+                all_ids = np.concatenate([ids for ids, _, _ in entries])
+                positions = np.concatenate([position for _, position, _ in entries])
+                rows = np.concatenate([row for _, _, row in entries])
+                _, newest = np.unique(all_ids, return_index=True)
+                for position, row in zip(positions[newest], rows[newest]):
+                    if position >= 0:
+                        masks[position][row] = True
+            self._live_masks = masks
+        
+        return self._live_masks
+    
+    @property
+    def has_history(self) -> bool:
+        """
+        Whether every shard stores the aggregate keys and creation times of its rows
+        """
+        return all(shard.get('history') for shard in self.shards)
+    
+    @property
+    def rows(self) -> int:
+        """
+        Number of live rows
+        """
+        return int(sum(mask.sum() for mask in self.live_masks()))
+    
+    def load(self, writable: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Concatenate the live rows of all shards into X.npy / y.npy and return
+        them memory-mapped, read-write if writable is set
+        
+        Shards are copied one at a time, so building the combined arrays only
+        ever holds a single shard in memory.
+        """
+        X_path = os.path.join(self.directory, 'X.npy')
+        y_path = os.path.join(self.directory, 'y.npy')
+        n_features = self.schema.n_features
+        masks = self.live_masks()
+        
+        X_all = np.lib.format.open_memmap(X_path, mode='w+', dtype=np.float32, shape=(self.rows, n_features))
+        y_all = np.lib.format.open_memmap(y_path, mode='w+', dtype=np.int8, shape=(self.rows,))
+        offset = 0
+        for (X, y), mask in zip(self.iter_shards(), masks):
+            count = int(mask.sum())
+            X_all[offset:offset + count] = X[mask]
+            y_all[offset:offset + count] = y[mask]
+            offset += count
+        X_all.flush()
+        y_all.flush()
+        del X_all, y_all
+        
+        mode = 'r+' if writable else 'r'
+        return np.load(X_path, mmap_mode=mode), np.load(y_path, mmap_mode='r')
+    
+    def load_history(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Aggregate key hashes and creation times of the live rows, in the row
+        order of load()
+        """
+        if not self.has_history:
+            raise ValueError(f"Shards at {self.directory} were written without aggregate history")
+        keys = []
+        created = []
+        for shard, mask in zip(self.shards, self.live_masks()):
+            keys.append(np.load(self._path(shard['name'], 'keys'))[mask])
+            created.append(np.load(self._path(shard['name'], 'created'))[mask])
+        if not keys:
+            return np.empty((0, 0), dtype=np.uint64), np.empty(0, dtype=np.float64)
+        return np.concatenate(keys), np.concatenate(created)
+    
+    def compact(self, rows_per_shard: int = 100000) -> 'ShardSet':
+        """
+        Rewrite the live rows into shards of about rows_per_shard rows,
+        dropping superseded rows and tombstones
+        """
+        writer = ShardWriter(self.directory, self.schema)
+        history = self.has_history
+        buffered = []
+        buffered_rows = 0
+        
+        def flush():
+            X, y, ids, *rest = (np.concatenate(parts) for parts in zip(*buffered))
+            writer.append(X, y, ids, None, *rest)
+        
+        for shard, (X, y), mask in zip(self.shards, self.iter_shards(), self.live_masks()):
+            ids = np.load(self._path(shard['name'], 'ids'))
+            parts = (X[mask], y[mask], ids[mask])
+            if history:
+                parts += (
+                    np.load(self._path(shard['name'], 'keys'))[mask],
+                    np.load(self._path(shard['name'], 'created'))[mask],
+                )
+            buffered.append(parts)
+            buffered_rows += int(mask.sum())
+            if buffered_rows >= rows_per_shard:
+                flush()
+                buffered = []
+                buffered_rows = 0
+        if buffered:
+            flush()
+        return writer.close(self.high_water_mark)
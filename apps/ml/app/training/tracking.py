@@ -0,0 +1,264 @@
+"""
+Experiment tracking with a local file store or MLflow backend
+"""
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+_STOP = object()
+
+class Tracker:
+    """
+    Non-blocking experiment tracker
+    
+    Logging calls only enqueue work; a background thread writes it to the
+    backend, draining the queue in batches so consecutive metrics are
+    written together. Backend failures are reported and dropped, so
+    training never waits on, or fails because of, the tracker.
+    """
+    
+    def __init__(self, max_batch: int = 500):
+        self.max_batch = max_batch
+        self.run_id: Optional[str] = None
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._drain, name='tracker', daemon=True)
+        self._thread.start()
+    
+    @contextmanager
+    def start_run(self, run_name: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Open a run that subsequent log calls apply to
+        """
+        previous = self.run_id
+        self.run_id = uuid.uuid4().hex
+        self._queue.put(('start_run', self.run_id, run_name, time.time()))
+        if params:
+            self.log_params(params)
+        try:
+            yield self.run_id
+        finally:
+            self._queue.put(('end_run', self.run_id, time.time()))
+            self.run_id = previous
+    
+    def log_params(self, params: Dict[str, Any]):
+        self._queue.put(('params', self.run_id, dict(params)))
+    
+    def log_metric(self, key: str, value: float, step: int = 0):
+        self._queue.put(('metric', self.run_id, key, float(value), step, time.time()))
+    
+    def log_metrics(self, metrics: Dict[str, float], step: int = 0):
+        for key, value in metrics.items():
+            self.log_metric(key, value, step)
+    
+    def log_model(self, model: Any, name: str = 'model'):
+        self._queue.put(('model', self.run_id, model, name))
+    
+    def close(self, timeout: float = 30.0):
+        """
+        Flush pending writes and stop the background thread
+        """
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"Warning: Tracker did not flush within {timeout}s, pending entries dropped")
+    
+    def _drain(self):
+        """
+        Background loop: take everything queued so far and write it in one go
+        """
+        while True:
+            items = [self._queue.get()]
+            while len(items) < self.max_batch:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = False
+            metrics: Dict[str, List[tuple]] = {}
+            for item in items:
+                if item is _STOP:
+                    stop = True
+                    continue
+                if item[0] == 'metric':
+                    metrics.setdefault(item[1], []).append(item[2:])
+                    continue
+                # Keep ordering: flush metrics gathered so far before other entries
+                self._write_metric_batches(metrics)
+                metrics = {}
+                self._safe_write(*item)
+            self._write_metric_batches(metrics)
+            
+            if stop:
+                return
+    
+    def _write_metric_batches(self, metrics: Dict[str, List[tuple]]):
+        for run_id, entries in metrics.items():
+            self._safe_write('metrics', run_id, entries)
+    
+    def _safe_write(self, kind: str, *args):
+        try:
+            getattr(self, f"_write_{kind}")(*args)
+        except Exception as e:
+            print(f"Warning: Tracker failed to write {kind}: {e}")
+    
+    # Backend hooks
+    def _write_start_run(self, run_id: str, run_name: Optional[str], started_at: float):
+        pass
+    
+    def _write_end_run(self, run_id: str, ended_at: float):
+        pass
+    
+    def _write_params(self, run_id: str, params: Dict[str, Any]):
+        pass
+    
+    def _write_metrics(self, run_id: str, entries: List[tuple]):
+        pass
+    
+    def _write_model(self, run_id: str, model: Any, name: str):
+        pass
+
+class NullTracker(Tracker):
+    """
+    Tracker that discards everything
+    """
+    pass
+
+class LocalFileTracker(Tracker):
+    """
+    Tracker writing runs under a local directory, fully offline
+    
+    Layout: <root>/<experiment>/<run_id>/{run.json, params.json,
+    metrics.jsonl, artifacts/<name>.pkl}
+    """
+    
+    def __init__(self, root: str, experiment: str, **kwargs):
+        self.experiment_dir = os.path.join(root, experiment)
+        os.makedirs(self.experiment_dir, exist_ok=True)
+        super().__init__(**kwargs)
+    
+    def _run_dir(self, run_id: str) -> str:
+        return os.path.join(self.experiment_dir, run_id)
+    
+    def _update_run(self, run_dir_id: str, **fields):
+        path = os.path.join(self._run_dir(run_dir_id), 'run.json')
+        run = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                run = json.load(f)
+        run.update(fields)
+        with open(path, 'w') as f:
+            json.dump(run, f, indent=2)
+    
+    def _write_start_run(self, run_id, run_name, started_at):
+        os.makedirs(self._run_dir(run_id), exist_ok=True)
+        self._update_run(run_id, run_id=run_id, run_name=run_name, started_at=started_at, status='RUNNING')
+    
+    def _write_end_run(self, run_id, ended_at):
+        self._update_run(run_id, ended_at=ended_at, status='FINISHED')
+    
+    def _write_params(self, run_id, params):
+        path = os.path.join(self._run_dir(run_id), 'params.json')
+        existing = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                existing = json.load(f)
+        existing.update({key: str(value) for key, value in params.items()})
+        with open(path, 'w') as f:
+            json.dump(existing, f, indent=2)
+    
+    def _write_metrics(self, run_id, entries):
+        lines = ''.join(
+            json.dumps({'key': key, 'value': value, 'step': step, 'timestamp': timestamp}) + '\n'
+            for key, value, step, timestamp in entries
+        )
+        with open(os.path.join(self._run_dir(run_id), 'metrics.jsonl'), 'a') as f:
+            f.write(lines)
+    
+    def _write_model(self, run_id, model, name):
+        import joblib
+        
+        artifacts = os.path.join(self._run_dir(run_id), 'artifacts')
+        os.makedirs(artifacts, exist_ok=True)
+        joblib.dump(model, os.path.join(artifacts, f"{name}.pkl"))
+
+class MlflowTracker(Tracker):
+    """
+    Tracker forwarding runs to an MLflow tracking server
+    
+    mlflow is imported lazily on the background thread, and metrics are
+    sent with one log_batch call per drained batch.
+    """
+    
+    def __init__(self, tracking_uri: str, experiment: str, **kwargs):
+        self.tracking_uri = tracking_uri
+        self.experiment = experiment
+        self._client = None
+        self._experiment_id = None
+        # Our run ids -> MLflow run ids
+        self._mlflow_runs: Dict[str, str] = {}
+        super().__init__(**kwargs)
+    
+    def _get_client(self):
+        if self._client is None:
+            import mlflow
+            from mlflow.tracking import MlflowClient
+            
+            mlflow.set_tracking_uri(self.tracking_uri)
+            self._client = MlflowClient(self.tracking_uri)
+            experiment = self._client.get_experiment_by_name(self.experiment)
+            self._experiment_id = (
+                experiment.experiment_id if experiment is not None
+                else self._client.create_experiment(self.experiment)
+            )
+        return self._client
+    
+    def _write_start_run(self, run_id, run_name, started_at):
+        client = self._get_client()
+        run = client.create_run(self._experiment_id, run_name=run_name, start_time=int(started_at * 1000))
+        self._mlflow_runs[run_id] = run.info.run_id
+    
+    def _write_end_run(self, run_id, ended_at):
+        self._get_client().set_terminated(self._mlflow_runs[run_id], end_time=int(ended_at * 1000))
+    
+    def _write_params(self, run_id, params):
+        from mlflow.entities import Param
+        
+        self._get_client().log_batch(
+            self._mlflow_runs[run_id],
+            params=[Param(key, str(value)) for key, value in params.items()]
+        )
+    
+    def _write_metrics(self, run_id, entries):
+        from mlflow.entities import Metric
+        
+        self._get_client().log_batch(
+            self._mlflow_runs[run_id],
+            metrics=[Metric(key, value, int(timestamp * 1000), step) for key, value, step, timestamp in entries]
+        )
+    
+    def _write_model(self, run_id, model, name):
+        import mlflow
+        import mlflow.sklearn
+        
+        self._get_client()
+        with mlflow.start_run(run_id=self._mlflow_runs[run_id]):
+            mlflow.sklearn.log_model(model, name)
+
+def create_tracker(config) -> Tracker:
+    """
+    Build the tracker selected by TRACKING_BACKEND (local, mlflow or none)
+    """
+    backend = config.TRACKING_BACKEND
+    if backend == 'mlflow':
+        return MlflowTracker(config.MLFLOW_TRACKING_URI, config.MLFLOW_EXPERIMENT_NAME)
+    if backend == 'local':
+        return LocalFileTracker(config.TRACKING_DIR, config.MLFLOW_EXPERIMENT_NAME)
+    if backend == 'none':
+        return NullTracker()
+    raise ValueError(f"Unknown tracking backend: {backend}")
@@ -0,0 +1,164 @@
+"""
+Micro-batching of concurrent single-order predictions
+"""
+import asyncio
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import numpy as np
+from app.config import config
+from app.utils.model_loader import score_batch
+from app.utils.executor import InferenceExecutor, inference_executor
+from app.utils.metrics import BATCH_ROWS
+
+BATCH_ROWS_MICROBATCH = BATCH_ROWS.labels('microbatch')
+
+class BatchSizeHistogram:
+    """
+    Histogram of dispatched batch sizes using power-of-two buckets
+    """
+    
+    def __init__(self, max_batch_size: int):
+        self.bounds = [1]
+        while self.bounds[-1] < max_batch_size:
+            self.bounds.append(self.bounds[-1] * 2)
+        self.counts = [0] * len(self.bounds)
+        self.batches = 0
+        self.rows = 0
+    
+    def record(self, size: int):
+        """
+        Record one dispatched batch
+        """
+        for i, bound in enumerate(self.bounds):
+            if size <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.batches += 1
+        self.rows += size
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the histogram as a JSON-serializable dict
+        """
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "meanBatchSize": self.rows / self.batches if self.batches else 0.0,
+            "buckets": {f"le_{bound}": count for bound, count in zip(self.bounds, self.counts)},
+        }
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-row predictions into vectorized batches
+    
+    Rows submitted through predict() are collected until either the batch
+    window elapses or max_batch_size rows are waiting, then scored with one
+    predict_fn call per model version on the inference executor. Each
+    caller's future is resolved with its own row's (risk score, confidence).
+    """
+    
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray, Optional[str]], np.ndarray],
+        executor: InferenceExecutor,
+        window_ms: float,
+        max_batch_size: int
+    ):
+        self.predict_fn = predict_fn
+        self.executor = executor
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.histogram = BatchSizeHistogram(self.max_batch_size)
+        self._loop = None
+        self._pending: List[Tuple[np.ndarray, Optional[str], asyncio.Future]] = []
+    
+    def _ensure_started(self):
+        """
+        Start the collector task on the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._pending = []
+        self._has_rows = asyncio.Event()
+        self._full = asyncio.Event()
+        self._collector = loop.create_task(self._collect())
+    
+    async def predict(self, row: np.ndarray, version: Optional[str] = None) -> Tuple[float, float]:
+        """
+        Queue a single feature row and wait for its risk score and
+        confidence from the given model version
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._pending.append((row, version, future))
+        self._has_rows.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await future
+    
+    async def _collect(self):
+        """
+        Cut batches from the pending queue and dispatch them
+        """
+        while True:
+            await self._has_rows.wait()
+            if len(self._pending) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.window)
+                except asyncio.TimeoutError:
+                    pass
+            
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            if not self._pending:
+                self._has_rows.clear()
+            if len(self._pending) < self.max_batch_size:
+                self._full.clear()
+            
+            self.histogram.record(len(batch))
+            BATCH_ROWS_MICROBATCH.observe(len(batch))
+            
+            # Rows queued across a model reload are scored by the version they were extracted for
+            by_version: Dict[Optional[str], List[Tuple[np.ndarray, asyncio.Future]]] = {}
+            for row, version, future in batch:
+                by_version.setdefault(version, []).append((row, future))
+            for version, rows in by_version.items():
+                self._loop.create_task(self._dispatch(rows, version))
+    
+    async def _dispatch(self, batch: List[Tuple[np.ndarray, asyncio.Future]], version: Optional[str]):
+        """
+        Score a batch on the inference executor and resolve the callers' futures
+        """
+        matrix = np.vstack([row for row, _ in batch])
+        try:
+            scores = await self.executor.run(self.predict_fn, matrix, version)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, future), (risk_score, confidence) in zip(batch, scores.tolist()):
+            if not future.done():
+                future.set_result((risk_score, confidence))
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return batching configuration and achieved batch-size histogram
+        """
+        return {
+            "windowMs": self.window * 1000.0,
+            "maxBatchSize": self.max_batch_size,
+            "pending": len(self._pending),
+            **self.histogram.snapshot(),
+        }
+
+micro_batcher = MicroBatcher(
+    score_batch,
+    inference_executor,
+    window_ms=config.SCORE_MICROBATCH_WINDOW_MS,
+    max_batch_size=config.SCORE_MICROBATCH_MAX_SIZE,
+)
@@ -1,56 +1,265 @@
 """
 Caching utilities for model predictions
 """
-import redis
+import asyncio
+import hashlib
 import json
-import os
-from typing import Optional, Dict, Any
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Awaitable, Callable, List
+import numpy as np
+from app.config import config
+from app.features.schema import FeatureSchema
+from app.utils.redis_pool import redis_pool
+from app.utils.metrics import CACHE_LOOKUP_STAGE, CACHE_WRITE_STAGE
 
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+def feature_cache_key(prefix: str, feature_row: np.ndarray, schema: FeatureSchema, model_version: str) -> str:
+    """
+    Fixed-size cache key for a feature row under a given model and schema
+    
+    Hashes the canonicalized feature vector, so orders that differ in any
+    feature the model sees get different keys, and orders that only differ
+    in fields the model ignores share one.
+    """
+    row = np.array(feature_row, dtype=np.float32)
+    # -0.0 and 0.0 score identically; collapse NaN payloads to one bit pattern
+    row += 0.0
+    row[np.isnan(row)] = np.nan
+    
+    digest = hashlib.blake2b(row.tobytes(), digest_size=16, key=schema.fingerprint.encode())
+    return f"{prefix}:{model_version}:{schema.version}:{digest.hexdigest()}"
 
-class Cache:
+class LocalCache:
     """
-    Redis-based cache for predictions
+    In-process LRU cache with per-entry TTL and a size bound
     """
     
-    def __init__(self):
-        try:
-            self.redis_client = redis.from_url(REDIS_URL) if REDIS_URL else None
-        except Exception as e:
-            print(f"Error connecting to Redis: {e}")
-            self.redis_client = None
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
     
     def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "maxSize": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+class Cache:
+    """
+    Two-tier cache for predictions: in-process LRU in front of Redis
+    
+    Uses the shared asyncio Redis pool so cache round-trips never block the
+    event loop. get_or_compute() coalesces concurrent misses on the same key
+    into a single computation; get_many()/set_many() cover a whole batch in
+    one round-trip.
+    """
+    
+    def __init__(self, redis_client=None):
+        self.redis_client = redis_client if redis_client is not None else redis_pool.async_client()
+        self.local = LocalCache(max_size=config.CACHE_LOCAL_MAX_SIZE, ttl=config.CACHE_LOCAL_TTL)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.coalesced = 0
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
         """
         Get cached value
         """
+        with CACHE_LOOKUP_STAGE.time():
+            return await self._get(key)
+    
+    async def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        
         if not self.redis_client:
             return None
         
         try:
-            cached = self.redis_client.get(key)
+            cached = await self.redis_client.get(key)
             if cached:
-                return json.loads(cached)
+                self.redis_hits += 1
+                value = json.loads(cached)
+                self.local.set(key, value)
+                return value
+            self.redis_misses += 1
         except Exception as e:
             print(f"Error getting from cache: {e}")
         
         return None
     
-    def set(self, key: str, value: Dict[str, Any], ttl: int = 3600):
+    async def set(self, key: str, value: Dict[str, Any], ttl: int = 3600):
         """
         Set cached value with TTL
         """
+        with CACHE_WRITE_STAGE.time():
+            await self._set(key, value, ttl)
+    
+    async def _set(self, key: str, value: Dict[str, Any], ttl: int):
+        self.local.set(key, value, ttl)
+        
         if not self.redis_client:
             return
         
         try:
-            self.redis_client.setex(
+            await self.redis_client.setex(
                 key,
                 ttl,
                 json.dumps(value)
             )
         except Exception as e:
             print(f"Error setting cache: {e}")
+    
+    async def get_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Get cached values for several keys, None where missing
+        Keys missing from the in-process tier are fetched with a single MGET
+        """
+        with CACHE_LOOKUP_STAGE.time():
+            return await self._get_many(keys)
+    
+    async def _get_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        values = [self.local.get(key) for key in keys]
+        missing = [index for index, value in enumerate(values) if value is None]
+        if not missing or not self.redis_client:
+            return values
+        
+        try:
+            cached = await self.redis_client.mget([keys[index] for index in missing])
+            for index, raw in zip(missing, cached):
+                if raw:
+                    self.redis_hits += 1
+                    values[index] = json.loads(raw)
+                    self.local.set(keys[index], values[index])
+                else:
+                    self.redis_misses += 1
+        except Exception as e:
+            print(f"Error getting from cache: {e}")
+        
+        return values
+    
+    async def set_many(self, items: Dict[str, Dict[str, Any]], ttl: int = 3600):
+        """
+        Set several cached values with TTL in one pipelined round-trip
+        """
+        with CACHE_WRITE_STAGE.time():
+            await self._set_many(items, ttl)
+    
+    async def _set_many(self, items: Dict[str, Dict[str, Any]], ttl: int):
+        for key, value in items.items():
+            self.local.set(key, value, ttl)
+        
+        if not self.redis_client or not items:
+            return
+        
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.setex(key, ttl, json.dumps(value))
+                await pipe.execute()
+        except Exception as e:
+            print(f"Error setting cache: {e}")
+    
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl: int = 3600
+    ) -> Dict[str, Any]:
+        """
+        Return the cached value, or compute and cache it
+        
+        Concurrent misses on the same key wait for the first caller's
+        computation instead of repeating it (single-flight). If that caller
+        is cancelled, its waiters aren't: they retry, and one of them takes
+        over the computation.
+        """
+        while True:
+            value = await self.get(key)
+            if value is not None:
+                return value
+            
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            # asyncio.wait neither cancels inflight if this waiter is cancelled
+            # nor raises if the leader was
+            await asyncio.wait((inflight,))
+            if not inflight.cancelled():
+                return inflight.result()
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            # Only this request was cancelled; let the waiters retry
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure isn't reported as a warning
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            del self._inflight[key]
+        
+        await self.set(key, value, ttl)
+        return value
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "local": self.local.stats(),
+            "redis": {
+                "enabled": self.redis_client is not None,
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+            },
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
 
 cache = Cache()
-
@@ -0,0 +1,60 @@
+"""
+Probability calibration served from a compact lookup table
+"""
+import json
+from typing import Any, Dict
+import numpy as np
+
+class ProbabilityCalibrator:
+    """
+    Piecewise-linear map from raw model probability to calibrated probability
+    
+    Stored as two short ascending arrays (raw probability breakpoints and
+    the calibrated probability at each), fitted at training time by
+    app.training.calibration. Applying it is one np.interp call over the
+    whole batch: a binary search per row, with no extra model call.
+    """
+    
+    def __init__(self, raw: np.ndarray, calibrated: np.ndarray, meta: Dict[str, Any] = None):
+        self.raw = np.asarray(raw, dtype=np.float64)
+        self.calibrated = np.asarray(calibrated, dtype=np.float64)
+        self.meta = dict(meta or {})
+        if self.raw.ndim != 1 or self.raw.shape != self.calibrated.shape or len(self.raw) < 2:
+            raise ValueError("Calibration table needs at least two matching breakpoints")
+        if np.any(np.diff(self.raw) < 0):
+            raise ValueError("Calibration breakpoints must be ascending")
+    
+    def __len__(self) -> int:
+        return len(self.raw)
+    
+    def apply(self, probabilities: np.ndarray) -> np.ndarray:
+        """
+        Calibrated probabilities; inputs outside the table are clamped to its ends
+        """
+        return np.interp(probabilities, self.raw, self.calibrated)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'raw': self.raw.tolist(),
+            'calibrated': self.calibrated.tolist(),
+            'meta': self.meta,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ProbabilityCalibrator':
+        return cls(data['raw'], data['calibrated'], data.get('meta'))
+    
+    def save(self, path: str):
+        """
+        Write the table as JSON
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+    
+    @classmethod
+    def load(cls, path: str) -> 'ProbabilityCalibrator':
+        """
+        Read a table written by save()
+        """
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,107 @@
+"""
+Bounded executor for running model inference off the event loop
+"""
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from app.config import config
+from app.utils.model_loader import warm_up_worker
+
+class InferenceOverloadedError(Exception):
+    """
+    Raised when the inference queue is full and the request should be shed
+    """
+    pass
+
+class InferenceExecutor:
+    """
+    Size-limited thread or process pool with a queue limit
+    
+    At most queue_limit jobs may be queued or running at once; further
+    submissions fail immediately with InferenceOverloadedError instead of
+    piling up behind a slow prediction.
+    """
+    
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: int = 2,
+        queue_limit: int = 64,
+        initializer: Optional[Callable[[], Any]] = None
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self.initializer = initializer
+        self.in_flight = 0
+        self.rejected = 0
+        self._pool: Optional[Executor] = None
+    
+    def _get_pool(self) -> Executor:
+        """
+        Create the worker pool on first use
+        """
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=self.initializer)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        return self._pool
+    
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Run fn(*args) on the pool, or raise InferenceOverloadedError if the queue is full
+        
+        With the process pool, fn and args must be picklable (use module-level functions).
+        """
+        if self.in_flight >= self.queue_limit:
+            self.rejected += 1
+            raise InferenceOverloadedError(
+                f"Inference queue full ({self.in_flight}/{self.queue_limit} jobs in flight)"
+            )
+        
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            self.in_flight -= 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return pool configuration and queue depth
+        """
+        return {
+            "kind": self.kind,
+            "maxWorkers": self.max_workers,
+            "queueLimit": self.queue_limit,
+            "inFlight": self.in_flight,
+            "rejected": self.rejected,
+        }
+    
+    def recycle(self):
+        """
+        Replace a process pool so new jobs go to fresh workers, e.g. after a
+        model reload; the old workers finish their queued jobs and exit
+        Thread pools share the process's model and are left alone
+        """
+        if self.kind == "process" and self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.shutdown(wait=False)
+    
+    def shutdown(self):
+        """
+        Stop the worker pool
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+inference_executor = InferenceExecutor(
+    kind=config.INFERENCE_EXECUTOR,
+    max_workers=config.INFERENCE_WORKERS,
+    queue_limit=config.INFERENCE_QUEUE_LIMIT,
+    initializer=warm_up_worker,
+)
@@ -0,0 +1,276 @@
+"""
+In-process metrics with Prometheus text exposition
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; spans sub-millisecond stages up to slow requests
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Sharded:
+    """
+    Per-thread value slots, summed when scraped
+    
+    Each thread only ever writes its own slots, so recording needs no lock
+    and never loses an update; list.append is atomic, so registering a new
+    thread's shard doesn't either.
+    """
+    
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+    
+    def _shard(self) -> List[float]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = [0] * self._size
+            self._local.shard = shard
+            self._shards.append(shard)
+            return shard
+    
+    def _totals(self) -> List[float]:
+        totals = [0] * self._size
+        for shard in list(self._shards):
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+class CounterChild(_Sharded):
+    def __init__(self):
+        super().__init__(1)
+    
+    def inc(self, amount: float = 1):
+        self._shard()[0] += amount
+    
+    @property
+    def value(self) -> float:
+        return self._totals()[0]
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+    
+    def __init__(self, histogram: 'HistogramChild'):
+        self.histogram = histogram
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+
+class HistogramChild(_Sharded):
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # One slot per bucket, one for +Inf, then the running sum
+        super().__init__(len(self.buckets) + 2)
+    
+    def observe(self, value: float):
+        shard = self._shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+    
+    def time(self) -> _Timer:
+        """
+        Context manager observing the elapsed wall time in seconds
+        """
+        return _Timer(self)
+    
+    def snapshot(self) -> Tuple[List[int], float]:
+        totals = self._totals()
+        return totals[:-1], totals[-1]
+
+class _Family:
+    kind = ''
+    
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def labels(self, *label_values: str):
+        """
+        The child metric for one combination of label values
+        Look children up once and keep them on hot paths
+        """
+        key = tuple(str(value) for value in label_values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {key}")
+            child = self._children.setdefault(key, self._new_child())
+        return child
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(label_values, child))
+        return lines
+
+class Counter(_Family):
+    kind = 'counter'
+    
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+    
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+    
+    def _render_child(self, label_values, child: CounterChild) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(child.value)}"]
+
+class Histogram(_Family):
+    kind = 'histogram'
+    
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(sorted(buckets))
+    
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+    
+    def observe(self, value: float):
+        self.labels().observe(value)
+    
+    def time(self) -> _Timer:
+        return self.labels().time()
+    
+    def _render_child(self, label_values, child: HistogramChild) -> List[str]:
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, label_values, le)} {cumulative}")
+        labels = _format_labels(self.label_names, label_values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Callback(_Family):
+    """
+    Metric read from existing state when scraped, e.g. queue depths
+    
+    fn returns either a single number or a list of (label_values, number).
+    """
+    
+    def __init__(self, name: str, help: str, kind: str, fn: Callable[[], Any], label_names: Sequence[str] = ()):
+        super().__init__(name, help, label_names)
+        self.kind = kind
+        self.fn = fn
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"Error collecting metric {self.name}: {e}")
+            return lines
+        if not isinstance(values, list):
+            values = [((), values)]
+        for label_values, value in values:
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Named metrics rendered together in the Prometheus text format
+    """
+    
+    def __init__(self):
+        self.metrics: Dict[str, _Family] = {}
+    
+    def _register(self, metric: _Family) -> Any:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, label_names))
+    
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, label_names, buckets))
+    
+    def callback(
+        self,
+        name: str,
+        help: str,
+        fn: Callable[[], Any],
+        kind: str = 'gauge',
+        label_names: Sequence[str] = ()
+    ) -> Callback:
+        return self._register(Callback(name, help, kind, fn, label_names))
+    
+    def unregister(self, name: str):
+        self.metrics.pop(name, None)
+    
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+
+# Time spent in each stage of scoring a request
+STAGE_SECONDS = metrics.histogram(
+    'ml_score_stage_seconds',
+    'Time spent per scoring stage',
+    label_names=('stage',),
+)
+AUTH_STAGE = STAGE_SECONDS.labels('auth')
+RULES_STAGE = STAGE_SECONDS.labels('rules')
+CACHE_LOOKUP_STAGE = STAGE_SECONDS.labels('cache_lookup')
+EXTRACT_STAGE = STAGE_SECONDS.labels('extract')
+SCALE_STAGE = STAGE_SECONDS.labels('scale')
+PREDICT_STAGE = STAGE_SECONDS.labels('predict')
+INFERENCE_STAGE = STAGE_SECONDS.labels('inference')
+CACHE_WRITE_STAGE = STAGE_SECONDS.labels('cache_write')
+
+REQUEST_SECONDS = metrics.histogram(
+    'ml_http_request_duration_seconds',
+    'HTTP request latency by route and status',
+    label_names=('method', 'route', 'status'),
+)
+
+BATCH_ROWS = metrics.histogram(
+    'ml_inference_batch_rows',
+    'Rows per model call, from micro-batches and batch requests',
+    label_names=('source',),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
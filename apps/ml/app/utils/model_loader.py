@@ -1,95 +1,853 @@
 """
 Model loading utilities
 """
-import joblib
+import hashlib
+import json
 import os
-from typing import Any
+import shutil
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import numpy as np
+from app.config import config
+from app.features.extractor import FeatureExtractor, LEGACY_FEATURE_SCHEMA
+from app.features.schema import FeatureSchema, SchemaMismatchError
+from app.utils.calibration import ProbabilityCalibrator
+from app.utils.rules import RuleSet
+from app.utils.metrics import SCALE_STAGE, PREDICT_STAGE
 
 MODEL_PATH = os.getenv("MODEL_PATH", "./models/risk_model.pkl")
-SCALER_PATH = MODEL_PATH.replace('.pkl', '_scaler.pkl')
+MODEL_ENGINE = os.getenv("MODEL_ENGINE", "auto")  # auto | compiled | quantized | native
+# With MODEL_ENGINE=auto, batches up to this many rows use the compiled
+# ensemble and larger ones the native model, which scales better per row
+COMPILED_MAX_ROWS = int(os.getenv("COMPILED_MAX_ROWS", 32))
+
+class CompiledTreeEnsemble:
+    """
+    Gradient-boosted tree ensemble flattened into NumPy arrays
+    
+    Produced by app.training.export from a trained XGBoost/LightGBM model and
+    its StandardScaler, if any. Scores raw (unscaled) feature rows with vectorized
+    tree traversal, without importing the training libraries.
+    """
+    
+    ARRAY_NAMES = (
+        'feature', 'threshold', 'left', 'right', 'default_left',
+        'value', 'gain', 'cover', 'roots', 'mean', 'scale',
+    )
+    
+    # Largest rows x nodes batch whose branches are all decided up front
+    DENSE_STEP_LIMIT = 8192
+    
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        self.arrays = arrays
+        self.meta = meta
+        # Plain ndarray views of the memory maps: same shared pages, without
+        # np.memmap's per-call overhead on every fancy index
+        self.feature = np.asarray(arrays['feature'])
+        self.threshold = np.asarray(arrays['threshold'])
+        self.left = np.asarray(arrays['left'])
+        self.right = np.asarray(arrays['right'])
+        self.default_left = np.asarray(arrays['default_left'])
+        self.value = np.asarray(arrays['value'])
+        self.roots = np.asarray(arrays['roots'])
+        self.mean = np.asarray(arrays['mean'])
+        self.scale = np.asarray(arrays['scale'])
+        self.base_margin = float(meta['base_margin'])
+        self.sigmoid_scale = float(meta['sigmoid_scale'])
+        self.max_depth = int(meta['max_depth'])
+        self.n_features = int(meta['n_features'])
+        self.input_float32 = meta['input_dtype'] == 'float32'
+        self.scaled = bool(meta.get('scaled', True))
+        self.scale_dtype = np.dtype(meta.get('scale_dtype', 'float64'))
+        params_dtype = np.dtype(meta.get('scale_params_dtype', 'float64'))
+        self.scale_mean = self.mean.astype(params_dtype)
+        self.scale_std = self.scale.astype(params_dtype)
+        self._build_traversal()
+    
+    def _build_traversal(self):
+        """
+        Flat lookup tables for margin()
+        
+        Leaves read an extra always-zero feature column against an infinite
+        threshold and loop back to themselves, so every row takes max_depth
+        steps without masking. children holds each node's (left, right)
+        pair, so a step is one gather at 2 * node + went_right.
+        left_child and right_child are the same pairs for the dense path.
+        """
+        leaf = self.feature < 0
+        nodes = np.arange(len(leaf))
+        threshold = np.asarray(self.threshold, dtype=np.float64)
+        # float32 models compare exactly in float32, at half the memory traffic
+        exact_float32 = np.array_equal(threshold[~leaf].astype(np.float32), threshold[~leaf])
+        self.compare_dtype = np.dtype(np.float32 if self.input_float32 and exact_float32 else np.float64)
+        self.step_feature = np.where(leaf, self.n_features, self.feature).astype(np.intp)
+        self.step_threshold = np.where(leaf, np.inf, threshold).astype(self.compare_dtype)
+        self.step_default_right = ~np.asarray(self.default_left, dtype=np.bool_)
+        self.left_child = np.where(leaf, nodes, self.left).astype(np.intp)
+        self.right_child = np.where(leaf, nodes, self.right).astype(np.intp)
+        self.children = np.empty(2 * len(leaf), dtype=np.intp)
+        self.children[0::2] = self.left_child
+        self.children[1::2] = self.right_child
+        self.step_roots = self.roots.astype(np.intp)
+        self.leaf_value = self.value.astype(np.float64)
+    
+    @classmethod
+    def load(cls, path: str) -> 'CompiledTreeEnsemble':
+        """
+        Load a compiled ensemble saved with save()
+        
+        Arrays are memory-mapped read-only, so every process serving the same
+        artifact shares one copy of the trees through the page cache. Legacy
+        .npz archives are still accepted but are read into private memory.
+        """
+        if os.path.isdir(path):
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r', allow_pickle=False)
+                for name in cls.ARRAY_NAMES
+            }
+        else:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in cls.ARRAY_NAMES}
+                meta = json.loads(str(data['meta']))
+        return cls(arrays, meta)
+    
+    def save(self, path: str):
+        """
+        Save the ensemble as a directory of .npy files plus meta.json
+        The directory is written next to path and swapped in with renames
+        """
+        work_dir = f"{path}.tmp"
+        if os.path.exists(work_dir):
+            shutil.rmtree(work_dir)
+        os.makedirs(work_dir)
+        for name in self.ARRAY_NAMES:
+            np.save(os.path.join(work_dir, f'{name}.npy'), np.ascontiguousarray(self.arrays[name]))
+        with open(os.path.join(work_dir, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        
+        if os.path.exists(path):
+            old_dir = f"{path}.old"
+            os.rename(path, old_dir)
+            os.rename(work_dir, path)
+            shutil.rmtree(old_dir)
+        else:
+            os.rename(work_dir, path)
+    
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """
+        Scale unscaled features X exactly as the exported scaler would
+        """
+        # Mirror StandardScaler.transform, which scales in place in the input dtype
+        X = np.asarray(X, dtype=self.scale_dtype)
+        if self.scaled:
+            X = (X - self.scale_mean).astype(self.scale_dtype, copy=False)
+            X = (X / self.scale_std).astype(self.scale_dtype, copy=False)
+        if self.input_float32:
+            X = X.astype(np.float32, copy=False)
+        return X.astype(np.float64, copy=False)
+    
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """
+        Raw margin (log-odds) for each row of unscaled features X
+        """
+        return self.margin(self.transform(X))
+    
+    def margin(self, X: np.ndarray) -> np.ndarray:
+        """
+        Raw margin (log-odds) for each row of features already scaled by transform()
+        """
+        n_rows, width = X.shape[0], self.n_features + 1
+        padded = np.zeros((n_rows, width), dtype=self.compare_dtype)
+        padded[:, :-1] = X
+        if n_rows * len(self.step_feature) <= self.DENSE_STEP_LIMIT:
+            return self._dense_margin(padded)
+        flat = padded.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * width)[:, np.newaxis]
+        any_missing = bool(np.isnan(X).any())
+        
+        # One gather per table and level across all rows and trees, into reused buffers
+        shape = (n_rows, len(self.step_roots))
+        nodes = np.empty(shape, dtype=np.intp)
+        nodes[:] = self.step_roots
+        positions = np.empty(shape, dtype=np.intp)
+        values = np.empty(shape, dtype=self.compare_dtype)
+        thresholds = np.empty(shape, dtype=self.compare_dtype)
+        went_right = np.empty(shape, dtype=np.bool_)
+        for _ in range(self.max_depth):
+            np.take(self.step_feature, nodes, out=positions)
+            positions += row_offsets
+            np.take(flat, positions, out=values)
+            np.take(self.step_threshold, nodes, out=thresholds)
+            np.greater_equal(values, thresholds, out=went_right)
+            if any_missing:
+                missing = np.isnan(values)
+                went_right[missing] = self.step_default_right[nodes[missing]]
+            nodes <<= 1
+            nodes += went_right
+            np.take(self.children, nodes, out=nodes)
+        
+        return np.take(self.leaf_value, nodes).sum(axis=1) + self.base_margin
+    
+    def _dense_margin(self, padded: np.ndarray) -> np.ndarray:
+        """
+        margin() for small batches: decide every node's branch for every row
+        at once, so each level is a single gather of the next node
+        """
+        n_nodes = len(self.step_feature)
+        node_values = padded.take(self.step_feature, axis=1)
+        went_right = node_values >= self.step_threshold
+        missing = np.isnan(node_values)
+        if missing.any():
+            went_right = np.where(missing, self.step_default_right, went_right)
+        # Successor of every node, numbered across all rows' copies of the ensemble
+        node_offsets = (np.arange(len(padded), dtype=np.intp) * n_nodes)[:, np.newaxis]
+        successors = np.where(went_right, self.right_child, self.left_child)
+        successors += node_offsets
+        successors = successors.ravel()
+        nodes = self.step_roots + node_offsets
+        for _ in range(self.max_depth):
+            nodes = successors.take(nodes)
+        nodes -= node_offsets
+        return self.leaf_value.take(nodes).sum(axis=1) + self.base_margin
+    
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Class probabilities in sklearn layout: column 1 is P(confirmed)
+        """
+        return self.proba_from_margin(self.decision_function(X))
+    
+    def proba_from_margin(self, margin: np.ndarray) -> np.ndarray:
+        positive = 1.0 / (1.0 + np.exp(-self.sigmoid_scale * margin))
+        return np.column_stack([1.0 - positive, positive])
+
+class QuantizedTreeEnsemble(CompiledTreeEnsemble):
+    """
+    Pruned tree ensemble that splits on uint8 feature bins
+    
+    Produced by app.training.quantize from a CompiledTreeEnsemble. Each
+    feature's split thresholds become sorted bin edges, so a row is binned
+    once per batch with one searchsorted per feature and every split is a
+    uint8 comparison against the threshold's bin index. threshold holds
+    those indices and value holds float16 or int8 leaves (times
+    meta['leaf_scale']). Missing values get MISSING_BIN and follow
+    default_left as before.
+    """
+    
+    ARRAY_NAMES = CompiledTreeEnsemble.ARRAY_NAMES + ('bin_edges', 'bin_offsets')
+    
+    # Bins 0..254 hold values; a feature can have at most 254 edges
+    MISSING_BIN = 255
+    MAX_EDGES = 254
+    
+    # Largest rows x edges comparison done by broadcasting instead of per-feature searches
+    BROADCAST_BIN_LIMIT = 65536
+    
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        super().__init__(arrays, meta)
+        self.bin_edges = np.asarray(arrays['bin_edges'])
+        self.bin_offsets = np.asarray(arrays['bin_offsets'])
+        self.leaf_scale = float(meta.get('leaf_scale', 1.0))
+        self.binned_features = [
+            (feature, self.bin_edges[self.bin_offsets[feature]:self.bin_offsets[feature + 1]])
+            for feature in range(self.n_features)
+            if self.bin_offsets[feature + 1] > self.bin_offsets[feature]
+        ]
+        # The same edges padded into one matrix, to bin small batches in one comparison
+        self.binned_columns = np.asarray([feature for feature, _ in self.binned_features], dtype=np.intp)
+        width = max((len(edges) for _, edges in self.binned_features), default=0)
+        self.edge_matrix = np.full((len(self.binned_features), width), np.inf)
+        for i, (_, edges) in enumerate(self.binned_features):
+            self.edge_matrix[i, :len(edges)] = edges
+    
+    def _build_traversal(self):
+        """
+        Traversal tables: leaves read an extra always-zero column and loop
+        back to themselves, so every row takes the same steps without
+        masking, and a split's right child always follows its left child
+        """
+        leaf = self.feature < 0
+        internal = np.flatnonzero(~leaf)
+        if not np.array_equal(self.right[internal], self.left[internal] + 1):
+            raise ValueError("Quantized ensemble must store each split's children adjacently")
+        self.step_feature = np.where(leaf, self.n_features, self.feature).astype(np.intp)
+        self.step_threshold = np.where(leaf, 1, self.threshold).astype(np.uint8)
+        self.step_left = np.where(leaf, np.arange(len(leaf)), self.left).astype(np.intp)
+    
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """
+        Scale unscaled features X as the exported scaler would, then bin them
+        Bin b of a feature holds values with exactly b edges at or below
+        them; the extra last column is the constant bin leaves read
+        """
+        X = super().transform(X)
+        binned = np.zeros((X.shape[0], self.n_features + 1), dtype=np.uint8)
+        if X.shape[0] * self.edge_matrix.size <= self.BROADCAST_BIN_LIMIT:
+            columns = X[:, self.binned_columns]
+            binned[:, self.binned_columns] = (columns[:, :, np.newaxis] >= self.edge_matrix).sum(axis=2)
+        else:
+            for feature, edges in self.binned_features:
+                binned[:, feature] = np.searchsorted(edges, X[:, feature], side='right')
+        missing = np.isnan(X)
+        if missing.any():
+            binned[:, :-1][missing] = self.MISSING_BIN
+        return binned
+    
+    def margin(self, X: np.ndarray) -> np.ndarray:
+        """
+        Raw margin (log-odds) for each row of features binned by transform()
+        """
+        n_rows, width = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * width)[:, np.newaxis]
+        any_missing = bool((X == self.MISSING_BIN).any())
+        nodes = np.broadcast_to(self.roots.astype(np.intp), (n_rows, len(self.roots)))
+        for _ in range(self.max_depth):
+            values = np.take(flat, row_offsets + np.take(self.step_feature, nodes))
+            go_left = values < np.take(self.step_threshold, nodes)
+            if any_missing:
+                go_left = np.where(values == self.MISSING_BIN, np.take(self.default_left, nodes), go_left)
+            nodes = np.take(self.step_left, nodes) + ~go_left
+        
+        # Accumulate the low-precision leaves in float64
+        return np.take(self.value, nodes).sum(axis=1, dtype=np.float64) * self.leaf_scale + self.base_margin
+
+def _artifact_paths(model_path: str) -> Dict[str, str]:
+    return {
+        'model': model_path,
+        'scaler': model_path.replace('.pkl', '_scaler.pkl'),
+        'compiled': model_path.replace('.pkl', '_compiled'),
+        'compiled_legacy': model_path.replace('.pkl', '_compiled.npz'),
+        'quantized': model_path.replace('.pkl', '_quantized'),
+        'schema': model_path.replace('.pkl', '_schema.json'),
+        'calibration': model_path.replace('.pkl', '_calibration.json'),
+        'quantized_calibration': model_path.replace('.pkl', '_quantized_calibration.json'),
+        'rules': model_path.replace('.pkl', '_rules.json'),
+    }
+
+def _artifact_files(model_path: str) -> List[str]:
+    """
+    Every existing artifact file for a model, expanding directories
+    """
+    files = []
+    for path in _artifact_paths(model_path).values():
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)))
+        elif os.path.exists(path):
+            files.append(path)
+    return files
+
+def _load_model(model_path: str) -> Any:
+    """
+    Load the native risk scoring model
+    Raises FileNotFoundError if there is none; there is no dummy fallback
+    """
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found at {model_path}")
+    # Imported here so serving a compiled model never loads joblib or sklearn
+    import joblib
+    model = joblib.load(model_path)
+    print(f"Model loaded from {model_path}")
+    return model
+
+def _load_scaler(scaler_path: str) -> Any:
+    """
+    Load the feature scaler, or None to score features unscaled
+    """
+    if not os.path.exists(scaler_path):
+        print(f"No scaler at {scaler_path}, scoring unscaled features")
+        return None
+    import joblib
+    scaler = joblib.load(scaler_path)
+    print(f"Scaler loaded from {scaler_path}")
+    return scaler
+
+def artifact_version(model_path: str) -> str:
+    """
+    Version of the model artifacts at model_path, used to namespace cached scores
+    
+    Combines MODEL_VERSION with a digest of the artifact files, so
+    retraining in place changes the version even if MODEL_VERSION doesn't.
+    """
+    digest = hashlib.blake2b(digest_size=6)
+    for path in _artifact_files(model_path):
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return f"{config.MODEL_VERSION}+{digest.hexdigest()}"
+
+def _artifact_signature(model_path: str) -> Tuple:
+    """
+    Cheap fingerprint (mtime, size) of the artifact files, for change detection
+    """
+    signature = []
+    for path in _artifact_files(model_path):
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            pass
+    return tuple(signature)
+
+# Orders covering each categorical branch, used to warm up a freshly loaded model
+WARM_UP_ORDERS = [
+    {
+        'amount': amount,
+        'currency': currency,
+        'paymentMode': payment_mode,
+        'platform': platform,
+        'email': 'warmup@example.com',
+        'phone': '9000000000',
+        'customer': {'name': 'Warm Up', 'address': '1 Main Road', 'pincode': '560001', 'country': 'IN'},
+    }
+    for amount in (99.0, 1499.0, 24999.0)
+    for currency, payment_mode in (('INR', 'cod'), ('INR', 'prepaid'), ('USD', 'prepaid'))
+    for platform in ('shopify', 'woocommerce', 'api')
+]
+
+class ModelBundle:
+    """
+    Immutable snapshot of one model version: model, scaler, compiled
+    ensemble, probability calibrator, rule tier, feature schema and extractor
+    
+    Requests take a reference to the live bundle once and use it for both
+    feature extraction and scoring, so a reload can never pair one
+    version's features with another version's model.
+    """
+    
+    def __init__(
+        self,
+        version: str,
+        schema: FeatureSchema,
+        extractor: FeatureExtractor,
+        model: Any = None,
+        scaler: Any = None,
+        compiled: Optional[CompiledTreeEnsemble] = None,
+        model_path: str = '',
+        calibrator: Optional[ProbabilityCalibrator] = None,
+        rules: Optional[RuleSet] = None,
+        artifact_version: Optional[str] = None
+    ):
+        self.version = version
+        # Version of the files on disk, before any engine suffix; reloads compare against it
+        self.artifact_version = artifact_version or version
+        self.schema = schema
+        self.extractor = extractor
+        self.model = model
+        self.scaler = scaler
+        self.compiled = compiled
+        self.model_path = model_path
+        self.calibrator = calibrator
+        self.rules = rules
+        self.loaded_at = time.time()
+    
+    @classmethod
+    def load(cls, model_path: str = MODEL_PATH, engine: str = MODEL_ENGINE) -> 'ModelBundle':
+        """
+        Load every artifact for the model at model_path
+        Raises SchemaMismatchError if the artifacts don't fit together
+        """
+        paths = _artifact_paths(model_path)
+        version = on_disk = artifact_version(model_path)
+        
+        # Feature schema the model was trained on
+        if os.path.exists(paths['schema']):
+            schema = FeatureSchema.load(paths['schema'])
+            print(f"Feature schema v{schema.version} loaded from {paths['schema']}")
+        else:
+            schema = LEGACY_FEATURE_SCHEMA
+            print(f"Warning: Feature schema not found at {paths['schema']}, assuming v{schema.version}")
+        extractor = FeatureExtractor(schema)
+        
+        # Compiled tree ensemble, if the engine allows it and one was exported;
+        # the quantized variant is only served when asked for explicitly
+        compiled = None
+        if engine == 'quantized':
+            compiled_path = paths['quantized'] if os.path.exists(paths['quantized']) else None
+            if compiled_path is None:
+                raise FileNotFoundError(f"Quantized model not found at {paths['quantized']}")
+            ensemble_class = QuantizedTreeEnsemble
+            # Scores differ slightly from the full model, so keep them apart in caches
+            version = f"{version}-quantized"
+        else:
+            compiled_path = next(
+                (path for path in (paths['compiled'], paths['compiled_legacy']) if os.path.exists(path)), None
+            )
+            ensemble_class = CompiledTreeEnsemble
+        if engine != 'native' and compiled_path is not None:
+            compiled = ensemble_class.load(compiled_path)
+            if 'feature_schema' in compiled.meta:
+                schema.check_compatible(FeatureSchema.from_dict(compiled.meta['feature_schema']))
+            if compiled.n_features != schema.n_features:
+                raise SchemaMismatchError(
+                    f"Compiled model expects {compiled.n_features} features, "
+                    f"schema defines {schema.n_features}"
+                )
+            print(f"{'Quantized' if engine == 'quantized' else 'Compiled'} model loaded from {compiled_path}")
+        elif engine == 'compiled':
+            raise FileNotFoundError(f"Compiled model not found at {paths['compiled']}")
+        
+        # Native model and scaler: needed without a compiled ensemble, and in
+        # auto mode for batches larger than COMPILED_MAX_ROWS
+        model = scaler = None
+        if compiled is None or (engine == 'auto' and os.path.exists(paths['model'])):
+            model = _load_model(paths['model'])
+            scaler = _load_scaler(paths['scaler'])
+        
+        # Calibration table for confidences, fitted to the engine's own
+        # probabilities; older models fall back to raw probabilities
+        calibrator = None
+        calibration_path = paths['calibration']
+        if engine == 'quantized' and os.path.exists(paths['quantized_calibration']):
+            calibration_path = paths['quantized_calibration']
+        if os.path.exists(calibration_path):
+            calibrator = ProbabilityCalibrator.load(calibration_path)
+            print(f"Calibration table ({len(calibrator)} points) loaded from {calibration_path}")
+        
+        # Rule tier derived with this model; skipped entirely when disabled
+        rules = None
+        if config.RULES_ENABLED and os.path.exists(paths['rules']):
+            rules = RuleSet.load(paths['rules'])
+            print(f"{len(rules)} scoring rules loaded from {paths['rules']}")
+        
+        return cls(version, schema, extractor, model, scaler, compiled, model_path, calibrator, rules, on_disk)
+    
+    def _confirm_probability(self, feature_matrix: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Raw P(confirmed) per row, or None for a model with a single class
+        Scales and scores all rows in a single transform/predict_proba call
+        
+        The compiled ensemble has less per-call overhead than the native
+        model but more per-row cost, so with both loaded it only takes
+        batches of up to COMPILED_MAX_ROWS rows.
+        """
+        if feature_matrix.shape[1] != self.schema.n_features:
+            raise SchemaMismatchError(
+                f"Feature matrix has {feature_matrix.shape[1]} columns, schema expects {self.schema.n_features}"
+            )
+        
+        if self.compiled is not None and (self.model is None or len(feature_matrix) <= COMPILED_MAX_ROWS):
+            # The compiled ensemble emulates the scaler itself
+            with SCALE_STAGE.time():
+                scaled = self.compiled.transform(feature_matrix)
+            with PREDICT_STAGE.time():
+                predictions = self.compiled.proba_from_margin(self.compiled.margin(scaled))
+        else:
+            # Scale features
+            if self.scaler is not None:
+                with SCALE_STAGE.time():
+                    feature_matrix = self.scaler.transform(feature_matrix)
+            
+            # Predict
+            with PREDICT_STAGE.time():
+                predictions = self.model.predict_proba(feature_matrix)
+        
+        if predictions.shape[1] < 2:
+            return None
+        return predictions[:, 1]
+    
+    def predict_batch(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """
+        Predict risk scores for a 2-D feature matrix (one row per order)
+        """
+        confirmed = self._confirm_probability(feature_matrix)
+        if confirmed is None:
+            return np.full(len(feature_matrix), 50.0)
+        
+        # Risk score is the probability of being unconfirmed
+        return (1 - confirmed) * 100
+    
+    def score_batch(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """
+        Risk score and confidence per row, as an (n, 2) array
+        
+        Confidence is the calibrated probability that the more likely
+        outcome happens, max(p, 1 - p) for calibrated P(confirmed) p. It
+        comes from the same model call as the risk score plus one table
+        lookup; models saved without a calibrator use the raw probability.
+        """
+        scores = np.empty((len(feature_matrix), 2), dtype=np.float64)
+        confirmed = self._confirm_probability(feature_matrix)
+        if confirmed is None:
+            scores[:, 0] = 50.0
+            scores[:, 1] = 0.5
+            return scores
+        
+        scores[:, 0] = (1 - confirmed) * 100
+        if self.calibrator is not None:
+            confirmed = self.calibrator.apply(confirmed)
+        np.maximum(confirmed, 1 - confirmed, out=scores[:, 1])
+        return scores
+    
+    def warm_up(self) -> float:
+        """
+        Run synthetic orders through extraction and scoring, in both the
+        single-row and batch paths, so the first real request doesn't pay
+        for lazy initialization
+        Returns the warm-up time in seconds
+        """
+        started = time.perf_counter()
+        for order in WARM_UP_ORDERS[:4]:
+            row = self.extractor.extract_into(order, self.schema.new_row())
+            self.score_batch(row[np.newaxis, :])
+        scores = self.score_batch(self.extractor.extract_columns(WARM_UP_ORDERS))
+        if not np.all(np.isfinite(scores)):
+            raise ValueError(f"Model {self.version} produced non-finite scores during warm-up")
+        return time.perf_counter() - started
+    
+    @property
+    def engine(self) -> str:
+        if isinstance(self.compiled, QuantizedTreeEnsemble):
+            return "quantized"
+        if self.compiled is not None:
+            return "auto" if self.model is not None else "compiled"
+        return "native"
+    
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "modelPath": self.model_path,
+            "engine": self.engine,
+            "featureSchema": self.schema.version,
+            "calibrated": self.calibrator is not None,
+            "rules": [rule.name for rule in self.rules.rules] if self.rules is not None else [],
+            "loadedAt": self.loaded_at,
+        }
+
+# Bundles still referenced by in-flight requests, by version, across all loaders
+_bundles_in_use = weakref.WeakValueDictionary()
 
 class ModelLoader:
     """
     Load and manage ML models
+    
+    Holds the live ModelBundle and replaces it atomically on reload: the new
+    bundle is loaded and warmed up off to the side, then swapped in with a
+    single assignment. Requests that already hold the previous bundle finish
+    on it; it is freed once the last of them drops its reference.
     """
     
-    def __init__(self):
-        self.model = None
-        self.scaler = None
-        self.model_path = MODEL_PATH
-        self.scaler_path = SCALER_PATH
+    def __init__(self, model_path: str = MODEL_PATH, engine: str = MODEL_ENGINE):
+        self.model_path = model_path
+        self.engine = engine
+        self.bundle: Optional[ModelBundle] = None
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._swap_callbacks: List[Callable[[ModelBundle], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
     
-    def load_model(self) -> Any:
+    def current(self) -> ModelBundle:
         """
-        Load the risk scoring model
+        The live model bundle, loaded on first use
         """
-        if self.model is None:
-            try:
-                if os.path.exists(self.model_path):
-                    self.model = joblib.load(self.model_path)
-                    print(f"Model loaded from {self.model_path}")
-                else:
-                    # Return a dummy model if no model file exists
-                    from sklearn.ensemble import RandomForestRegressor
-                    self.model = RandomForestRegressor()
-                    print(f"Warning: Model file not found at {self.model_path}, using dummy model")
-            except Exception as e:
-                print(f"Error loading model: {e}")
-                # Return a dummy model on error
-                from sklearn.ensemble import RandomForestRegressor
-                self.model = RandomForestRegressor()
-        
-        return self.model
+        bundle = self.bundle
+        if bundle is None:
+            with self._lock:
+                if self.bundle is None:
+                    self._swap(ModelBundle.load(self.model_path, self.engine))
+                bundle = self.bundle
+        return bundle
     
-    def load_scaler(self) -> Any:
+    def get(self, version: Optional[str] = None) -> ModelBundle:
         """
-        Load the feature scaler
+        The bundle for a version if it is still in use, otherwise the live one
         """
-        if self.scaler is None:
+        if version is not None:
+            bundle = _bundles_in_use.get(version)
+            if bundle is not None:
+                return bundle
+        return self.current()
+    
+    def _swap(self, bundle: ModelBundle):
+        _bundles_in_use[bundle.version] = bundle
+        self.bundle = bundle
+        for callback in self._swap_callbacks:
             try:
-                if os.path.exists(self.scaler_path):
-                    self.scaler = joblib.load(self.scaler_path)
-                    print(f"Scaler loaded from {self.scaler_path}")
-                else:
-                    from sklearn.preprocessing import StandardScaler
-                    self.scaler = StandardScaler()
-                    print(f"Warning: Scaler file not found at {self.scaler_path}, using default scaler")
+                callback(bundle)
             except Exception as e:
-                print(f"Error loading scaler: {e}")
-                from sklearn.preprocessing import StandardScaler
-                self.scaler = StandardScaler()
-        
-        return self.scaler
+                print(f"Error in model swap callback: {e}")
+    
+    def on_swap(self, callback: Callable[[ModelBundle], None]):
+        """
+        Call callback with the new bundle after every reload
+        """
+        self._swap_callbacks.append(callback)
+    
+    def load_model(self) -> Any:
+        return self.current().model
+    
+    def load_scaler(self) -> Any:
+        return self.current().scaler
+    
+    def load_schema(self) -> FeatureSchema:
+        return self.current().schema
+    
+    def load_extractor(self) -> FeatureExtractor:
+        return self.current().extractor
+    
+    def load_compiled(self) -> Optional[CompiledTreeEnsemble]:
+        return self.current().compiled
+    
+    def load_version(self) -> str:
+        return self.current().version
     
     def predict(self, features: dict) -> float:
         """
         Predict risk score for given features
         """
-        model = self.load_model()
-        scaler = self.load_scaler()
+        bundle = self.current()
+        # Lay features out in schema order rather than dict order
+        feature_row = bundle.schema.vector_from_dict(features)
         
-        # Convert features to array
-        feature_array = np.array([list(features.values())])
-        
-        # Scale features
-        if hasattr(scaler, 'transform'):
-            feature_array = scaler.transform(feature_array)
-        
-        # Predict
-        prediction = model.predict_proba(feature_array)[0]
-        
-        # Return risk score (probability of being unconfirmed)
-        risk_score = (1 - prediction[1]) * 100 if len(prediction) > 1 else 50.0
+        return float(bundle.predict_batch(feature_row[np.newaxis, :])[0])
+    
+    def predict_batch(self, feature_matrix: np.ndarray, version: Optional[str] = None) -> np.ndarray:
+        """
+        Predict risk scores with the given (or live) model version
+        """
+        return self.get(version).predict_batch(feature_matrix)
+    
+    def score_batch(self, feature_matrix: np.ndarray, version: Optional[str] = None) -> np.ndarray:
+        """
+        Risk scores and confidences with the given (or live) model version
+        """
+        return self.get(version).score_batch(feature_matrix)
+    
+    def reload_model(self) -> ModelBundle:
+        """
+        Load the model from disk, warm it up and swap it in
+        The live bundle keeps serving if the new one fails to load or warm up
+        """
+        with self._lock:
+            try:
+                if self.bundle is not None and artifact_version(self.model_path) == self.bundle.artifact_version:
+                    return self.bundle
+                bundle = ModelBundle.load(self.model_path, self.engine)
+                warm_up_seconds = bundle.warm_up()
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = str(e)
+                print(f"Error reloading model, keeping {self.bundle.version if self.bundle else 'no model'}: {e}")
+                raise
+            
+            previous = self.bundle.version if self.bundle is not None else None
+            self._swap(bundle)
+            self.reloads += 1
+            self.last_error = None
+            print(f"Model {bundle.version} swapped in (was {previous}, warm-up {warm_up_seconds * 1000:.1f}ms)")
+            return bundle
+    
+    def reload_in_background(self) -> threading.Thread:
+        """
+        Run reload_model() on a background thread; failures are logged and counted
+        """
+        def reload():
+            try:
+                self.reload_model()
+            except Exception:
+                pass
         
-        return float(risk_score)
+        thread = threading.Thread(target=reload, name="model-reload", daemon=True)
+        thread.start()
+        return thread
     
-    def reload_model(self):
+    def start_watching(self, interval: float):
         """
-        Reload the model from disk
+        Poll the model artifacts every interval seconds and reload when they change
+        
+        A change is only picked up once the files have been stable for a
+        whole interval, so a reload never reads a half-written set of artifacts.
         """
-        self.model = None
-        self.scaler = None
-        return self.load_model()
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+    
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
+    
+    def _watch(self, interval: float):
+        loaded = _artifact_signature(self.model_path)
+        pending = None
+        while not self._stop_watching.wait(interval):
+            signature = _artifact_signature(self.model_path)
+            if signature == loaded:
+                pending = None
+            elif signature != pending:
+                # Changed since the last poll; wait for writes to settle
+                pending = signature
+            else:
+                loaded = signature
+                pending = None
+                try:
+                    self.reload_model()
+                except Exception:
+                    pass
+    
+    def stats(self) -> Dict[str, Any]:
+        bundle = self.bundle
+        return {
+            "live": bundle.describe() if bundle is not None else None,
+            "inUse": sorted(
+                version for version, in_use in list(_bundles_in_use.items())
+                if in_use.model_path == self.model_path
+            ),
+            "reloads": self.reloads,
+            "failedReloads": self.failed_reloads,
+            "lastError": self.last_error,
+            "watching": self._watcher is not None,
+        }
 
 model_loader = ModelLoader()
+
+# Candidate model for shadow and canary scoring, if one is configured
+# The candidate may be the primary's own quantized variant: same path, CANDIDATE_MODEL_ENGINE=quantized
+candidate_loader = (
+    ModelLoader(config.CANDIDATE_MODEL_PATH, config.CANDIDATE_MODEL_ENGINE or MODEL_ENGINE)
+    if config.CANDIDATE_MODEL_PATH else None
+)
+
+def _bundle_for(version: Optional[str]) -> ModelBundle:
+    """
+    The requested version if it is still loaded; process pool workers hold
+    their own loaders and otherwise fall back to the live candidate (when it
+    matches) or primary model
+    """
+    bundle = _bundles_in_use.get(version) if version is not None else None
+    if bundle is None:
+        if candidate_loader is not None and version is not None and candidate_loader.current().version == version:
+            bundle = candidate_loader.current()
+        else:
+            bundle = model_loader.current()
+    return bundle
+
+def predict_batch(feature_matrix: np.ndarray, version: Optional[str] = None) -> np.ndarray:
+    """
+    Module-level entry point for predict_batch, picklable for process pools
+    """
+    return _bundle_for(version).predict_batch(feature_matrix)
+
+def score_batch(feature_matrix: np.ndarray, version: Optional[str] = None) -> np.ndarray:
+    """
+    Module-level entry point for score_batch, picklable for process pools
+    """
+    return _bundle_for(version).score_batch(feature_matrix)
+
+def warm_up_worker():
+    """
+    Process pool initializer: load and warm up the model before the first job
+    """
+    try:
+        model_loader.current().warm_up()
+    except Exception as e:
+        print(f"Error warming up model in worker: {e}")
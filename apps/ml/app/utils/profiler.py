@@ -0,0 +1,126 @@
+"""
+Opt-in sampling profiler for slow requests
+"""
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, Optional
+from app.config import config
+
+def _fold(frame, max_depth: int = 64) -> str:
+    """
+    Collapse a stack into one 'outer;...;inner' line, as flame graph tools expect
+    """
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class SlowRequestProfiler:
+    """
+    Sample every thread's stack while requests are in flight and keep the
+    samples that fall inside requests slower than threshold_ms
+    
+    Sampling runs on a daemon thread and only while at least one request is
+    active, so an idle worker pays nothing and a busy one pays one stack walk
+    per interval_ms, independent of request rate. Requests under the
+    threshold cost a counter update on entry and exit. Disabled when
+    threshold_ms is 0.
+    """
+    
+    def __init__(self, threshold_ms: float = 0.0, interval_ms: float = 5.0, keep: int = 20, buffer_seconds: float = 30.0):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.profiles = deque(maxlen=keep)
+        # (monotonic time, thread name, folded stack), oldest first
+        self._samples = deque(maxlen=max(int(buffer_seconds / max(self.interval, 0.0001)) * 4, 1000))
+        self._active = 0
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.slow_requests = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+    
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout=1.0)
+        self._thread = None
+    
+    def enter(self):
+        """
+        Mark a request as started
+        """
+        self._active += 1
+        self._wake.set()
+    
+    def exit(self, label: str, started: float, ended: float):
+        """
+        Mark a request as finished; profile it if it took longer than the threshold
+        started and ended are time.monotonic() values
+        """
+        self._active -= 1
+        if self._active <= 0:
+            self._active = 0
+            self._wake.clear()
+        if ended - started >= self.threshold:
+            self.slow_requests += 1
+            self._record(label, started, ended)
+    
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.is_set():
+            self._wake.wait()
+            if self._stopped.is_set():
+                break
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            now = time.monotonic()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self._samples.append((now, names.get(thread_id, str(thread_id)), _fold(frame)))
+            time.sleep(self.interval)
+    
+    def _record(self, label: str, started: float, ended: float):
+        stacks = Counter(
+            f"{thread_name};{stack}"
+            for sampled_at, thread_name, stack in list(self._samples)
+            if started <= sampled_at <= ended and stack
+        )
+        self.profiles.append({
+            "request": label,
+            "durationMs": (ended - started) * 1000.0,
+            "finishedAt": time.time(),
+            "samples": sum(stacks.values()),
+            # Folded stacks with sample counts, heaviest first
+            "stacks": [f"{stack} {count}" for stack, count in stacks.most_common(50)],
+        })
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "thresholdMs": self.threshold * 1000.0,
+            "intervalMs": self.interval * 1000.0,
+            "slowRequests": self.slow_requests,
+            "profiles": list(self.profiles),
+        }
+
+slow_request_profiler = SlowRequestProfiler(
+    threshold_ms=config.SLOW_REQUEST_MS,
+    interval_ms=config.PROFILER_INTERVAL_MS,
+    keep=config.PROFILE_KEEP,
+)
@@ -0,0 +1,84 @@
+"""
+Shared, pooled Redis connections
+"""
+import redis
+import redis.asyncio as aioredis
+from typing import Any, Dict, Optional
+from app.config import config
+
+class RedisPool:
+    """
+    Lazily created sync and asyncio Redis clients backed by bounded connection pools
+    
+    Every Redis user in the service goes through this so the process holds
+    one pool per client kind instead of one connection set per helper class.
+    """
+    
+    def __init__(
+        self,
+        url: str = "",
+        max_connections: int = 50,
+        socket_timeout: float = 1.0,
+        connect_timeout: float = 1.0
+    ):
+        self.url = url
+        self.max_connections = max_connections
+        self.socket_timeout = socket_timeout
+        self.connect_timeout = connect_timeout
+        self._async_client: Optional[aioredis.Redis] = None
+        self._sync_client: Optional[redis.Redis] = None
+    
+    def _pool_options(self) -> Dict[str, Any]:
+        return {
+            "max_connections": self.max_connections,
+            "socket_timeout": self.socket_timeout,
+            "socket_connect_timeout": self.connect_timeout,
+        }
+    
+    def async_client(self) -> Optional[aioredis.Redis]:
+        """
+        asyncio client for request handlers; None when Redis isn't configured
+        """
+        if self._async_client is None and self.url:
+            try:
+                pool = aioredis.BlockingConnectionPool.from_url(
+                    self.url, timeout=self.connect_timeout, **self._pool_options()
+                )
+                self._async_client = aioredis.Redis(connection_pool=pool)
+            except Exception as e:
+                print(f"Error connecting to Redis: {e}")
+        
+        return self._async_client
+    
+    def sync_client(self) -> Optional[redis.Redis]:
+        """
+        Blocking client for scripts and training jobs; None when Redis isn't configured
+        """
+        if self._sync_client is None and self.url:
+            try:
+                pool = redis.BlockingConnectionPool.from_url(
+                    self.url, timeout=self.connect_timeout, **self._pool_options()
+                )
+                self._sync_client = redis.Redis(connection_pool=pool)
+            except Exception as e:
+                print(f"Error connecting to Redis: {e}")
+        
+        return self._sync_client
+    
+    async def close(self):
+        """
+        Close both pools
+        """
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+redis_pool = RedisPool(
+    url=config.REDIS_URL,
+    max_connections=config.REDIS_MAX_CONNECTIONS,
+    socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+    connect_timeout=config.REDIS_CONNECT_TIMEOUT
+)
@@ -0,0 +1,180 @@
+"""
+Rule tier that scores trivially classified orders without the model
+"""
+import json
+from typing import Any, Dict, List, Optional
+import numpy as np
+from app.features.registry import registry, OrderColumns
+# Importing the extractor registers every feature the rules can refer to
+from app.features import extractor  # noqa: F401
+
+# Candidate cohorts, each an AND of exact feature values computed from raw
+# order fields. Training keeps a candidate only if the model scores its
+# orders consistently (see app.training.rules); the first match wins.
+# Payment mode and contact completeness drive most of the score, so orders
+# with every contact detail filled in are the cohorts the model agrees on;
+# partial-contact cohorts are too rare or too spread out to ever qualify.
+RULE_CANDIDATES = [
+    ('prepaid_full_contact', {'is_prepaid': 1.0, 'has_email': 1.0, 'has_phone': 1.0, 'has_address': 1.0}),
+    ('cod_full_contact', {'is_cod': 1.0, 'has_email': 1.0, 'has_phone': 1.0, 'has_address': 1.0}),
+]
+
+class Rule:
+    """
+    A cohort of orders and the score the model gives that cohort
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        conditions: Dict[str, float],
+        risk_score: float,
+        confidence: float,
+        stats: Optional[Dict[str, Any]] = None
+    ):
+        unknown = [feature for feature in conditions if feature not in registry.features]
+        if unknown:
+            raise ValueError(f"Rule '{name}' uses unknown features: {unknown}")
+        self.name = name
+        self.conditions = dict(conditions)
+        self.risk_score = float(risk_score)
+        self.confidence = float(confidence)
+        self.stats = dict(stats or {})
+        self._row_fns = [(registry.features[feature].row, value) for feature, value in self.conditions.items()]
+    
+    def matches(self, order: Dict[str, Any]) -> bool:
+        for row_fn, value in self._row_fns:
+            if float(row_fn(order)) != value:
+                return False
+        return True
+    
+    def mask(self, cols: OrderColumns) -> np.ndarray:
+        matched = np.ones(cols.n, dtype=bool)
+        for feature, value in self.conditions.items():
+            matched &= np.asarray(registry.features[feature].column(cols), dtype=np.float32) == value
+        return matched
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'conditions': self.conditions,
+            'riskScore': self.risk_score,
+            'confidence': self.confidence,
+            'stats': self.stats,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Rule':
+        return cls(data['name'], data['conditions'], data['riskScore'], data['confidence'], data.get('stats'))
+
+class RuleSet:
+    """
+    Ordered rules checked on the raw order before feature extraction
+    
+    A matching order is answered with the rule's score and confidence and
+    skips extraction, caching and inference. Rules only use cheap features
+    of raw fields, evaluated with the same functions the extractor uses, so
+    the cohorts match the ones checked at training time. Hit counts and the
+    agreement of audited hits with the model are kept for reporting.
+    """
+    
+    def __init__(self, rules: List[Rule], tolerance: float, meta: Optional[Dict[str, Any]] = None):
+        self.rules = list(rules)
+        self.tolerance = float(tolerance)
+        self.meta = dict(meta or {})
+        self.checked = 0
+        self.hits = {rule.name: 0 for rule in self.rules}
+        self.audited = {rule.name: 0 for rule in self.rules}
+        self.agreed = {rule.name: 0 for rule in self.rules}
+    
+    def __len__(self) -> int:
+        return len(self.rules)
+    
+    def match(self, order: Dict[str, Any]) -> Optional[Rule]:
+        """
+        The first rule matching an order, if any
+        """
+        self.checked += 1
+        for rule in self.rules:
+            if rule.matches(order):
+                self.hits[rule.name] += 1
+                return rule
+        return None
+    
+    def match_many(self, orders: List[Dict[str, Any]]) -> List[Optional[Rule]]:
+        """
+        The first matching rule for each order, evaluated column-wise
+        """
+        matched: List[Optional[Rule]] = [None] * len(orders)
+        self.checked += len(orders)
+        if not orders or not self.rules:
+            return matched
+        
+        cols = OrderColumns(orders)
+        unmatched = np.ones(len(orders), dtype=bool)
+        for rule in self.rules:
+            hits = rule.mask(cols) & unmatched
+            unmatched &= ~hits
+            positions = np.flatnonzero(hits)
+            self.hits[rule.name] += len(positions)
+            for position in positions.tolist():
+                matched[position] = rule
+        return matched
+    
+    def record_audit(self, rule: Rule, model_score: float) -> bool:
+        """
+        Record whether the model, scoring a rule hit anyway, agreed with the rule
+        """
+        agreed = abs(model_score - rule.risk_score) <= self.tolerance
+        self.audited[rule.name] += 1
+        self.agreed[rule.name] += int(agreed)
+        return agreed
+    
+    def stats(self) -> Dict[str, Any]:
+        total_hits = sum(self.hits.values())
+        total_audited = sum(self.audited.values())
+        return {
+            "rules": [
+                {
+                    **rule.to_dict(),
+                    "hits": self.hits[rule.name],
+                    "audited": self.audited[rule.name],
+                    "agreementRate": (
+                        self.agreed[rule.name] / self.audited[rule.name] if self.audited[rule.name] else None
+                    ),
+                }
+                for rule in self.rules
+            ],
+            "tolerance": self.tolerance,
+            "checked": self.checked,
+            "hits": total_hits,
+            "hitRate": total_hits / self.checked if self.checked else 0.0,
+            "audited": total_audited,
+            "agreementRate": sum(self.agreed.values()) / total_audited if total_audited else None,
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'tolerance': self.tolerance,
+            'rules': [rule.to_dict() for rule in self.rules],
+            'meta': self.meta,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RuleSet':
+        return cls([Rule.from_dict(rule) for rule in data['rules']], data['tolerance'], data.get('meta'))
+    
+    def save(self, path: str):
+        """
+        Write the rules as JSON
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+    
+    @classmethod
+    def load(cls, path: str) -> 'RuleSet':
+        """
+        Read rules written by save()
+        """
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,191 @@
+"""
+Shadow and canary scoring of a candidate model
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import numpy as np
+from app.config import config
+from app.utils.model_loader import ModelBundle, ModelLoader, candidate_loader
+
+def _percentile(values, q: float) -> Optional[float]:
+    return float(np.percentile(np.fromiter(values, dtype=np.float64), q)) if values else None
+
+class ShadowStats:
+    """
+    Running comparison of candidate scores against the scores actually served
+    
+    Keeps totals since startup plus the most recent window of absolute
+    differences and latencies for percentiles.
+    """
+    
+    def __init__(self, window: int = 2048, flip_threshold: float = 50.0):
+        self.flip_threshold = flip_threshold
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.sum_diff = 0.0
+        self.sum_abs_diff = 0.0
+        self.max_abs_diff = 0.0
+        self.flips = 0
+        self.abs_diffs = deque(maxlen=window)
+        self.latencies_ms = deque(maxlen=window)
+    
+    def record(self, primary: np.ndarray, shadow: np.ndarray, latency: float):
+        diff = shadow - primary
+        abs_diff = np.abs(diff)
+        self.batches += 1
+        self.rows += len(diff)
+        self.sum_diff += float(diff.sum())
+        self.sum_abs_diff += float(abs_diff.sum())
+        self.max_abs_diff = max(self.max_abs_diff, float(abs_diff.max(initial=0.0)))
+        self.flips += int(((primary >= self.flip_threshold) != (shadow >= self.flip_threshold)).sum())
+        self.abs_diffs.extend(abs_diff.tolist())
+        self.latencies_ms.append(latency * 1000.0)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        rows = max(self.rows, 1)
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "errors": self.errors,
+            "meanDiff": self.sum_diff / rows,
+            "meanAbsDiff": self.sum_abs_diff / rows,
+            "p95AbsDiff": _percentile(self.abs_diffs, 95),
+            "maxAbsDiff": self.max_abs_diff,
+            "flipRate": self.flips / rows,
+            "latencyMs": {
+                "p50": _percentile(self.latencies_ms, 50),
+                "p95": _percentile(self.latencies_ms, 95),
+                "max": max(self.latencies_ms) if self.latencies_ms else None,
+            },
+        }
+
+class ShadowScorer:
+    """
+    Score a sample of requests with a candidate model, off the response path
+    
+    submit() only samples and hands the orders to a dedicated worker thread,
+    so the primary response never waits on the candidate. Once max_pending
+    jobs are queued, further samples are dropped rather than queued, which
+    bounds the memory and CPU the shadow can take. The candidate extracts
+    its own features, so it may use a different feature schema, and answers
+    orders matching its own rule tier with the rule's score, so both sides
+    are compared as they would be served.
+    
+    With canary_percent > 0, route_canary() sends that share of requests
+    to the candidate for real; those requests aren't shadowed.
+    """
+    
+    def __init__(
+        self,
+        loader: Optional[ModelLoader],
+        sample_rate: float = 0.1,
+        canary_percent: float = 0.0,
+        max_pending: int = 32
+    ):
+        self.loader = loader
+        self.sample_rate = sample_rate
+        self.canary_percent = canary_percent
+        self.max_pending = max_pending
+        self.comparison = ShadowStats()
+        self.pending = 0
+        self.dropped = 0
+        self.canary_requests = 0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+    
+    @property
+    def enabled(self) -> bool:
+        return self.loader is not None
+    
+    def route_canary(self) -> Optional[ModelBundle]:
+        """
+        The candidate bundle if this request is part of the canary share
+        Until the candidate has finished loading, all traffic stays on the primary
+        """
+        if not self.enabled or self.canary_percent <= 0 or random.random() * 100 >= self.canary_percent:
+            return None
+        bundle = self.loader.bundle
+        if bundle is not None:
+            self.canary_requests += 1
+        return bundle
+    
+    def submit(self, orders: List[Dict[str, Any]], primary_scores: np.ndarray):
+        """
+        Maybe shadow-score orders whose primary scores were just served
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self.pending += 1
+        
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        future = self._pool.submit(self._score, orders, np.asarray(primary_scores, dtype=np.float64))
+        future.add_done_callback(self._done)
+    
+    def _score(self, orders: List[Dict[str, Any]], primary_scores: np.ndarray):
+        bundle = self.loader.current()
+        started = time.perf_counter()
+        shadow_scores = np.empty(len(orders), dtype=np.float64)
+        remaining = list(range(len(orders)))
+        if bundle.rules is not None:
+            rules = bundle.rules.match_many(orders)
+            remaining = []
+            for position, rule in enumerate(rules):
+                if rule is None:
+                    remaining.append(position)
+                else:
+                    shadow_scores[position] = rule.risk_score
+        if remaining:
+            feature_matrix = bundle.extractor.extract_columns([orders[position] for position in remaining])
+            shadow_scores[remaining] = bundle.predict_batch(feature_matrix)
+        latency = time.perf_counter() - started
+        with self._lock:
+            self.comparison.record(primary_scores, shadow_scores, latency)
+    
+    def _done(self, future: Future):
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            self.pending -= 1
+            if error is not None:
+                self.comparison.errors += 1
+                self.last_error = str(error)
+        if error is not None:
+            print(f"Error in shadow scoring: {error}")
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            comparison = self.comparison.snapshot()
+        return {
+            "enabled": self.enabled,
+            "candidate": self.loader.bundle.describe() if self.enabled and self.loader.bundle is not None else None,
+            "sampleRate": self.sample_rate,
+            "canaryPercent": self.canary_percent,
+            "canaryRequests": self.canary_requests,
+            "pending": self.pending,
+            "maxPending": self.max_pending,
+            "dropped": self.dropped,
+            "lastError": self.last_error,
+            **comparison,
+        }
+    
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+shadow_scorer = ShadowScorer(
+    candidate_loader,
+    sample_rate=config.SHADOW_SAMPLE_RATE,
+    canary_percent=config.CANARY_PERCENT,
+    max_pending=config.SHADOW_MAX_PENDING,
+)
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the scoring path
+
+Run with `python -m benchmarks.run` from apps/ml; see benchmarks/run.py.
+"""
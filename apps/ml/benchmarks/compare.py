@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files, e.g. from before and after a change
+
+    python -m benchmarks.compare baseline.json candidate.json --fail-above 10
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+# Metric compared per group, and whether a larger value is better
+KEY_METRICS = {
+    'load': (('p50_ms', False), ('p99_ms', False), ('rps', True)),
+}
+DEFAULT_METRICS = (('median_us', False),)
+
+def _load(path: str) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    with open(path) as f:
+        document = json.load(f)
+    return {(bench['group'], bench['name']): bench['stats'] for bench in document['benchmarks']}
+
+def _change(before: Optional[float], after: Optional[float], higher_is_better: bool) -> Optional[float]:
+    """
+    Percent change where positive always means slower/worse
+    """
+    if not before or after is None:
+        return None
+    change = (after - before) / before * 100.0
+    return -change if higher_is_better else change
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline', help='Results from the reference commit')
+    parser.add_argument('candidate', help='Results from the commit under test')
+    parser.add_argument(
+        '--fail-above',
+        type=float,
+        default=None,
+        help='Exit non-zero if any metric regresses by more than this many percent'
+    )
+    
+    args = parser.parse_args()
+    
+    baseline = _load(args.baseline)
+    candidate = _load(args.candidate)
+    worst = 0.0
+    
+    print(f"{'benchmark':52s} {'metric':10s} {'baseline':>12s} {'candidate':>12s} {'change':>9s}")
+    for key in sorted(set(baseline) | set(candidate)):
+        group, name = key
+        if key not in baseline or key not in candidate:
+            print(f"{group + '/' + name:52s} only in {'candidate' if key in candidate else 'baseline'}")
+            continue
+        for metric, higher_is_better in KEY_METRICS.get(group, DEFAULT_METRICS):
+            before = baseline[key].get(metric)
+            after = candidate[key].get(metric)
+            change = _change(before, after, higher_is_better)
+            if change is not None:
+                worst = max(worst, change)
+            change_text = f"{change:+8.1f}%" if change is not None else f"{'n/a':>9s}"
+            print(
+                f"{group + '/' + name:52s} {metric:10s} "
+                f"{before if before is not None else float('nan'):12.2f} "
+                f"{after if after is not None else float('nan'):12.2f} {change_text}"
+            )
+    
+    print(f"Worst regression: {worst:+.1f}% (positive is slower)")
+    if args.fail_above is not None and worst > args.fail_above:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Reproducible model and aggregate index for benchmarking
+
+Built with the real training pipeline from synthetic labeled orders, so the
+benchmarked model has production-like feature usage and tree shapes without
+needing MongoDB or a trained model on disk.
+"""
+import json
+import os
+import numpy as np
+from benchmarks.orders import OrderGenerator
+
+FIXTURE_FILE = 'fixture.json'
+# Bump when the saved artifacts change so stale fixtures are rebuilt
+FIXTURE_FORMAT = 8
+
+def build_fixture(directory: str, orders: int = 20000, seed: int = 0) -> str:
+    """
+    Train and save the fixture model under directory, reusing an existing
+    build with the same parameters; returns the model path
+    
+    AGGREGATE_DIR must already point at directory/aggregates when the app
+    modules are first imported, so serving reads the index built here.
+    """
+    from app.features.aggregates import aggregate_index
+    
+    model_path = os.path.join(directory, 'risk_model.pkl')
+    fixture_file = os.path.join(directory, FIXTURE_FILE)
+    params = {"orders": orders, "seed": seed, "format": FIXTURE_FORMAT}
+    
+    if os.path.exists(fixture_file) and os.path.exists(model_path):
+        with open(fixture_file) as f:
+            if json.load(f) == params:
+                aggregate_index.refresh()
+                return model_path
+    
+    from app.training.aggregates import AggregateBuilder, apply_point_in_time, order_key_hashes, order_timestamps
+    from app.training.pipeline import TrainingPipeline
+    
+    print(f"Building benchmark fixture in {directory} ({orders} orders, seed {seed})")
+    history = OrderGenerator(seed).labeled_orders(orders)
+    
+    pipeline = TrainingPipeline()
+    prior_weight = pipeline.config.AGGREGATE_PRIOR_WEIGHT
+    AggregateBuilder(os.path.join(directory, 'aggregates'), prior_weight=prior_weight).build(history)
+    aggregate_index.refresh()
+    
+    X = pipeline.extractor.extract_columns(history)
+    y = np.fromiter((order['status'] == 'confirmed' for order in history), dtype=np.int64, count=len(history))
+    # Train on history features as of each order, like the pipeline does
+    apply_point_in_time(
+        X, pipeline.extractor.schema, order_key_hashes(history), order_timestamps(history), y, prior_weight,
+        aggregate_index.prior
+    )
+    X_train, X_val, X_test, y_train, y_val, y_test = pipeline.preprocess(X, y)
+    model, _ = pipeline.train_xgboost(X_train, y_train, X_val, y_val, X_test, y_test)
+    pipeline.calibrate(model, X_val, y_val)
+    pipeline.derive_rules(model, X_val, y_val)
+    pipeline.quantize(model, X_val, y_val, X_test, y_test)
+    pipeline.save_model(model, model_path)
+    
+    with open(fixture_file, 'w') as f:
+        json.dump(params, f)
+    return model_path
@@ -0,0 +1,165 @@
+"""
+Timing loops and result files shared by the microbenchmarks and load tests
+"""
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+RESULTS_FORMAT = 1
+
+def _calibrate(run_once: Callable[[int], float], min_time: float) -> int:
+    """
+    Smallest power-of-ten loop count whose round takes at least min_time / 10
+    """
+    number = 1
+    while True:
+        if run_once(number) >= min_time / 10 or number >= 10 ** 7:
+            return number
+        number *= 10
+
+def _summarize(round_times: List[float], number: int, rows: int) -> Dict[str, Any]:
+    per_call = [elapsed / number for elapsed in round_times]
+    median = statistics.median(per_call)
+    return {
+        "rounds": len(per_call),
+        "number": number,
+        "min_us": min(per_call) * 1e6,
+        "median_us": median * 1e6,
+        "mean_us": statistics.fmean(per_call) * 1e6,
+        "stdev_us": statistics.stdev(per_call) * 1e6 if len(per_call) > 1 else 0.0,
+        "ops_per_sec": 1.0 / median if median > 0 else None,
+        "rows_per_sec": rows / median if median > 0 else None,
+    }
+
+def measure(fn: Callable[[], Any], rows: int = 1, repeat: int = 7, min_time: float = 0.2) -> Dict[str, Any]:
+    """
+    Time fn() like timeit: calibrate a loop count, then take repeat rounds
+    
+    The garbage collector is paused inside each round so a collection
+    triggered by earlier work doesn't land in one round at random. rows is
+    how many items one call processes, for rows_per_sec.
+    """
+    def run_once(number: int) -> float:
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            return time.perf_counter() - started
+        finally:
+            if gc_enabled:
+                gc.enable()
+    
+    number = _calibrate(run_once, min_time)
+    return _summarize([run_once(number) for _ in range(repeat)], number, rows)
+
+def measure_async(
+    loop: asyncio.AbstractEventLoop,
+    fn: Callable[[], Awaitable[Any]],
+    rows: int = 1,
+    repeat: int = 7,
+    min_time: float = 0.2
+) -> Dict[str, Any]:
+    """
+    measure() for a coroutine function, awaited sequentially on loop
+    """
+    async def rounds(number: int) -> float:
+        started = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        return time.perf_counter() - started
+    
+    def run_once(number: int) -> float:
+        return loop.run_until_complete(rounds(number))
+    
+    number = _calibrate(run_once, min_time)
+    return _summarize([run_once(number) for _ in range(repeat)], number, rows)
+
+def percentiles(latencies: List[float]) -> Dict[str, Optional[float]]:
+    """
+    p50/p90/p99/max of latencies given in seconds, in milliseconds
+    """
+    if not latencies:
+        return {"p50_ms": None, "p90_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(latencies)
+    
+    def at(q: float) -> float:
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000.0
+    
+    return {"p50_ms": at(0.50), "p90_ms": at(0.90), "p99_ms": at(0.99), "max_ms": ordered[-1] * 1000.0}
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        )
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip() + ('-dirty' if dirty.stdout.strip() else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> Dict[str, Any]:
+    """
+    What the numbers were measured on, so result files can be compared fairly
+    """
+    import numpy
+    
+    libraries = {"numpy": numpy.__version__}
+    for name in ('sklearn', 'xgboost', 'lightgbm', 'fastapi', 'redis'):
+        module = sys.modules.get(name)
+        if module is not None:
+            libraries[name] = getattr(module, '__version__', None)
+    
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "libraries": libraries,
+    }
+
+class Results:
+    """
+    Collected benchmark results, written as one JSON document
+    """
+    
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = settings
+        self.benchmarks: List[Dict[str, Any]] = []
+    
+    def add(self, group: str, name: str, stats: Dict[str, Any], **params):
+        self.benchmarks.append({"group": group, "name": name, "params": params, "stats": stats})
+        summary = (
+            f"{stats['median_us']:12.1f} us" if 'median_us' in stats
+            else f"p50 {stats['p50_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms  {stats['rps']:8.0f} req/s"
+        )
+        print(f"{group:10s} {name:40s} {summary}")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format": RESULTS_FORMAT,
+            "environment": environment(),
+            "settings": self.settings,
+            "benchmarks": self.benchmarks,
+        }
+    
+    def write(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+        print(f"Results written to {path}")
@@ -0,0 +1,136 @@
+"""
+Microbenchmarks for feature extraction, model prediction and the prediction cache
+"""
+import asyncio
+import itertools
+from typing import Sequence
+from benchmarks.harness import Results, measure, measure_async
+from benchmarks.orders import OrderGenerator
+
+EXTRACT_BATCH_SIZES = (1, 16, 256, 1000)
+PREDICT_BATCH_SIZES = (1, 8, 64, 256, 1024)
+CACHE_BATCH_SIZE = 256
+
+def bench_extraction(results: Results, bundle, generator: OrderGenerator, repeat: int, min_time: float):
+    """
+    Single-order extraction into a reused row, the dict API, and columnar batches
+    """
+    extractor = bundle.extractor
+    orders = generator.orders(1000)
+    row = bundle.schema.new_row()
+    
+    cycle = itertools.cycle(orders)
+    results.add('extract', 'extract_into', measure(
+        lambda: extractor.extract_into(next(cycle), row), repeat=repeat, min_time=min_time
+    ))
+    results.add('extract', 'extract_dict', measure(
+        lambda: extractor.extract(next(cycle)), repeat=repeat, min_time=min_time
+    ))
+    for size in EXTRACT_BATCH_SIZES:
+        batch = orders[:size]
+        results.add('extract', f'extract_columns[{size}]', measure(
+            lambda: extractor.extract_columns(batch), rows=size, repeat=repeat, min_time=min_time
+        ), batch_size=size)
+
+def bench_predict(results: Results, bundles: dict, generator: OrderGenerator, repeat: int, min_time: float):
+    """
+    predict_batch at several batch sizes for each loaded engine
+    """
+    for engine, bundle in bundles.items():
+        matrix = bundle.extractor.extract_columns(generator.orders(max(PREDICT_BATCH_SIZES)))
+        for size in PREDICT_BATCH_SIZES:
+            features = matrix[:size]
+            results.add('predict', f'{engine}[{size}]', measure(
+                lambda: bundle.predict_batch(features), rows=size, repeat=repeat, min_time=min_time
+            ), engine=engine, batch_size=size)
+
+def bench_cache(results: Results, bundle, generator: OrderGenerator, redis_client, repeat: int, min_time: float):
+    """
+    Cache key hashing and the hit/miss paths of each cache tier
+    
+    redis_client is normally a fakeredis client, so the Redis numbers cover
+    client-side serialization and protocol handling but not the network.
+    """
+    from app.utils.cache import Cache, LocalCache, feature_cache_key
+    
+    loop = asyncio.new_event_loop()
+    try:
+        matrix = bundle.extractor.extract_columns(generator.orders(CACHE_BATCH_SIZE))
+        keys = [feature_cache_key("score", row, bundle.schema, bundle.version) for row in matrix]
+        value = {"riskScore": 42.0, "confidence": 0.8}
+        
+        rows = itertools.cycle(matrix)
+        results.add('cache', 'feature_cache_key', measure(
+            lambda: feature_cache_key("score", next(rows), bundle.schema, bundle.version),
+            repeat=repeat, min_time=min_time
+        ))
+        
+        local = Cache(redis_client=None)
+        loop.run_until_complete(local.set_many({key: value for key in keys}))
+        hit_keys = itertools.cycle(keys)
+        results.add('cache', 'local_hit', measure_async(
+            loop, lambda: local.get(next(hit_keys)), repeat=repeat, min_time=min_time
+        ))
+        results.add('cache', 'local_miss', measure_async(
+            loop, lambda: local.get("score:missing"), repeat=repeat, min_time=min_time
+        ))
+        
+        misses = itertools.count()
+        
+        async def compute():
+            return value
+        
+        results.add('cache', 'get_or_compute_miss', measure_async(
+            loop, lambda: local.get_or_compute(f"score:new:{next(misses)}", compute),
+            repeat=repeat, min_time=min_time
+        ))
+        
+        if redis_client is None:
+            print("Skipping Redis cache benchmarks: no Redis client (use --redis fake or a URL)")
+            return
+        
+        # Local tier disabled so every lookup reaches Redis
+        remote = Cache(redis_client=redis_client)
+        remote.local = LocalCache(max_size=0)
+        loop.run_until_complete(remote.set_many({key: value for key in keys}))
+        results.add('cache', 'redis_hit', measure_async(
+            loop, lambda: remote.get(next(hit_keys)), repeat=repeat, min_time=min_time
+        ))
+        results.add('cache', 'redis_miss', measure_async(
+            loop, lambda: remote.get("score:missing"), repeat=repeat, min_time=min_time
+        ))
+        results.add('cache', f'redis_get_many[{CACHE_BATCH_SIZE}]', measure_async(
+            loop, lambda: remote.get_many(keys), rows=len(keys), repeat=repeat, min_time=min_time
+        ), batch_size=len(keys))
+        items = {key: value for key in keys}
+        results.add('cache', f'redis_set_many[{CACHE_BATCH_SIZE}]', measure_async(
+            loop, lambda: remote.set_many(items), rows=len(keys), repeat=repeat, min_time=min_time
+        ), batch_size=len(keys))
+    finally:
+        loop.close()
+
+def run_micro(
+    results: Results,
+    model_path: str,
+    engines: Sequence[str],
+    redis_client,
+    seed: int,
+    repeat: int,
+    min_time: float
+):
+    from app.utils.model_loader import ModelBundle
+    
+    bundles = {}
+    for engine in engines:
+        try:
+            bundles[engine] = ModelBundle.load(model_path, engine)
+        except FileNotFoundError as e:
+            # e.g. a model trained without the quantized variant
+            print(f"Skipping engine {engine}: {e}")
+    bundle = next(iter(bundles.values()))
+    for loaded in bundles.values():
+        loaded.warm_up()
+    
+    bench_extraction(results, bundle, OrderGenerator(seed), repeat, min_time)
+    bench_predict(results, bundles, OrderGenerator(seed), repeat, min_time)
+    bench_cache(results, bundle, OrderGenerator(seed), redis_client, repeat, min_time)
@@ -0,0 +1,101 @@
+"""
+Synthetic orders matching the /score OrderFeatures schema
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+PAYMENT_MODES = ['cod', 'prepaid']
+CURRENCIES = ['INR', 'INR', 'INR', 'INR', 'USD']
+PLATFORMS = ['shopify', 'woocommerce', 'magento', None]
+COUNTRIES = ['IN', 'IN', 'IN', 'IN', 'US', '']
+EMAIL_DOMAINS = ['gmail.com', 'yahoo.co.in', 'outlook.com', 'example.in']
+FIRST_NAMES = ['Aarav', 'Priya', 'Rahul', 'Sneha', 'Vikram', 'Ananya', 'Rohan', 'Kavya']
+STREETS = ['MG Road', 'Park Street', 'Anna Salai', 'Linking Road', 'Brigade Road']
+
+class OrderGenerator:
+    """
+    Deterministic stream of realistic-looking orders
+    
+    Customers and pincodes are drawn from fixed pools so repeat buyers and
+    busy pincodes show up the way they do in production, which is what the
+    aggregate features and the prediction cache key on. The same seed always
+    yields the same orders, so results are comparable across commits.
+    """
+    
+    def __init__(self, seed: int = 0, customers: int = 5000, pincodes: int = 500):
+        self.rng = np.random.default_rng(seed)
+        self.pincodes = [str(560000 + int(offset)) for offset in self.rng.choice(40000, size=pincodes, replace=False)]
+        self.customers = [self._customer(index) for index in range(customers)]
+    
+    def _customer(self, index: int) -> Dict[str, Any]:
+        rng = self.rng
+        name = f"{FIRST_NAMES[index % len(FIRST_NAMES)]} {index}"
+        roll = rng.random()
+        # Mostly complete contact details, with the gaps real checkouts have
+        email = '' if roll < 0.05 else f"user{index}@{EMAIL_DOMAINS[index % len(EMAIL_DOMAINS)]}"
+        phone = '' if roll > 0.97 else f"9{int(rng.integers(100000000, 999999999))}"
+        if rng.random() < 0.1:
+            phone = '+91 ' + phone
+        return {
+            "name": name if rng.random() > 0.03 else '',
+            "address": f"{int(rng.integers(1, 500))} {STREETS[index % len(STREETS)]}" if rng.random() > 0.05 else '',
+            "pincode": self.pincodes[int(rng.integers(len(self.pincodes)))],
+            "country": COUNTRIES[int(rng.integers(len(COUNTRIES)))],
+            "email": email,
+            "phone": phone,
+        }
+    
+    def order(self) -> Dict[str, Any]:
+        """
+        One order as a /score request body
+        """
+        rng = self.rng
+        customer = self.customers[int(rng.integers(len(self.customers)))]
+        order = {
+            "amount": float(np.round(rng.lognormal(7.0, 0.9), 2)),
+            "currency": CURRENCIES[int(rng.integers(len(CURRENCIES)))],
+            "paymentMode": PAYMENT_MODES[int(rng.random() < 0.4)],
+            "customer": {
+                "name": customer["name"],
+                "address": customer["address"],
+                "pincode": customer["pincode"],
+                "country": customer["country"],
+            },
+            "email": customer["email"],
+            "phone": customer["phone"],
+        }
+        platform = PLATFORMS[int(rng.integers(len(PLATFORMS)))]
+        if platform is not None:
+            order["platform"] = platform
+        return order
+    
+    def orders(self, n: int, distinct: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        n orders; with distinct set, n draws from a pool of that many orders,
+        so a share of requests repeat and can be served from cache
+        """
+        if distinct is None:
+            return [self.order() for _ in range(n)]
+        pool = [self.order() for _ in range(distinct)]
+        return [pool[int(index)] for index in self.rng.integers(distinct, size=n)]
+    
+    def labeled_orders(self, n: int) -> List[Dict[str, Any]]:
+        """
+        n orders with a status drawn from a plausible risk model, for
+        building fixture models and aggregate indexes
+        Orders are placed a minute apart, in list order
+        """
+        orders = self.orders(n)
+        start = datetime(2024, 1, 1)
+        for index, order in enumerate(orders):
+            order["createdAt"] = start + timedelta(minutes=index)
+            logit = 1.2
+            logit -= 1.1 if order["paymentMode"] == 'cod' else 0.0
+            logit -= 0.8 if not order["email"] else 0.0
+            logit -= 0.6 if not order["customer"]["address"] else 0.0
+            logit -= 0.3 * max(np.log(order["amount"] / 2000.0), 0.0)
+            logit += 0.5 * (int(order["customer"]["pincode"]) % 7 == 0)
+            confirmed = self.rng.random() < 1.0 / (1.0 + np.exp(-logit))
+            order["status"] = 'confirmed' if confirmed else 'canceled'
+        return orders
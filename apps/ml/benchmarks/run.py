@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Run the scoring-path benchmarks and write the results as JSON
+
+    cd apps/ml
+    python -m benchmarks.run --output bench-results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.compare bench-results/base.json bench-results/head.json
+
+By default a fixture model and aggregate index are trained from synthetic
+orders with a fixed seed, so runs on different commits score the same
+orders with the same model. Install benchmarks/requirements.txt for the
+load generator and the Redis cache benchmarks.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, APP_DIR)
+
+DEFAULT_FIXTURE_DIR = os.path.join(tempfile.gettempdir(), 'confirmly-ml-bench')
+
+def configure_environment(args) -> str:
+    """
+    Point the app's settings at the benchmark fixture; must run before any
+    app module is imported, since settings are read at import time
+    """
+    fixture_dir = os.path.abspath(args.fixture_dir)
+    os.environ['AGGREGATE_DIR'] = os.path.join(fixture_dir, 'aggregates')
+    os.environ['MODEL_PATH'] = os.path.abspath(args.model_path) if args.model_path else os.path.join(fixture_dir, 'risk_model.pkl')
+    os.environ['REDIS_URL'] = args.redis if args.redis not in ('none', 'fake') else ''
+    os.environ['TRACKING_BACKEND'] = 'none'
+    os.environ['MODEL_WATCH_INTERVAL'] = '0'
+    os.environ['CANDIDATE_MODEL_PATH'] = ''
+    os.environ['SLOW_REQUEST_MS'] = '0'
+    os.environ['ML_API_KEY'] = ''
+    return fixture_dir
+
+def fake_redis_client():
+    """
+    In-memory asyncio Redis, or None if fakeredis isn't installed
+    """
+    try:
+        from fakeredis import aioredis as fake_aioredis
+    except ImportError:
+        return None
+    return fake_aioredis.FakeRedis()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark feature extraction, prediction, caching and /score')
+    parser.add_argument('--suite', choices=['micro', 'load', 'all'], default='all', help='Benchmarks to run')
+    parser.add_argument('--output', type=str, default=None, help='Write results to this JSON file')
+    parser.add_argument('--model-path', type=str, default=None, help='Benchmark this model instead of the fixture')
+    parser.add_argument('--fixture-dir', type=str, default=DEFAULT_FIXTURE_DIR, help='Where the fixture model is built')
+    parser.add_argument('--fixture-orders', type=int, default=20000, help='Synthetic orders the fixture is trained on')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for synthetic orders')
+    parser.add_argument(
+        '--engines',
+        type=str,
+        default='auto,compiled,quantized,native',
+        help='Comma-separated model engines to microbenchmark'
+    )
+    parser.add_argument(
+        '--redis',
+        type=str,
+        default='fake',
+        help="Cache backend: 'fake' (fakeredis), 'none' (in-process tier only) or a redis:// URL"
+    )
+    parser.add_argument('--repeat', type=int, default=7, help='Timing rounds per microbenchmark')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds per microbenchmark round set')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent load generator clients')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per load scenario')
+    parser.add_argument('--quick', action='store_true', help='Fewer rounds and requests, for smoke runs')
+    
+    args = parser.parse_args()
+    if args.quick:
+        args.repeat, args.min_time, args.requests = 3, 0.05, 300
+    
+    fixture_dir = configure_environment(args)
+    
+    from benchmarks.fixtures import build_fixture
+    from benchmarks.harness import Results
+    from benchmarks.micro import run_micro
+    from benchmarks.load import run_load
+    from benchmarks.orders import OrderGenerator
+    
+    model_path = os.environ['MODEL_PATH']
+    if not args.model_path:
+        build_fixture(fixture_dir, orders=args.fixture_orders, seed=args.seed)
+    
+    results = Results({
+        "suite": args.suite,
+        "model_path": model_path if args.model_path else 'fixture',
+        "fixture_orders": None if args.model_path else args.fixture_orders,
+        "seed": args.seed,
+        "redis": args.redis if args.redis in ('none', 'fake') else 'url',
+        "repeat": args.repeat,
+        "min_time": args.min_time,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+    })
+    
+    if args.suite in ('micro', 'all'):
+        engines = [engine.strip() for engine in args.engines.split(',') if engine.strip()]
+        # A fake client is bound to the event loop that first uses it, so each suite gets its own
+        redis_client = fake_redis_client() if args.redis == 'fake' else None
+        if args.redis not in ('none', 'fake'):
+            import redis.asyncio as aioredis
+            redis_client = aioredis.from_url(args.redis)
+        run_micro(results, model_path, engines, redis_client, args.seed, args.repeat, args.min_time)
+    
+    if args.suite in ('load', 'all'):
+        if args.redis == 'fake':
+            from app.utils.cache import cache
+            cache.redis_client = fake_redis_client()
+        asyncio.run(run_load(results, OrderGenerator(args.seed + 1), args.concurrency, args.requests))
+    
+    if args.output:
+        results.write(args.output)
+
+if __name__ == "__main__":
+    main()
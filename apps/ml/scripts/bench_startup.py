@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import time, startup (model load + warm-up) and time-to-first-score
+
+Each run is a fresh interpreter, so numbers reflect a cold worker start.
+"""
+import sys
+import os
+import json
+import statistics
+import subprocess
+import argparse
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Runs in the child interpreter; prints one JSON line of timings
+PROBE = r'''
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+import httpx
+
+ORDER = {
+    "amount": 1499.0, "currency": "INR", "paymentMode": "cod", "platform": "shopify",
+    "email": "bench@example.com", "phone": "9000000000",
+    "customer": {"name": "Bench", "address": "1 Main Road", "pincode": "560001", "country": "IN"},
+}
+
+async def main():
+    await app.main.startup()
+    ready = time.perf_counter()
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/score", json=ORDER)
+        first = time.perf_counter()
+        await client.post("/score", json=dict(ORDER, amount=2499.0))
+        second = time.perf_counter()
+    await app.main.shutdown()
+    return ready, first, second, response.status_code
+
+ready, first, second, status = asyncio.run(main())
+heavy = [name for name in ("pandas", "sklearn", "joblib", "xgboost", "lightgbm", "mlflow") if name in sys.modules]
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_score_ms": (first - ready) * 1000,
+    "second_score_ms": (second - first) * 1000,
+    "time_to_first_score_ms": (first - started) * 1000,
+    "status": status,
+    "heavy_modules": heavy,
+}))
+'''
+
+def run_once(env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure ML service cold start')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start')
+    parser.add_argument('--model-path', type=str, default=None, help='Model to load (default: MODEL_PATH)')
+    parser.add_argument('--json', action='store_true', help='Print raw per-run results as JSON')
+    
+    args = parser.parse_args()
+    
+    env = dict(os.environ)
+    if args.model_path:
+        env['MODEL_PATH'] = args.model_path
+    # Watchers and Redis would only add noise to a cold start measurement
+    env.setdefault('MODEL_WATCH_INTERVAL', '0')
+    
+    runs = [run_once(env) for _ in range(args.runs)]
+    if args.json:
+        print(json.dumps(runs, indent=2))
+        return
+    
+    for key in ('import_ms', 'startup_ms', 'first_score_ms', 'second_score_ms', 'time_to_first_score_ms'):
+        values = [run[key] for run in runs]
+        print(f"{key:24s} median {statistics.median(values):8.1f}  min {min(values):8.1f}  max {max(values):8.1f}")
+    print(f"{'status':24s} {sorted(set(run['status'] for run in runs))}")
+    print(f"{'heavy modules':24s} {sorted(set(name for run in runs for name in run['heavy_modules']))}")
+
+if __name__ == "__main__":
+    main()
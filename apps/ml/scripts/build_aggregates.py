@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Rebuild the historical aggregate index used by the order history features
+"""
+import sys
+import os
+
+# Add app directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.training.pipeline import TrainingPipeline
+import argparse
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the customer/pincode aggregate index')
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=None,
+        help='Orders fetched per MongoDB batch (default: TRAINING_BATCH_SIZE)'
+    )
+    
+    args = parser.parse_args()
+    
+    pipeline = TrainingPipeline()
+    try:
+        version = pipeline.build_aggregates(batch_size=args.batch_size)
+    finally:
+        pipeline.tracker.close()
+    
+    print(f"Aggregate index {version} is live")
+
+if __name__ == "__main__":
+    main()
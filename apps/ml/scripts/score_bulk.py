@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Re-score stored orders with the current model and write back riskScore
+"""
+import sys
+import os
+
+# Add app directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.config import config
+from app.scoring import BulkScorer
+from pymongo import MongoClient
+import argparse
+import json
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-score orders in MongoDB with the current model')
+    parser.add_argument(
+        '--model-path',
+        type=str,
+        default=config.MODEL_PATH,
+        help='Model to score with (default: MODEL_PATH)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Scoring processes; 0 scores in this process (default: CPU count)'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=config.BULK_SCORE_CHUNK_SIZE,
+        help='Orders per scoring chunk and bulk write (default: BULK_SCORE_CHUNK_SIZE)'
+    )
+    parser.add_argument(
+        '--max-rate',
+        type=float,
+        default=0,
+        help='Throughput cap in orders/sec, to limit load on the database (default: unlimited)'
+    )
+    parser.add_argument(
+        '--checkpoint',
+        type=str,
+        default=config.BULK_SCORE_CHECKPOINT,
+        help='Checkpoint file for resuming an interrupted run (default: BULK_SCORE_CHECKPOINT)'
+    )
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='Ignore an existing checkpoint and start from the first order'
+    )
+    parser.add_argument(
+        '--rescore-all',
+        action='store_true',
+        help='Also re-score orders already scored by this model version'
+    )
+    parser.add_argument(
+        '--status',
+        type=str,
+        default=None,
+        help='Only score orders with these comma-separated statuses, e.g. pending'
+    )
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=None,
+        help='Score at most this many orders'
+    )
+    
+    args = parser.parse_args()
+    
+    query = {}
+    if args.status:
+        query['status'] = {'$in': [status.strip() for status in args.status.split(',')]}
+    
+    client = MongoClient(config.MONGO_URI)
+    try:
+        scorer = BulkScorer(
+            client.get_database().orders,
+            args.model_path,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            max_rate=args.max_rate,
+            checkpoint_path=args.checkpoint,
+            rescore_all=args.rescore_all,
+            query=query
+        )
+        if args.restart:
+            scorer.checkpoint.clear()
+        stats = scorer.run(limit=args.limit)
+    finally:
+        client.close()
+    
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
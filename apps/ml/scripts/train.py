@@ -16,9 +16,9 @@ def main():
     parser.add_argument(
         '--model',
         type=str,
-        default='xgboost',
-        choices=['xgboost', 'lightgbm'],
-        help='Model type to train'
+        default=None,
+        choices=['xgboost', 'lightgbm', 'all'],
+        help='Model type to train (default: xgboost, or all with --search)'
     )
     parser.add_argument(
         '--output',
@@ -26,6 +26,47 @@ def main():
         default=None,
         help='Output path for model'
     )
+    parser.add_argument(
+        '--full-rebuild',
+        action='store_true',
+        help='Re-extract every order instead of only those updated since the last run'
+    )
+    parser.add_argument(
+        '--search',
+        action='store_true',
+        help='Run a parallel hyperparameter search and keep the best model'
+    )
+    parser.add_argument(
+        '--search-strategy',
+        type=str,
+        default='halving',
+        choices=['random', 'halving'],
+        help='Search strategy: random, or successive halving over boosting rounds'
+    )
+    parser.add_argument(
+        '--trials',
+        type=int,
+        default=20,
+        help='Number of configurations to try in search mode'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Parallel trials in search mode (default: CPU cores / threads per trial)'
+    )
+    parser.add_argument(
+        '--threads-per-trial',
+        type=int,
+        default=1,
+        help='Native threads used by each search trial'
+    )
+    parser.add_argument(
+        '--quantize',
+        action='store_true',
+        default=None,
+        help='Also save a pruned, quantized variant (served with MODEL_ENGINE=quantized)'
+    )
     
     args = parser.parse_args()
     
@@ -33,7 +74,22 @@ def main():
     if args.output:
         pipeline.config.MODEL_PATH = args.output
     
-    model = pipeline.run(model_type=args.model)
+    model_type = args.model or ('all' if args.search else 'xgboost')
+    if model_type == 'all' and not args.search:
+        parser.error('--model all requires --search')
+    
+    model = pipeline.run(
+        model_type=model_type,
+        full_rebuild=args.full_rebuild,
+        search=args.search,
+        search_options={
+            'n_trials': args.trials,
+            'strategy': args.search_strategy,
+            'workers': args.workers,
+            'threads_per_trial': args.threads_per_trial,
+        },
+        quantize=args.quantize
+    )
     
     if model is None:
         sys.exit(1)
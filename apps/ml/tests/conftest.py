@@ -0,0 +1,25 @@
+"""
+Shared fixtures for the ML service tests
+
+Run from apps/ml with: python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Must be set before any app module is imported (see benchmarks.fixtures)
+MODEL_DIR = os.path.join(tempfile.gettempdir(), 'confirmly-ml-tests')
+os.environ['AGGREGATE_DIR'] = os.path.join(MODEL_DIR, 'aggregates')
+os.environ.setdefault('TRACKING_BACKEND', 'none')
+
+@pytest.fixture(scope='session')
+def model_path() -> str:
+    """
+    A small model trained by the real pipeline, with every exported artifact
+    """
+    from benchmarks.fixtures import build_fixture
+    
+    return build_fixture(MODEL_DIR, orders=5000)
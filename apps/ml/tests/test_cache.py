@@ -0,0 +1,120 @@
+"""
+Prediction cache tiers and the shared Redis pool
+"""
+import asyncio
+import json
+import pytest
+from fakeredis import aioredis as fake_aioredis
+from app.utils import cache as cache_module
+from app.utils.cache import Cache
+from app.utils.redis_pool import RedisPool
+
+class CountingRedis(fake_aioredis.FakeRedis):
+    """
+    In-memory Redis that counts round-trips
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.round_trips = 0
+    
+    async def execute_command(self, *args, **options):
+        self.round_trips += 1
+        return await super().execute_command(*args, **options)
+    
+    def pipeline(self, *args, **kwargs):
+        pipe = super().pipeline(*args, **kwargs)
+        execute = pipe.execute
+        
+        async def counted_execute(*execute_args, **execute_kwargs):
+            self.round_trips += 1
+            return await execute(*execute_args, **execute_kwargs)
+        
+        pipe.execute = counted_execute
+        return pipe
+
+ITEMS = {f"score:test:{index}": {"riskScore": float(index), "confidence": 0.5} for index in range(20)}
+
+@pytest.fixture
+def server():
+    return CountingRedis()
+
+def test_set_many_and_get_many_round_trip(server):
+    async def run():
+        await Cache(server).set_many(ITEMS, ttl=120)
+        writes = server.round_trips
+        
+        # A fresh in-process tier, so every key comes from Redis
+        reader = Cache(server)
+        values = await reader.get_many(list(ITEMS) + ["score:test:missing"])
+        return writes, server.round_trips - writes, reader, values
+    
+    writes, reads, reader, values = asyncio.run(run())
+    assert writes == 1 and reads == 1
+    assert values == list(ITEMS.values()) + [None]
+    assert (reader.redis_hits, reader.redis_misses) == (len(ITEMS), 1)
+    # Redis hits are kept in the in-process tier
+    assert all(reader.local.get(key) == value for key, value in ITEMS.items())
+
+def test_set_many_applies_ttl_to_both_tiers(server, monkeypatch):
+    async def run():
+        cache = Cache(server)
+        await cache.set_many(ITEMS, ttl=30)
+        return cache, [await server.ttl(key) for key in ITEMS], await server.get("score:test:3")
+    
+    cache, ttls, stored = asyncio.run(run())
+    assert all(0 < ttl <= 30 for ttl in ttls)
+    assert json.loads(stored) == ITEMS["score:test:3"]
+    
+    now = cache_module.time.monotonic()
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now + 31)
+    assert cache.local.get("score:test:3") is None
+    assert cache.local.expirations == 1
+
+def test_get_many_serves_local_hits_without_redis(server):
+    async def run():
+        cache = Cache(server)
+        await cache.set_many(ITEMS)
+        before = server.round_trips
+        values = await cache.get_many(list(ITEMS))
+        return values, server.round_trips - before
+    
+    values, round_trips = asyncio.run(run())
+    assert values == list(ITEMS.values())
+    assert round_trips == 0
+
+def test_falls_back_to_local_tier_when_redis_is_down():
+    # Nothing listens on port 1, so every Redis call fails fast
+    pool = RedisPool("redis://127.0.0.1:1/0", max_connections=2, socket_timeout=0.2, connect_timeout=0.2)
+    
+    async def run():
+        cache = Cache(pool.async_client())
+        await cache.set_many(ITEMS)
+        await cache.set("score:test:single", {"riskScore": 1.0})
+        cache.local.clear()
+        cache.local.set("score:test:0", ITEMS["score:test:0"])
+        values = await cache.get_many(list(ITEMS)[:3])
+        single = await cache.get("score:test:single")
+        await pool.close()
+        return values, single
+    
+    values, single = asyncio.run(run())
+    assert values == [ITEMS["score:test:0"], None, None]
+    assert single is None
+
+def test_redis_pool_shares_bounded_clients():
+    pool = RedisPool("redis://127.0.0.1:1/0", max_connections=3, socket_timeout=0.2, connect_timeout=0.2)
+    async_client = pool.async_client()
+    assert pool.async_client() is async_client
+    assert async_client.connection_pool.max_connections == 3
+    sync_client = pool.sync_client()
+    assert pool.sync_client() is sync_client
+    assert sync_client.connection_pool.max_connections == 3
+    
+    asyncio.run(pool.close())
+    assert pool.async_client() is not async_client
+
+def test_redis_pool_without_url_disables_redis():
+    pool = RedisPool("")
+    assert pool.async_client() is None
+    assert pool.sync_client() is None
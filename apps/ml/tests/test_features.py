@@ -0,0 +1,14 @@
+"""
+Per-row and columnar feature extraction
+"""
+import numpy as np
+from app.utils.model_loader import ModelBundle
+from benchmarks.orders import OrderGenerator
+
+def test_row_extraction_matches_columns(model_path):
+    extractor = ModelBundle.load(model_path, 'native').extractor
+    # Repeat customers back to back, so remembered aggregate lookups get reused
+    orders = OrderGenerator(5, customers=50).orders(500)
+    orders += [dict(order, phone='', email='') for order in orders[:20]]
+    rows = np.stack([extractor.extract_into(order, extractor.schema.new_row()) for order in orders])
+    np.testing.assert_array_equal(rows, extractor.extract_columns(orders))
@@ -0,0 +1,55 @@
+"""
+Scores of the serving engines against the native model they were exported from
+"""
+import numpy as np
+import pytest
+from app.utils.model_loader import ModelBundle, ModelLoader, COMPILED_MAX_ROWS
+from benchmarks.orders import OrderGenerator
+
+@pytest.fixture(scope='module')
+def native(model_path):
+    return ModelBundle.load(model_path, 'native')
+
+def _features(bundle: ModelBundle, rows: int, seed: int = 0) -> np.ndarray:
+    X = bundle.extractor.extract_columns(OrderGenerator(seed).orders(rows))
+    # Missing values in every column, so default branches are exercised too
+    rng = np.random.default_rng(seed)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X
+
+@pytest.mark.parametrize('rows', [1, 3, 8, 200, 1000])
+def test_compiled_matches_native(model_path, native, rows):
+    compiled = ModelBundle.load(model_path, 'compiled')
+    assert compiled.engine == 'compiled'
+    X = _features(compiled, rows, seed=rows)
+    np.testing.assert_allclose(compiled.score_batch(X), native.score_batch(X), rtol=0, atol=1e-4)
+
+def test_compiled_covers_dense_and_traversal_paths(model_path, native):
+    compiled = ModelBundle.load(model_path, 'compiled').compiled
+    dense_rows = compiled.DENSE_STEP_LIMIT // len(compiled.feature)
+    for rows in (dense_rows, dense_rows + 1):
+        X = _features(native, rows, seed=rows)
+        np.testing.assert_allclose(
+            compiled.predict_proba(X)[:, 1], native.model.predict_proba(X)[:, 1], rtol=0, atol=1e-6
+        )
+
+def test_auto_uses_compiled_for_small_batches_only(model_path, native):
+    auto = ModelBundle.load(model_path, 'auto')
+    assert auto.engine == 'auto'
+    assert auto.model is not None and auto.compiled is not None
+    for rows in (1, COMPILED_MAX_ROWS, COMPILED_MAX_ROWS + 1, 500):
+        X = _features(auto, rows, seed=rows)
+        np.testing.assert_allclose(auto.predict_batch(X), native.predict_batch(X), rtol=0, atol=1e-4)
+
+def test_quantized_stays_close_to_native(model_path, native):
+    quantized = ModelBundle.load(model_path, 'quantized')
+    X = _features(quantized, 500)
+    # Pruned and float16 leaves: close, not exact
+    assert np.abs(quantized.predict_batch(X) - native.predict_batch(X)).max() < 5.0
+
+def test_reload_skips_unchanged_quantized_artifacts(model_path):
+    loader = ModelLoader(model_path, 'quantized')
+    bundle = loader.current()
+    assert bundle.version.endswith('-quantized')
+    assert loader.reload_model() is bundle
+    assert loader.reloads == 0
@@ -0,0 +1,28 @@
+"""
+Rule tier derived by the training pipeline and served ahead of the model
+"""
+import numpy as np
+from app.utils.model_loader import ModelBundle
+from benchmarks.orders import OrderGenerator
+
+def test_pipeline_accepts_rules_that_agree_with_the_model(model_path):
+    bundle = ModelBundle.load(model_path, 'native')
+    rules = bundle.rules
+    assert rules is not None and len(rules) >= 1
+    
+    orders = OrderGenerator(7).orders(2000)
+    matched = rules.match_many(orders)
+    hit_positions = [position for position, rule in enumerate(matched) if rule is not None]
+    # The tier has to take real traffic off the model to be worth having
+    assert len(hit_positions) / len(orders) > 0.2
+    
+    hits = [orders[position] for position in hit_positions]
+    model_scores = bundle.predict_batch(bundle.extractor.extract_columns(hits))
+    rule_scores = np.array([matched[position].risk_score for position in hit_positions])
+    agreement = np.mean(np.abs(model_scores - rule_scores) <= rules.tolerance)
+    assert agreement >= rules.meta['minAgreement'] - 0.05
+
+def test_row_and_column_matching_agree(model_path):
+    rules = ModelBundle.load(model_path, 'native').rules
+    orders = OrderGenerator(8).orders(500)
+    assert [rules.match(order) for order in orders] == rules.match_many(orders)
@@ -0,0 +1,44 @@
+"""
+Shadow scoring against a candidate model
+"""
+import time
+import numpy as np
+from app.utils.model_loader import ModelBundle, ModelLoader
+from app.utils.shadow import ShadowScorer
+from benchmarks.orders import OrderGenerator
+
+def _wait(scorer: ShadowScorer, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while scorer.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    scorer.shutdown()
+
+def _served_scores(bundle: ModelBundle, orders: list) -> np.ndarray:
+    # As /score/batch serves them: the rule's score for rule hits, the model's otherwise
+    rules = bundle.rules.match_many(orders)
+    scores = bundle.predict_batch(bundle.extractor.extract_columns(orders))
+    return np.array([rule.risk_score if rule is not None else score for rule, score in zip(rules, scores)])
+
+def test_identical_candidate_matches_served_scores(model_path):
+    primary = ModelBundle.load(model_path, 'native')
+    orders = OrderGenerator(11).orders(300)
+    served = _served_scores(primary, orders)
+    assert any(rule is not None for rule in primary.rules.match_many(orders))
+    
+    scorer = ShadowScorer(ModelLoader(model_path, 'native'), sample_rate=1.0)
+    scorer.submit(orders, served)
+    _wait(scorer)
+    
+    stats = scorer.stats()
+    assert stats["rows"] == len(orders) and stats["errors"] == 0
+    assert stats["maxAbsDiff"] < 1e-6
+    assert stats["lastError"] is None
+
+def test_failures_are_counted_and_reported(tmp_path):
+    scorer = ShadowScorer(ModelLoader(str(tmp_path / 'missing.pkl'), 'native'), sample_rate=1.0)
+    scorer.submit(OrderGenerator(12).orders(3), np.zeros(3))
+    _wait(scorer)
+    
+    stats = scorer.stats()
+    assert stats["errors"] == 1
+    assert stats["lastError"]